@@ -0,0 +1,58 @@
+"""Benchmark of running many small programs with one `mypl.py` process
+per program versus a single `mypl.py --batch` run.
+
+Writes the given number of small programs (default 200) to a temporary
+directory and reports the total wall time each way.
+
+Usage: python benchmarks/batch_run.py [programs [jobs]]
+
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+MYPL = os.path.join(ROOT, 'mypl.py')
+
+
+def small_program(i):
+    """Returns a small program that prints a few values."""
+    return (f'int sq(int x) {{return x * x;}} \n'
+            f'void main() {{ \n'
+            f'  for (int j = 0; j < 10; j = j + 1) {{print(sq(j + {i}));}} \n'
+            f'}} \n')
+
+
+def time_processes(files):
+    """Returns the wall time to run each file in its own process."""
+    start = time.perf_counter()
+    for path in files:
+        subprocess.run([sys.executable, MYPL, path], stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def time_batch(directory, jobs):
+    """Returns the wall time to run the directory's files as a batch."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, MYPL, '--batch', directory, '--jobs', str(jobs)],
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        files = []
+        for i in range(count):
+            path = os.path.join(directory, f'prog{i}.mypl')
+            with open(path, 'w') as f:
+                f.write(small_program(i))
+            files.append(path)
+        print(f'{count} programs, {jobs} jobs')
+        print(f'{"mode":>12} {"time (s)":>9}')
+        print(f'{"processes":>12} {time_processes(files):>9.3f}')
+        print(f'{"batch":>12} {time_batch(directory, jobs):>9.3f}')
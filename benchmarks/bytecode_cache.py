@@ -0,0 +1,92 @@
+"""Benchmark of time-to-first-instruction with and without the compiled
+bytecode (.myplc) cache.
+
+Generates library-style programs with the given numbers of helper
+functions and a small main, and reports for each the time from reading
+the source to having the VM's frame templates ready to run on a cache
+miss (lex, parse, check, code generation and cache write) and on a
+cache hit (cache read), plus the whole `mypl.py --cache-dir` process
+wall time for each.
+
+Usage: python benchmarks/bytecode_cache.py [function-count ...]
+
+"""
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_vm import VM
+import mypl_bytecode
+
+
+def library_source(functions):
+    """Returns a program with the given number of helper functions and a
+    main that calls one of them.
+
+    """
+    src = ''
+    for i in range(functions):
+        src += f'int f{i}(int a, int b) {{ \n'
+        src += '  int t = 0; \n'
+        src += '  for (int j = 0; j < a; j = j + 1) { t = t + j * b - (a / 2); } \n'
+        src += '  if (t > 100) { t = t - 100; } \n'
+        src += '  return t; \n'
+        src += '} \n'
+    src += 'void main() { \n  print(itos(f0(3, 4))); \n} \n'
+    return src
+
+
+def compile_and_save(source, path):
+    """Compiles source and writes its cache file (a cache miss)."""
+    vm = VM()
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(source)))).parse()
+    ast.accept(SemanticChecker())
+    ast.accept(CodeGenerator(vm))
+    mypl_bytecode.save(path, source, vm.frame_templates)
+    return vm.frame_templates
+
+
+def time_process(args):
+    """Returns the wall time in seconds to run mypl.py with args."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, 'mypl.py')] + args,
+                   stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    counts = [int(c) for c in sys.argv[1:]] or [10, 100, 500]
+    print(f'{"functions":>10} {"miss (s)":>9} {"hit (s)":>9} '
+          f'{"miss run (s)":>13} {"hit run (s)":>12}')
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for count in counts:
+            source = library_source(count)
+            src_path = os.path.join(cache_dir, f'lib{count}.mypl')
+            with open(src_path, 'w') as f:
+                f.write(source)
+            path = mypl_bytecode.cache_path(src_path, source, cache_dir)
+            start = time.perf_counter()
+            compile_and_save(source, path)
+            miss = time.perf_counter() - start
+            start = time.perf_counter()
+            assert mypl_bytecode.load(path, source) is not None
+            hit = time.perf_counter() - start
+            # whole process runs, first with an empty cache
+            os.remove(path)
+            args = ['--cache-dir', cache_dir, src_path]
+            miss_run = time_process(args)
+            hit_run = time_process(args)
+            print(f'{count:>10} {miss:>9.3f} {hit:>9.3f} '
+                  f'{miss_run:>13.3f} {hit_run:>12.3f}')
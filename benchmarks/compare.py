@@ -0,0 +1,181 @@
+"""Regression gate comparing two sets of benchmark suite results.
+
+Compares the times in a current results file (from benchmarks/suite.py)
+against a stored baseline, benchmark by benchmark and phase by phase.
+A phase has regressed if its median time grew by more than the
+threshold (default 10%) and a one-sided Mann-Whitney U test on the two
+sets of times gives p below alpha (default 0.05). Phases whose medians
+are under the minimum time (default 1 ms) are too noisy to judge, and
+with fewer than 3 times on either side only the threshold is used.
+Prints a table of every comparison and exits with status 1 if any
+phase regressed or any baseline benchmark (or phase) is missing from
+the current results (unless --allow-missing is given).
+
+Usage: python benchmarks/compare.py BASELINE CURRENT [-t THRESHOLD]
+           [-a ALPHA] [-m MIN_TIME] [--allow-missing]
+
+The stored baseline is benchmarks/results/baseline.json (see
+benchmarks/results/run_loop.txt for how it was measured).
+
+"""
+
+import argparse
+import json
+import math
+import statistics
+import sys
+
+
+def mann_whitney_p(xs, ys):
+    """Returns the one-sided p-value that the values in ys tend to be
+    larger than those in xs (the Mann-Whitney U test with the normal
+    approximation, corrected for ties and continuity).
+
+    """
+    values = sorted([(v, 0) for v in xs] + [(v, 1) for v in ys])
+    n = len(values)
+    # average ranks (from 1) over runs of tied values
+    ranks = [0.0] * n
+    ties = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and values[j + 1][0] == values[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    nx, ny = len(xs), len(ys)
+    u = sum(rank for rank, (_, side) in zip(ranks, values) if side == 1) - ny * (ny + 1) / 2
+    variance = nx * ny / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - nx * ny / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare_phase(baseline, current, threshold, alpha, min_time):
+    """Compares one phase's baseline and current times.
+
+    Returns: The (status, relative change of the median, p-value or
+    None) where status is 'regression', 'improvement', 'ok' or 'noise'
+    (too fast to judge).
+
+    """
+    old = statistics.median(baseline)
+    new = statistics.median(current)
+    change = new / old - 1 if old > 0 else 0.0
+    if max(old, new) < min_time:
+        return 'noise', change, None
+    enough = len(baseline) >= 3 and len(current) >= 3
+    if change > threshold:
+        p = mann_whitney_p(baseline, current) if enough else None
+        return ('regression' if p is None or p < alpha else 'ok'), change, p
+    if change < -threshold:
+        p = mann_whitney_p(current, baseline) if enough else None
+        return ('improvement' if p is None or p < alpha else 'ok'), change, p
+    return 'ok', change, None
+
+
+def compare(baseline, current, threshold=0.10, alpha=0.05, min_time=0.001):
+    """Compares two results dictionaries (as saved by the suite).
+
+    Returns: A list of rows (dictionaries) with the benchmark, phase,
+    baseline and current medians, change, p-value and status, for every
+    phase of the benchmarks in both (benchmarks in only one have the
+    status 'missing' or 'new', as do phases).
+
+    """
+    rows = []
+    old_benchmarks = baseline['benchmarks']
+    new_benchmarks = current['benchmarks']
+    for name in list(old_benchmarks) + [n for n in new_benchmarks if n not in old_benchmarks]:
+        if name not in new_benchmarks or name not in old_benchmarks:
+            status = 'missing' if name not in new_benchmarks else 'new'
+            rows.append({'benchmark': name, 'phase': None, 'baseline': None,
+                         'current': None, 'change': None, 'p': None, 'status': status})
+            continue
+        for phase, old in old_benchmarks[name].items():
+            new = new_benchmarks[name].get(phase)
+            if new is None:
+                rows.append({'benchmark': name, 'phase': phase, 'baseline': None,
+                             'current': None, 'change': None, 'p': None,
+                             'status': 'missing'})
+                continue
+            status, change, p = compare_phase(old['times'], new['times'],
+                                              threshold, alpha, min_time)
+            rows.append({'benchmark': name, 'phase': phase,
+                         'baseline': statistics.median(old['times']),
+                         'current': statistics.median(new['times']),
+                         'change': change, 'p': p, 'status': status})
+    return rows
+
+
+def table(rows):
+    """Returns the comparison rows as a human-readable table."""
+    lines = [f'{"benchmark":<16} {"phase":<8} {"base (ms)":>10} {"now (ms)":>10} '
+             f'{"change":>8} {"p":>7}  status']
+    for row in rows:
+        if row['change'] is None:
+            lines.append(f'{row["benchmark"]:<16} {row["phase"] or "":<8} {"":>10} {"":>10} {"":>8} '
+                         f'{"":>7}  {row["status"]}')
+            continue
+        p = f'{row["p"]:.3f}' if row['p'] is not None else '-'
+        lines.append(f'{row["benchmark"]:<16} {row["phase"]:<8} '
+                     f'{1000 * row["baseline"]:>10.2f} {1000 * row["current"]:>10.2f} '
+                     f'{100 * row["change"]:>+7.1f}% {p:>7}  {row["status"]}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """Runs the comparison with the given command line arguments.
+
+    Returns: The exit status (0 if the current results pass, 1 if a
+    phase regressed or results are missing, 2 if a file is unreadable).
+
+    """
+    argparser = argparse.ArgumentParser(
+        description='Compare benchmark suite results against a baseline.')
+    argparser.add_argument('baseline', help='baseline results (JSON)')
+    argparser.add_argument('current', help='current results (JSON)')
+    argparser.add_argument('-t', '--threshold', type=float, default=0.10,
+                           help='slowdown of the median to flag (default 0.10 = 10%%)')
+    argparser.add_argument('-a', '--alpha', type=float, default=0.05,
+                           help='significance level (default 0.05)')
+    argparser.add_argument('-m', '--min-time', type=float, default=0.001,
+                           help='median seconds under which a phase is noise (default 0.001)')
+    argparser.add_argument('--allow-missing', action='store_true',
+                           help='pass even if baseline benchmarks are missing from the current results')
+    args = argparser.parse_args(argv)
+    results = []
+    for path in [args.baseline, args.current]:
+        try:
+            with open(path, encoding='utf-8') as f:
+                results.append(json.load(f))
+        except (OSError, ValueError) as ex:
+            print(f'ERROR: Could not read results file {path!r}: {ex}', file=sys.stderr)
+            return 2
+    baseline, current = results
+    if baseline.get('python') != current.get('python'):
+        print(f'warning: Python {baseline.get("python")} baseline vs '
+              f'{current.get("python")} now', file=sys.stderr)
+    rows = compare(baseline, current, args.threshold, args.alpha, args.min_time)
+    print(table(rows))
+    regressions = [row for row in rows if row['status'] == 'regression']
+    missing = [row for row in rows if row['status'] == 'missing']
+    failed = False
+    if regressions:
+        print(f'{len(regressions)} regression(s) beyond {100 * args.threshold:.0f}%')
+        failed = True
+    if missing:
+        print(f'{len(missing)} missing from the current results')
+        failed = failed or not args.allow_missing
+    if not regressions:
+        print('no regressions')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
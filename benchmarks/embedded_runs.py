@@ -0,0 +1,40 @@
+"""Benchmark of running a program through the embedding API, compiled
+once and run many times versus compiled on every call.
+
+Reports the mean time per call for the given number of calls (default
+500), each with a different stdin.
+
+Usage: python benchmarks/embedded_runs.py [calls]
+
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import mypl_api
+
+
+SNIPPET = ('int sq(int x) {return x * x;} \n'
+           'void main() { \n'
+           '  int n = stoi(input()); \n'
+           '  for (int i = 0; i < n; i = i + 1) {print(itos(sq(i)) + " ");} \n'
+           '} \n')
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    start = time.perf_counter()
+    for i in range(count):
+        mypl_api.compile(SNIPPET).run(f'{i % 10}\n')
+    per_call = (time.perf_counter() - start) / count
+    start = time.perf_counter()
+    program = mypl_api.compile(SNIPPET)
+    for i in range(count):
+        program.run(f'{i % 10}\n')
+    once = (time.perf_counter() - start) / count
+    print(f'{"mode":>16} {"ms/call":>8}')
+    print(f'{"compile per call":>16} {per_call * 1000:>8.3f}')
+    print(f'{"compile once":>16} {once * 1000:>8.3f}')
@@ -0,0 +1,57 @@
+"""Benchmark of the cost of VM execution limits.
+
+Runs a loop-heavy program with no limits and with every limit set, at
+several check intervals, and reports the best of three run times.
+
+Usage: python benchmarks/execution_limits.py [iterations]
+
+"""
+
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_vm import VM, ExecutionLimits
+
+
+def loop_source(iterations):
+    """Returns a program that loops the given number of times."""
+    return ('int step(int t, int i) {return t + i * 2 - 1;} \n'
+            'void main() { \n'
+            '  int t = 0; \n'
+            f'  for (int i = 0; i < {iterations}; i = i + 1) {{t = step(t, i) / 2;}} \n'
+            '} \n')
+
+
+def time_run(source, limits, repeats=3):
+    """Returns the best time in seconds to run source within limits."""
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(source)))).parse()
+    ast.accept(SemanticChecker())
+    best = None
+    for _ in range(repeats):
+        vm = VM()
+        ast.accept(CodeGenerator(vm))
+        vm.limits = limits
+        start = time.perf_counter()
+        vm.run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    source = loop_source(iterations)
+    print(f'{"limits":>16} {"time (s)":>9}')
+    print(f'{"none":>16} {time_run(source, None):>9.3f}')
+    for interval in [1000, 100, 1]:
+        limits = ExecutionLimits(10 ** 9, 1000, 1000, 3600.0, interval)
+        print(f'{"every " + str(interval):>16} {time_run(source, limits):>9.3f}')
@@ -0,0 +1,71 @@
+"""Benchmark of full versus incremental recompilation after small edits.
+
+Generates a library-style program (see bytecode_cache.py) with the given
+number of helper functions (default 1000) and reports the compile time
+(lex, parse, check and code generation) from scratch and with the
+incremental compiler after each kind of edit, plus how many definitions
+the incremental compile parsed and lowered.
+
+Usage: python benchmarks/incremental_compile.py [functions]
+
+"""
+
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_incremental import IncrementalCompiler
+from mypl_vm import VM
+from bytecode_cache import library_source
+
+
+def time_full(source):
+    """Returns the time in seconds to compile source from scratch."""
+    start = time.perf_counter()
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(source)))).parse()
+    ast.accept(SemanticChecker())
+    ast.accept(CodeGenerator(VM()))
+    return time.perf_counter() - start
+
+
+def time_incremental(compiler, source):
+    """Returns the time in seconds to recompile source incrementally."""
+    start = time.perf_counter()
+    compiler.compile(source)
+    return time.perf_counter() - start
+
+
+def edits(source, functions):
+    """Returns (description, edited source) pairs, each edit applied to
+    the original source.
+
+    """
+    middle = f'f{functions // 2}'
+    body_edit = source.replace('return t; \n} \nint ' + middle,
+                               'return t + 1; \n} \nint ' + middle, 1)
+    return [('unchanged', source),
+            ('body edit', body_edit),
+            ('lines added at top', '// header\n\n' + source),
+            ('main edit', source.replace('f0(3, 4)', 'f0(4, 4)'))]
+
+
+if __name__ == '__main__':
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    source = library_source(functions)
+    print(f'{functions} functions')
+    print(f'{"edit":>20} {"full (s)":>9} {"incr (s)":>9} {"parsed":>7} {"lowered":>8}')
+    for description, edited in edits(source, functions):
+        compiler = IncrementalCompiler()
+        compiler.compile(source)
+        full = time_full(edited)
+        incremental = time_incremental(compiler, edited)
+        print(f'{description:>20} {full:>9.3f} {incremental:>9.3f} '
+              f'{compiler.parsed:>7} {compiler.lowered:>8}')
@@ -0,0 +1,50 @@
+"""Benchmark of eager versus lazy (on first call) code generation.
+
+Uses the library-style programs of bytecode_cache.py (many helper
+functions, a main that calls one) and reports for each function count
+the code generation plus run time with eager and with lazy code
+generation, and how many functions each lowered.
+
+Usage: python benchmarks/lazy_codegen.py [function-count ...]
+
+"""
+
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_vm import VM
+from bytecode_cache import library_source
+
+
+def time_run(ast, lazy):
+    """Returns the (code gen + run time, functions lowered) for the
+    checked AST.
+
+    """
+    start = time.perf_counter()
+    vm = VM()
+    ast.accept(CodeGenerator(vm, lazy))
+    vm.stdout = io.StringIO()
+    vm.run()
+    return time.perf_counter() - start, len(vm.frame_templates)
+
+
+if __name__ == '__main__':
+    counts = [int(c) for c in sys.argv[1:]] or [10, 100, 1000]
+    print(f'{"functions":>10} {"eager (s)":>10} {"lazy (s)":>10} {"lowered":>8}')
+    for count in counts:
+        src = library_source(count)
+        ast = ASTParser(Lexer(FileWrapper(io.StringIO(src)))).parse()
+        ast.accept(SemanticChecker())
+        eager, _ = time_run(ast, False)
+        lazy, lowered = time_run(ast, True)
+        print(f'{count:>10} {eager:>10.3f} {lazy:>10.3f} {lowered:>8}')
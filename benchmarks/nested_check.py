@@ -0,0 +1,54 @@
+"""Benchmark of semantic checking (--check) time on deeply nested
+MyPL sources.
+
+Generates programs whose while/if blocks are nested to each given depth,
+with a variable reference at every level, and reports the parse and
+semantic check times for each.
+
+Usage: python benchmarks/nested_check.py [depth ...]
+
+"""
+
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+
+
+def nested_source(depth):
+    """Returns a program with while/if blocks nested to the given depth,
+    each level declaring a variable and referencing outer ones.
+
+    """
+    src = 'void main() { \n  int x0 = 0; \n'
+    for i in range(1, depth + 1):
+        src += f'  while (x{i-1} < 1) {{ int x{i} = x{i-1} + x0; \n'
+    src += '  x0 = x0 + 1; \n'
+    src += '  } \n' * depth
+    src += '} \n'
+    return src
+
+
+def time_check(src):
+    """Returns the (parse, check) times in seconds for the source."""
+    start = time.perf_counter()
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(src)))).parse()
+    parsed = time.perf_counter()
+    ast.accept(SemanticChecker())
+    checked = time.perf_counter()
+    return parsed - start, checked - parsed
+
+
+if __name__ == '__main__':
+    depths = [int(d) for d in sys.argv[1:]] or [250, 500, 1000, 2000, 4000]
+    print(f'{"depth":>8} {"parse (s)":>10} {"check (s)":>10}')
+    for depth in depths:
+        parse_time, check_time = time_check(nested_source(depth))
+        print(f'{depth:>8} {parse_time:>10.3f} {check_time:>10.3f}')
@@ -0,0 +1,54 @@
+"""Benchmark of serial versus parallel (per-function, multi-process)
+semantic checking and code generation.
+
+Generates a program with the given number of functions (default 2000)
+and reports the check plus code generation time serially and with each
+given number of worker processes. The speedup is bounded by the number
+of CPUs on the machine (printed first).
+
+Usage: python benchmarks/parallel_compile.py [functions [workers ...]]
+
+"""
+
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_parallel import compile_program
+from mypl_vm import VM
+from bytecode_cache import library_source
+
+
+def time_serial(ast):
+    """Returns the serial check + code gen time in seconds."""
+    start = time.perf_counter()
+    ast.accept(SemanticChecker())
+    ast.accept(CodeGenerator(VM()))
+    return time.perf_counter() - start
+
+
+def time_parallel(ast, workers):
+    """Returns the parallel check + code gen time in seconds."""
+    start = time.perf_counter()
+    compile_program(ast, VM(), workers)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = [int(w) for w in sys.argv[2:]] or [1, 2, 4]
+    src = library_source(functions)
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(src)))).parse()
+    print(f'{functions} functions, {os.cpu_count()} CPUs')
+    print(f'{"workers":>8} {"time (s)":>9}')
+    print(f'{"serial":>8} {time_serial(ast):>9.3f}')
+    for count in workers:
+        print(f'{count:>8} {time_parallel(ast, count):>9.3f}')
@@ -0,0 +1,74 @@
+"""Benchmark of profiler overhead on a recursive program.
+
+Runs fib(n) (default n = 20) with no profiler, with the sampling
+profiler at the given intervals (default 997, its default, and 97), with
+the call profiler, and with the opcode profiler, and reports the best
+of five run times and the overhead relative to the unprofiled run.
+
+Usage: python benchmarks/sampling_profiler.py [n [interval ...]]
+
+"""
+
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_vm import VM
+from mypl_profile import OpcodeProfiler, SamplingProfiler, CallProfiler
+
+
+def fib_source(n):
+    """Returns a program computing fib(n) recursively."""
+    return ('int fib(int n) { \n'
+            '  if (n < 2) {return n;} \n'
+            '  return fib(n - 1) + fib(n - 2); \n'
+            '} \n'
+            f'void main() {{int x = fib({n});}} \n')
+
+
+def time_run(ast, make_profiler, repeats=5, calls=False):
+    """Returns the best time in seconds to run the checked AST with a
+    new profiler from make_profiler (or none) each time, attached as
+    the call profiler if calls is true.
+
+    """
+    best = None
+    for _ in range(repeats):
+        vm = VM()
+        ast.accept(CodeGenerator(vm))
+        profiler = make_profiler() if make_profiler else None
+        if calls:
+            vm.call_profiler = profiler
+        else:
+            vm.profiler = profiler
+        start = time.perf_counter()
+        vm.run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    intervals = [int(i) for i in sys.argv[2:]] or [997, 97]
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(fib_source(n))))).parse()
+    ast.accept(SemanticChecker())
+    base = time_run(ast, None)
+    print(f'{"profiler":>16} {"time (s)":>9} {"overhead":>9}')
+    print(f'{"none":>16} {base:>9.3f} {"":>9}')
+    for interval in intervals:
+        elapsed = time_run(ast, lambda: SamplingProfiler(interval))
+        print(f'{"sample " + str(interval):>16} {elapsed:>9.3f} '
+              f'{100 * (elapsed / base - 1):>8.1f}%')
+    elapsed = time_run(ast, CallProfiler, calls=True)
+    print(f'{"calls":>16} {elapsed:>9.3f} {100 * (elapsed / base - 1):>8.1f}%')
+    elapsed = time_run(ast, OpcodeProfiler)
+    print(f'{"opcode":>16} {elapsed:>9.3f} {100 * (elapsed / base - 1):>8.1f}%')
@@ -0,0 +1,58 @@
+"""Benchmark of running snippets through the compile-and-run server
+versus one `mypl.py` process per snippet.
+
+Starts a server on a temporary Unix socket and reports the mean time
+per request for the given number of requests (default 100), each with a
+different stdin, against the mean time of a `mypl.py` process run.
+
+Usage: python benchmarks/server_requests.py [requests]
+
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+import mypl_server
+
+
+SNIPPET = ('int sq(int x) {return x * x;} \n'
+           'void main() { \n'
+           '  int n = stoi(input()); \n'
+           '  for (int i = 0; i < n; i = i + 1) {print(sq(i));} \n'
+           '} \n')
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = os.path.join(directory, 'snippet.mypl')
+        with open(source_path, 'w') as f:
+            f.write(SNIPPET)
+        address = os.path.join(directory, 'mypl.sock')
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'mypl.py'),
+                                   '--serve', address], stderr=subprocess.DEVNULL)
+        try:
+            while not os.path.exists(address):
+                time.sleep(0.05)
+            start = time.perf_counter()
+            for i in range(count):
+                mypl_server.request(address, SNIPPET, f'{i % 10}\n')
+            served = (time.perf_counter() - start) / count
+            start = time.perf_counter()
+            runs = max(1, count // 10)
+            for i in range(runs):
+                subprocess.run([sys.executable, os.path.join(ROOT, 'mypl.py'), source_path],
+                               input=f'{i % 10}\n', text=True, stdout=subprocess.DEVNULL)
+            process = (time.perf_counter() - start) / runs
+        finally:
+            server.terminate()
+            server.wait()
+    print(f'{"mode":>10} {"ms/request":>11}')
+    print(f'{"server":>10} {served * 1000:>11.2f}')
+    print(f'{"process":>10} {process * 1000:>11.2f}')
@@ -0,0 +1,62 @@
+"""Benchmark of semantic checking and code generation time on MyPL
+sources with wide structs.
+
+Generates programs with a struct of each given field count, one new
+expression for it, and reads and writes of every field, and reports the
+check and code generation times for each.
+
+Usage: python benchmarks/struct_fields.py [field-count ...]
+
+"""
+
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_vm import VM
+
+
+def struct_source(fields, rounds=20):
+    """Returns a program with a struct of the given number of int fields
+    that reads and writes every field the given number of rounds.
+
+    """
+    src = 'struct S { \n'
+    src += ''.join(f'  int f{i}; \n' for i in range(fields))
+    src += '} \n'
+    src += 'void main() { \n'
+    src += '  S s = new S(' + ', '.join(str(i) for i in range(fields)) + '); \n'
+    src += '  int t = 0; \n'
+    for _ in range(rounds):
+        for i in range(fields):
+            src += f'  s.f{i} = s.f{fields - 1 - i} + t; \n'
+            src += f'  t = t + s.f{i}; \n'
+    src += '} \n'
+    return src
+
+
+def time_phases(src):
+    """Returns the (check, code gen) times in seconds for the source."""
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(src)))).parse()
+    start = time.perf_counter()
+    ast.accept(SemanticChecker())
+    checked = time.perf_counter()
+    ast.accept(CodeGenerator(VM()))
+    generated = time.perf_counter()
+    return checked - start, generated - checked
+
+
+if __name__ == '__main__':
+    counts = [int(c) for c in sys.argv[1:]] or [10, 50, 100, 200]
+    print(f'{"fields":>8} {"check (s)":>10} {"codegen (s)":>12}')
+    for count in counts:
+        check_time, gen_time = time_phases(struct_source(count))
+        print(f'{count:>8} {check_time:>10.3f} {gen_time:>12.3f}')
@@ -0,0 +1,181 @@
+"""Benchmark suite of representative MyPL workloads, timed phase by phase.
+
+Runs each benchmark -- the programs in benchmarks/programs (recursion,
+array loops, strings, structs, trees and try/catch) and generated
+sources that stress the front end -- the given number of times (default
+5, after one untimed warm-up run) and reports the median and standard
+deviation of its lex, parse, check, codegen and run times. The results,
+with every time measured, are saved as JSON (default
+benchmark_results.json) so that runs can be compared.
+
+Usage: python benchmarks/suite.py [-r REPEATS] [-o FILE] [BENCHMARK ...]
+
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_vm import VM
+from mypl_timings import TokenList, lex_tokens
+
+
+PROGRAMS_DIR = os.path.join(os.path.dirname(__file__), 'programs')
+
+PHASES = ['lex', 'parse', 'check', 'codegen', 'run']
+
+
+def generated_source(functions):
+    """Returns a large program (mostly for the front end) with a struct
+    and the given number of functions mixing loops, conditions, struct
+    fields, arrays and strings, and a main that calls a few of them.
+
+    """
+    src = 'struct Pair { \n  int first; \n  double second; \n  string name; \n} \n'
+    for i in range(functions):
+        src += f'// generated function {i} \n'
+        src += f'int g{i}(int a, Pair p) {{ \n'
+        src += '  array int xs = new int[a + 1]; \n'
+        src += '  int t = 0; \n'
+        src += '  for (int j = 0; j <= a; j = j + 1) { \n'
+        src += f'    xs[j] = j * {i + 1} - (t / 2); \n'
+        src += '    if (xs[j] > p.first and not (j == 0)) { t = t + xs[j]; } \n'
+        src += '  } \n'
+        src += '  while (t > 1000) { t = t / 2; } \n'
+        src += f'  p.name = p.name + itos(t) + "{i}"; \n'
+        src += '  p.second = p.second + itod(t) * 0.5; \n'
+        src += '  return t + length(p.name); \n'
+        src += '} \n'
+    src += 'void main() { \n'
+    src += '  Pair p = new Pair(3, 1.5, ""); \n'
+    src += '  int t = 0; \n'
+    for i in range(0, functions, max(1, functions // 10)):
+        src += f'  t = t + g{i}(5, p); \n'
+    src += '  print(itos(t) + "\\n"); \n'
+    src += '} \n'
+    return src
+
+
+# generated benchmarks: name -> function returning the source
+GENERATED = {
+    'generated_500': lambda: generated_source(500),
+}
+
+
+def benchmark_sources():
+    """Returns a dictionary of benchmark name -> MyPL source, with the
+    programs (by file name) first and then the generated sources.
+
+    """
+    sources = {}
+    for name in sorted(os.listdir(PROGRAMS_DIR)):
+        if name.endswith('.mypl'):
+            with open(os.path.join(PROGRAMS_DIR, name), encoding='utf-8') as f:
+                sources[name[:-len('.mypl')]] = f.read()
+    for name, make_source in GENERATED.items():
+        sources[name] = make_source()
+    return sources
+
+
+def time_phases(source):
+    """Returns a dictionary of phase -> the seconds that phase took to
+    compile and run the source (with the program's output discarded
+    and an empty standard input).
+
+    """
+    times = {}
+    start = time.perf_counter()
+    tokens = lex_tokens(Lexer(FileWrapper(io.StringIO(source))))
+    times['lex'] = time.perf_counter() - start
+    start = time.perf_counter()
+    ast = ASTParser(TokenList(tokens)).parse()
+    times['parse'] = time.perf_counter() - start
+    start = time.perf_counter()
+    ast.accept(SemanticChecker())
+    times['check'] = time.perf_counter() - start
+    start = time.perf_counter()
+    vm = VM()
+    ast.accept(CodeGenerator(vm))
+    times['codegen'] = time.perf_counter() - start
+    vm.stdin = io.StringIO('')
+    vm.stdout = io.StringIO()
+    start = time.perf_counter()
+    vm.run()
+    times['run'] = time.perf_counter() - start
+    return times
+
+
+def summarize(times):
+    """Returns the median, standard deviation and minimum of a list of
+    times, along with the times themselves."""
+    return {'median': statistics.median(times),
+            'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+            'min': min(times),
+            'times': times}
+
+
+def run_suite(names=None, repeats=5, warmup=1):
+    """Runs the named benchmarks (default: all of them).
+
+    Returns: The results as a dictionary (suitable for JSON) with the
+    environment and, for each benchmark, a summary of each phase's
+    times in seconds.
+
+    """
+    sources = benchmark_sources()
+    results = {'python': platform.python_version(),
+               'platform': platform.platform(),
+               'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'repeats': repeats,
+               'benchmarks': {}}
+    for name in names or sources:
+        for _ in range(warmup):
+            time_phases(sources[name])
+        runs = [time_phases(sources[name]) for _ in range(repeats)]
+        results['benchmarks'][name] = {phase: summarize([run[phase] for run in runs])
+                                       for phase in PHASES}
+    return results
+
+
+def table(results):
+    """Returns the results as a table of median +- stdev times in ms."""
+    lines = [f'{"benchmark":<16}' + ''.join(f' {phase + " (ms)":>17}' for phase in PHASES)]
+    for name, phases in results['benchmarks'].items():
+        cells = [f'{1000 * phases[phase]["median"]:.2f} +- {1000 * phases[phase]["stdev"]:.2f}'
+                 for phase in PHASES]
+        lines.append(f'{name:<16}' + ''.join(f' {cell:>17}' for cell in cells))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description='Run the MyPL benchmark suite.')
+    argparser.add_argument('-r', '--repeats', type=int, default=5,
+                           help='timed runs of each benchmark (default 5)')
+    argparser.add_argument('-o', '--output', default='benchmark_results.json',
+                           metavar='FILE', help='JSON results file')
+    argparser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                           help='benchmarks to run (default: all)')
+    args = argparser.parse_args()
+    known = benchmark_sources()
+    for name in args.benchmarks:
+        if name not in known:
+            argparser.error(f'unknown benchmark {name!r} (one of {", ".join(known)})')
+    if args.repeats < 1:
+        argparser.error('repeats must be at least 1')
+    results = run_suite(args.benchmarks, args.repeats)
+    print(table(results))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'results saved to {args.output}')
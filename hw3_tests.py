@@ -590,7 +590,7 @@ def test_simple_not_bool_expr():
         '  x = not true and false; \n'
         '} \n'
     ))
-    p = ASTParser(Lexer(in_stream)).parse()
+    p = ASTParser(Lexer(in_stream), legacy_exprs=True).parse()
     assert len(p.fun_defs[0].stmts) == 1
     stmt = p.fun_defs[0].stmts[0]
     assert stmt.expr.not_op == True
@@ -607,7 +607,7 @@ def test_simple_paren_expr():
         '  x = (1 + 2); \n'
         '} \n'
     ))
-    p = ASTParser(Lexer(in_stream)).parse()
+    p = ASTParser(Lexer(in_stream), legacy_exprs=True).parse()
     assert len(p.fun_defs[0].stmts) == 1
     stmt = p.fun_defs[0].stmts[0]
     assert stmt.expr.not_op == False
@@ -668,7 +668,7 @@ def test_expr_with_two_ops():
         '  x = 1 / 2 * 3; \n'
         '} \n'
     ))
-    p = ASTParser(Lexer(in_stream)).parse()
+    p = ASTParser(Lexer(in_stream), legacy_exprs=True).parse()
     assert len(p.fun_defs[0].stmts) == 1
     stmt = p.fun_defs[0].stmts[0]
     assert stmt.expr.not_op == False
@@ -953,7 +953,7 @@ def test_long_paren_expr():
         '  x = (1 + 2 * 3 - 5); \n'
         '} \n'
     ))
-    p = ASTParser(Lexer(in_stream)).parse()
+    p = ASTParser(Lexer(in_stream), legacy_exprs=True).parse()
     assert len(p.fun_defs[0].stmts) == 1
     stmt = p.fun_defs[0].stmts[0]
     assert stmt.expr.not_op == False
@@ -974,7 +974,7 @@ def test_long_expr_after_paren_expr():
         '  x = (3 - 1) - x + y; \n'
         '} \n'
     ))
-    p = ASTParser(Lexer(in_stream)).parse()
+    p = ASTParser(Lexer(in_stream), legacy_exprs=True).parse()
     assert len(p.fun_defs[0].stmts) == 1
     stmt = p.fun_defs[0].stmts[0]
     assert stmt.expr.not_op == False
@@ -1173,3 +1173,121 @@ def test_try_complicated_statement():
     assert len(stmt.try_part) == 1
     stmt = p.fun_defs[0].stmts[0]
     assert len(stmt.catch_parts) == 1
+
+
+#----------------------------------------------------------------------
+# Operator precedence
+#----------------------------------------------------------------------
+
+def test_mult_binds_tighter_than_add():
+    in_stream = FileWrapper(io.StringIO(
+        'void main() { \n'
+        '  x = 1 * 2 + 3; \n'
+        '} \n'
+    ))
+    p = ASTParser(Lexer(in_stream)).parse()
+    stmt = p.fun_defs[0].stmts[0]
+    assert stmt.expr.op.lexeme == '+'
+    assert stmt.expr.first.expr.first.rvalue.value.lexeme == '1'
+    assert stmt.expr.first.expr.op.lexeme == '*'
+    assert stmt.expr.first.expr.rest.first.rvalue.value.lexeme == '2'
+    assert stmt.expr.rest.first.rvalue.value.lexeme == '3'
+    assert stmt.expr.rest.op == None
+
+def test_sub_is_left_associative():
+    in_stream = FileWrapper(io.StringIO(
+        'void main() { \n'
+        '  x = 3 - 2 - 1; \n'
+        '} \n'
+    ))
+    p = ASTParser(Lexer(in_stream)).parse()
+    stmt = p.fun_defs[0].stmts[0]
+    assert stmt.expr.op.lexeme == '-'
+    assert stmt.expr.first.expr.first.rvalue.value.lexeme == '3'
+    assert stmt.expr.first.expr.op.lexeme == '-'
+    assert stmt.expr.first.expr.rest.first.rvalue.value.lexeme == '2'
+    assert stmt.expr.rest.first.rvalue.value.lexeme == '1'
+
+def test_add_is_left_associative():
+    in_stream = FileWrapper(io.StringIO(
+        'void main() { \n'
+        '  x = a + b + c; \n'
+        '} \n'
+    ))
+    p = ASTParser(Lexer(in_stream)).parse()
+    stmt = p.fun_defs[0].stmts[0]
+    assert stmt.expr.op.lexeme == '+'
+    assert stmt.expr.first.expr.first.rvalue.path[0].var_name.lexeme == 'a'
+    assert stmt.expr.first.expr.op.lexeme == '+'
+    assert stmt.expr.first.expr.rest.first.rvalue.path[0].var_name.lexeme == 'b'
+    assert stmt.expr.rest.first.rvalue.path[0].var_name.lexeme == 'c'
+    assert stmt.expr.rest.op == None
+
+def test_and_chain_is_left_associative():
+    in_stream = FileWrapper(io.StringIO(
+        'void main() { \n'
+        '  x = a and b and c; \n'
+        '} \n'
+    ))
+    p = ASTParser(Lexer(in_stream)).parse()
+    stmt = p.fun_defs[0].stmts[0]
+    assert stmt.expr.op.lexeme == 'and'
+    assert stmt.expr.first.expr.op.lexeme == 'and'
+    assert stmt.expr.first.expr.first.rvalue.path[0].var_name.lexeme == 'a'
+    assert stmt.expr.rest.first.rvalue.path[0].var_name.lexeme == 'c'
+
+def test_redundant_parens_are_dropped():
+    in_stream = FileWrapper(io.StringIO(
+        'void main() { \n'
+        '  x = ((1)); \n'
+        '} \n'
+    ))
+    p = ASTParser(Lexer(in_stream)).parse()
+    stmt = p.fun_defs[0].stmts[0]
+    assert stmt.expr.first.rvalue.value.lexeme == '1'
+    assert stmt.expr.op == None
+
+def test_parens_kept_for_lower_precedence_rhs():
+    in_stream = FileWrapper(io.StringIO(
+        'void main() { \n'
+        '  x = 2 * (1 + 3); \n'
+        '} \n'
+    ))
+    p = ASTParser(Lexer(in_stream)).parse()
+    stmt = p.fun_defs[0].stmts[0]
+    assert stmt.expr.op.lexeme == '*'
+    assert stmt.expr.rest.first.expr.op.lexeme == '+'
+    assert stmt.expr.rest.op == None
+
+def test_not_binds_tighter_than_and():
+    in_stream = FileWrapper(io.StringIO(
+        'void main() { \n'
+        '  x = not a and b; \n'
+        '} \n'
+    ))
+    p = ASTParser(Lexer(in_stream)).parse()
+    stmt = p.fun_defs[0].stmts[0]
+    assert stmt.expr.not_op == False
+    assert stmt.expr.op.lexeme == 'and'
+    assert stmt.expr.first.expr.not_op == True
+    assert stmt.expr.first.expr.first.rvalue.path[0].var_name.lexeme == 'a'
+    assert stmt.expr.first.expr.op == None
+
+
+#----------------------------------------------------------------------
+# Node layout
+#----------------------------------------------------------------------
+
+def test_nodes_are_slotted():
+    in_stream = FileWrapper(io.StringIO(
+        'void main() { \n'
+        '  x = 1 + y; \n'
+        '} \n'
+    ))
+    p = ASTParser(Lexer(in_stream)).parse()
+    stmt = p.fun_defs[0].stmts[0]
+    for node in [p, p.fun_defs[0], stmt, stmt.lvalue[0], stmt.expr,
+                 stmt.expr.first, stmt.expr.first.rvalue, stmt.expr.op]:
+        assert not hasattr(node, '__dict__')
+    with pytest.raises(AttributeError):
+        stmt.expr.extra = None
@@ -94,6 +94,21 @@ def test_multiple_environments():
     assert table.exists('y') and table.get('y') == 'double'
     table.pop_environment()
 
+def test_readd_and_shadowing():
+    table = SymbolTable()
+    table.push_environment()
+    table.add('x', 'int')
+    table.add('x', 'double')
+    assert table.get('x') == 'double'
+    table.push_environment()
+    assert table.exists('x') and not table.exists_in_curr_env('x')
+    table.add('x', 'bool')
+    assert table.exists_in_curr_env('x') and table.get('x') == 'bool'
+    table.pop_environment()
+    assert table.exists_in_curr_env('x') and table.get('x') == 'double'
+    table.pop_environment()
+    assert not table.exists('x') and table.get('x') == None
+
     
 #----------------------------------------------------------------------
 # BASIC FUNCTION DEFINITIONS
@@ -1546,4 +1561,106 @@ def test_four_functions_same_name():
     ))
     with pytest.raises(MyPLError) as e:
         ASTParser(Lexer(in_stream)).parse().accept(SemanticChecker())
-    assert str(e.value).startswith('Static Error:')
\ No newline at end of file
+    assert str(e.value).startswith('Static Error:')
+
+#----------------------------------------------------------------------
+# DEEP PROGRAMS
+#----------------------------------------------------------------------
+
+def test_long_expression_checks():
+    in_stream = FileWrapper(io.StringIO(
+        'void main() { \n'
+        '  string s = ' + ' + '.join(['"a"'] * 20000) + '; \n'
+        '  int x = ' + ' - '.join(['1'] * 20000) + '; \n'
+        '} \n'
+    ))
+    ASTParser(Lexer(in_stream)).parse().accept(SemanticChecker())
+
+def test_deeply_nested_blocks_check():
+    depth = 1500
+    in_stream = FileWrapper(io.StringIO(
+        'void main() { \n'
+        '  int x = 0; \n'
+        + '  while (x < 1) { if (true) { ' * depth
+        + '  x = x + 1; \n'
+        + '  } } ' * depth
+        + '} \n'
+    ))
+    ASTParser(Lexer(in_stream)).parse().accept(SemanticChecker())
+
+def test_deeply_nested_blocks_bad_type():
+    depth = 2000
+    in_stream = FileWrapper(io.StringIO(
+        'void main() { \n'
+        '  int x = 0; \n'
+        + '  while (x < 1) { ' * depth
+        + '  x = "a"; \n'
+        + '  } ' * depth
+        + '} \n'
+    ))
+    with pytest.raises(MyPLError) as e:
+        ASTParser(Lexer(in_stream)).parse().accept(SemanticChecker())
+    assert str(e.value).startswith('Static Error:')
+
+
+#----------------------------------------------------------------------
+# INTERNED TYPES
+#----------------------------------------------------------------------
+
+def test_type_registry_interns_types():
+    types = TypeRegistry()
+    assert types.get('int') is INT
+    assert types.get('void') is VOID
+    assert types.get('int', True) is types.get('int', True)
+    assert types.get('int', True) is not INT
+    assert types.get('Node') is types.get('Node')
+    assert types.get('Node').type_name.token_type == TokenType.ID
+
+def test_indexed_struct_field_types():
+    in_stream = FileWrapper(io.StringIO(
+        'struct S {array int xs;} \n'
+        'void main() { \n'
+        '  S s = new S(new int[3]); \n'
+        '  s.xs[1] = 5; \n'
+        '  int y = s.xs[1] + 1; \n'
+        '  array int zs = s.xs; \n'
+        '} \n'
+    ))
+    ASTParser(Lexer(in_stream)).parse().accept(SemanticChecker())
+
+def test_mismatched_struct_types():
+    in_stream = FileWrapper(io.StringIO(
+        'struct S1 {int x;} \n'
+        'struct S2 {int x;} \n'
+        'void main() { \n'
+        '  S1 s = new S2(1); \n'
+        '} \n'
+    ))
+    with pytest.raises(MyPLError) as e:
+        ASTParser(Lexer(in_stream)).parse().accept(SemanticChecker())
+    assert str(e.value).startswith('Static Error:')
+
+def test_bad_condition_error_position():
+    in_stream = FileWrapper(io.StringIO(
+        'void main() { \n'
+        '  int x = 1; \n'
+        '  while (x + 1) {} \n'
+        '} \n'
+    ))
+    with pytest.raises(MyPLError) as e:
+        ASTParser(Lexer(in_stream)).parse().accept(SemanticChecker())
+    assert 'near line 3' in str(e.value)
+
+def test_struct_field_map():
+    in_stream = FileWrapper(io.StringIO(
+        'struct S {int x; array double ys; S next;} \n'
+        'void main() {} \n'
+    ))
+    checker = SemanticChecker()
+    program = ASTParser(Lexer(in_stream)).parse()
+    program.accept(checker)
+    s = checker.structs['S']
+    assert checker.struct_fields['S']['ys'] == (1, checker.types.get('double', True))
+    assert checker.get_field_type(s, 'x') is INT
+    assert checker.get_field_type(s, 'next') is checker.types.get('S')
+    assert checker.get_field_type(s, 'z') is None
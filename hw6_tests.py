@@ -17,6 +17,10 @@ CLASS: CPSC 326
 
 import pytest
 import io
+import os
+import signal
+import sys
+import time
 
 from mypl_error import *
 from mypl_iowrapper import *
@@ -26,6 +30,23 @@ from mypl_ast_parser import *
 from mypl_var_table import *
 from mypl_code_gen import *
 from mypl_vm import *
+import mypl_bytecode
+from mypl_semantic_checker import SemanticChecker
+from mypl_parallel import compile_program, pack_template, unpack_template
+from mypl_incremental import IncrementalCompiler
+import mypl_batch
+import mypl_server
+from mypl_profile import OpcodeProfiler, SamplingProfiler, CallProfiler, HeapProfiler
+from mypl_timings import PhaseTimer, TokenList, lex_tokens, count_nodes
+import mypl_api
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+from dataclasses import FrozenInstanceError
+
+# the benchmark tools are scripts in benchmarks/, not a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+import compare
 
 
 #----------------------------------------------------------------------
@@ -98,6 +119,24 @@ def test_var_table_multiple_environments():
     assert table.get('z') == None
     assert table.get('u') == None
 
+def test_var_table_duplicate_and_shadowed_names():
+    table = VarTable()
+    table.push_environment()
+    assert table.add('x') == 0
+    assert table.add('x') == 0
+    assert table.add('y') == 2
+    table.push_environment()
+    assert table.add('x') == 3
+    assert table.add('x') == 3
+    assert table.get('x') == 3
+    assert table.get('y') == 2
+    table.pop_environment()
+    assert table.get('x') == 0
+    assert table.add('z') == 3
+    table.pop_environment()
+    assert table.get('x') == None
+    assert table.get('z') == None
+
     
 #----------------------------------------------------------------------
 # SIMPLE GETTING STARTED TESTS
@@ -1193,4 +1232,1133 @@ def test_stoi_try_error(capsys):
     build(program).run()
     captured = capsys.readouterr()
     print(captured.out)
-    assert captured.out == 'ERROR'
\ No newline at end of file
+    assert captured.out == 'ERROR'
+
+#----------------------------------------------------------------------
+# OPERATOR PRECEDENCE
+#----------------------------------------------------------------------
+
+def test_precedence_and_associativity(capsys):
+    program = (
+        'void main() { \n'
+        '  print(10 - 2 - 3); \n'
+        '  print(" "); \n'
+        '  print(1 + 2 * 3); \n'
+        '  print(" "); \n'
+        '  print(2 * 3 / 4); \n'
+        '  print(" "); \n'
+        '  print((1 + 2) * 3); \n'
+        '} \n'
+    )
+    build(program).run()
+    captured = capsys.readouterr()
+    assert captured.out == '5 7 1 9'
+
+def test_double_sum_is_left_associative(capsys):
+    program = (
+        'void main() { \n'
+        '  print(0.1 + 0.2 + 0.3); \n'
+        '  print(" "); \n'
+        '  print("a" + "b" + itos(1 + 2)); \n'
+        '} \n'
+    )
+    build(program).run()
+    captured = capsys.readouterr()
+    assert captured.out == str(0.1 + 0.2 + 0.3) + ' ab3'
+
+
+#----------------------------------------------------------------------
+# DEEP PROGRAMS
+#----------------------------------------------------------------------
+
+def test_long_expression(capsys):
+    program = (
+        'void main() { \n'
+        '  print(' + ' + '.join(['1'] * 20000) + '); \n'
+        '} \n'
+    )
+    build(program).run()
+    captured = capsys.readouterr()
+    assert captured.out == '20000'
+
+def test_deeply_nested_blocks(capsys):
+    depth = 2000
+    program = (
+        'void main() { \n'
+        '  int x = 0; \n'
+        + '  if (x == 0) { ' * depth
+        + '  x = x + 1; \n'
+        + '  } ' * depth
+        + '  print(x); \n'
+        + '} \n'
+    )
+    build(program).run()
+    captured = capsys.readouterr()
+    assert captured.out == '1'
+
+
+#----------------------------------------------------------------------
+# BYTECODE CACHE
+#----------------------------------------------------------------------
+
+CACHED_PROGRAM = (
+    'struct P {int x; double y;} \n'
+    'int f(int a, string s) { \n'
+    '  P p = new P(a, 2.5); \n'
+    '  while (p.x > 0) { p.x = p.x - 1; } \n'
+    '  print(s + "\\n"); \n'
+    '  return p.x; \n'
+    '} \n'
+    'void main() { \n'
+    '  print(f(3, "a\\tb")); \n'
+    '  print(true); print(null); \n'
+    '} \n'
+)
+
+def test_bytecode_round_trip(capsys):
+    vm = build(CACHED_PROGRAM)
+    text = mypl_bytecode.dumps(vm.frame_templates, CACHED_PROGRAM)
+    templates = mypl_bytecode.loads(text, CACHED_PROGRAM)
+    assert templates == vm.frame_templates
+    cached_vm = VM()
+    cached_vm.frame_templates = templates
+    cached_vm.run()
+    captured = capsys.readouterr()
+    assert captured.out == 'a\tb\n0truenull'
+
+def test_bytecode_stale_entries():
+    vm = build(CACHED_PROGRAM)
+    text = mypl_bytecode.dumps(vm.frame_templates, CACHED_PROGRAM)
+    # different source
+    assert mypl_bytecode.loads(text, CACHED_PROGRAM + ' ') is None
+    # different compiler
+    stale = text.replace(mypl_bytecode.compiler_stamp(), '0:stale')
+    assert mypl_bytecode.loads(stale, CACHED_PROGRAM) is None
+
+def test_bytecode_corrupt_entries():
+    vm = build(CACHED_PROGRAM)
+    text = mypl_bytecode.dumps(vm.frame_templates, CACHED_PROGRAM)
+    assert mypl_bytecode.loads(text[:len(text)//2], CACHED_PROGRAM) is None
+    assert mypl_bytecode.loads('', CACHED_PROGRAM) is None
+    assert mypl_bytecode.loads('[1, 2]', CACHED_PROGRAM) is None
+    assert mypl_bytecode.loads(text.replace('"PUSH"', '"PUSHX"'), CACHED_PROGRAM) is None
+    assert mypl_bytecode.loads(text.replace('"main",0', '"main","0"'), CACHED_PROGRAM) is None
+
+def test_bytecode_cache_files(tmp_path):
+    vm = build(CACHED_PROGRAM)
+    source_path = str(tmp_path / 'prog.mypl')
+    path = mypl_bytecode.cache_path(source_path, CACHED_PROGRAM)
+    assert path == str(tmp_path / 'prog.myplc')
+    assert mypl_bytecode.load(path, CACHED_PROGRAM) is None
+    mypl_bytecode.save(path, CACHED_PROGRAM, vm.frame_templates)
+    assert mypl_bytecode.load(path, CACHED_PROGRAM) == vm.frame_templates
+    path = mypl_bytecode.cache_path(source_path, CACHED_PROGRAM, str(tmp_path / 'cache'))
+    mypl_bytecode.save(path, CACHED_PROGRAM, vm.frame_templates)
+    assert mypl_bytecode.load(path, CACHED_PROGRAM) == vm.frame_templates
+    assert os.listdir(tmp_path / 'cache') == [os.path.basename(path)]
+
+
+#----------------------------------------------------------------------
+# LAZY CODE GENERATION
+#----------------------------------------------------------------------
+
+def build_lazy(program):
+    vm = VM()
+    cg = CodeGenerator(vm, lazy=True)
+    ASTParser(Lexer(FileWrapper(io.StringIO(program)))).parse().accept(cg)
+    return vm
+
+def test_lazy_lowers_only_called_functions(capsys):
+    program = (
+        'int unused(int x) {return x;} \n'
+        'int fac(int n) { \n'
+        '  if (n <= 1) {return 1;} \n'
+        '  return n * fac(n - 1); \n'
+        '} \n'
+        'void main() {print(fac(5));} \n'
+    )
+    vm = build_lazy(program)
+    assert vm.frame_templates == {}
+    vm.run()
+    captured = capsys.readouterr()
+    assert captured.out == '120'
+    assert set(vm.frame_templates) == {'main', 'fac'}
+    assert set(vm.unlowered_functions) == {'unused'}
+
+def test_lazy_matches_eager_code():
+    program = (
+        'struct P {int x; P next;} \n'
+        'P mk(int x) {return new P(x, null);} \n'
+        'void main() { \n'
+        '  P p = mk(1); \n'
+        '  for (int i = 0; i < 3; i = i + 1) {p.x = p.x + i;} \n'
+        '  print(p.x); \n'
+        '} \n'
+    )
+    eager = build(program)
+    lazy = build_lazy(program)
+    for name in eager.frame_templates:
+        assert lazy.get_frame_template(name) == eager.frame_templates[name]
+
+def test_lazy_missing_main():
+    vm = build_lazy('int f() {return 1;}')
+    with pytest.raises(MyPLError) as e:
+        vm.run()
+    assert str(e.value).startswith('VM Error:')
+
+
+#----------------------------------------------------------------------
+# PARALLEL COMPILATION
+#----------------------------------------------------------------------
+
+def many_functions(count, bad=()):
+    program = 'struct P {int x;} \n'
+    for i in range(count):
+        value = '"oops"' if i in bad else 'p.x'
+        program += f'int f{i}(int a) {{P p = new P({i}); int t = {value}; return a + t;}} \n'
+    program += 'void main() {print(f3(1) + f7(2));} \n'
+    return program
+
+def test_parallel_compile_matches_serial(capsys):
+    program = many_functions(10)
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(program)))).parse()
+    serial = VM()
+    ast.accept(SemanticChecker())
+    ast.accept(CodeGenerator(serial))
+    vm = VM()
+    compile_program(ast, vm, workers=2, chunk_size=3)
+    assert list(vm.frame_templates) == list(serial.frame_templates)
+    assert vm.frame_templates == serial.frame_templates
+    vm.run()
+    captured = capsys.readouterr()
+    assert captured.out == '13'
+
+def test_parallel_compile_first_error_wins():
+    program = many_functions(10, bad=(8, 4, 5))
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(program)))).parse()
+    with pytest.raises(MyPLError) as serial:
+        ast.accept(SemanticChecker())
+    for chunk_size in [1, 2, 5]:
+        with pytest.raises(MyPLError) as e:
+            compile_program(ast, VM(), workers=2, chunk_size=chunk_size)
+        assert str(e.value) == str(serial.value)
+        assert 'line 6' in str(e.value)
+
+
+#----------------------------------------------------------------------
+# INCREMENTAL COMPILATION
+#----------------------------------------------------------------------
+
+INCREMENTAL_PROGRAM = (
+    'struct P {int x;} \n'
+    'int getx(P p) {return p.x;} \n'
+    'int twice(int a) {return a + a;} \n'
+    'void main() { \n'
+    '  P p = new P(4); \n'
+    '  print(twice(getx(p))); \n'
+    '} \n'
+)
+
+def test_incremental_reuses_unchanged(capsys):
+    compiler = IncrementalCompiler()
+    compiler.compile(INCREMENTAL_PROGRAM)
+    assert (compiler.parsed, compiler.lowered) == (4, 3)
+    vm = compiler.compile(INCREMENTAL_PROGRAM)
+    assert (compiler.parsed, compiler.lowered) == (0, 0)
+    assert vm.frame_templates == build(INCREMENTAL_PROGRAM).frame_templates
+    vm.run()
+    captured = capsys.readouterr()
+    assert captured.out == '8'
+
+def test_incremental_body_edit(capsys):
+    compiler = IncrementalCompiler()
+    compiler.compile(INCREMENTAL_PROGRAM)
+    vm = compiler.compile(INCREMENTAL_PROGRAM.replace('a + a', 'a * a'))
+    assert (compiler.parsed, compiler.lowered) == (1, 1)
+    vm.run()
+    captured = capsys.readouterr()
+    assert captured.out == '16'
+
+def test_incremental_signature_change():
+    compiler = IncrementalCompiler()
+    compiler.compile(INCREMENTAL_PROGRAM)
+    program = INCREMENTAL_PROGRAM.replace('int twice(int a) {return a + a;}',
+                                          'int twice(string a) {return 1;}')
+    with pytest.raises(MyPLError) as e:
+        compiler.compile(program)
+    assert str(e.value).startswith('Static Error:')
+    # the caller is rechecked, not just the edited function
+    compiler.compile(program.replace('print(twice(getx(p)))', 'print(twice("a"))'))
+    assert compiler.lowered == 2
+
+def test_incremental_struct_layout_change():
+    compiler = IncrementalCompiler()
+    compiler.compile(INCREMENTAL_PROGRAM)
+    with pytest.raises(MyPLError) as e:
+        compiler.compile(INCREMENTAL_PROGRAM.replace('struct P {int x;}', 'struct P {string x;}'))
+    assert 'line 2' in str(e.value)
+
+def test_incremental_moved_definitions():
+    compiler = IncrementalCompiler()
+    compiler.compile(INCREMENTAL_PROGRAM)
+    program = '\n\n' + INCREMENTAL_PROGRAM.replace('print(twice(getx(p)))', 'print(twice(p))')
+    with pytest.raises(MyPLError) as e:
+        compiler.compile(program)
+    assert compiler.parsed == 1
+    assert 'line 8' in str(e.value)
+
+def test_incremental_parse_error():
+    program = INCREMENTAL_PROGRAM.replace('return a + a;', 'return a +;')
+    with pytest.raises(MyPLError) as expected:
+        build(program)
+    with pytest.raises(MyPLError) as e:
+        IncrementalCompiler().compile(program)
+    assert str(e.value) == str(expected.value)
+
+
+#----------------------------------------------------------------------
+# BATCH RUNS
+#----------------------------------------------------------------------
+
+def write_programs(directory, programs):
+    for name, program in programs.items():
+        (directory / name).write_text(program)
+
+def test_batch_captures_output_and_status(tmp_path):
+    write_programs(tmp_path, {
+        'a.mypl': 'void main() {print("a"); print(1 + 2);}',
+        'b.mypl': 'void main() {int x = 1 / 0;}',
+        'c.mypl': 'void main() {int x = "no";}',
+        'notes.txt': 'not a program',
+    })
+    results = mypl_batch.run_batch([str(tmp_path)], workers=2)
+    assert [os.path.basename(r.path) for r in results] == ['a.mypl', 'b.mypl', 'c.mypl']
+    assert [r.status for r in results] == [0, 1, 1]
+    assert results[0].output == 'a3'
+    assert results[0].error is None
+    assert results[1].output.startswith('VM Error:')
+    assert results[2].output.startswith('Static Error:')
+    assert results[2].output == results[2].error + '\n'
+
+def test_batch_programs_are_isolated(tmp_path):
+    # each program gets its own VM and empty input
+    program = 'struct S {int x;} void main() {S s = new S(1); s.x = s.x + 1; print(s.x);}'
+    write_programs(tmp_path, {'a.mypl': program, 'b.mypl': program,
+                              'c.mypl': 'void main() {print(input());}'})
+    results = mypl_batch.run_batch([str(tmp_path)], workers=1)
+    assert results[0].output == results[1].output == '2'
+    assert results[2].status == 1
+
+def test_batch_report(tmp_path):
+    write_programs(tmp_path, {'a.mypl': 'void main() {}'})
+    results = mypl_batch.run_batch([str(tmp_path / 'a.mypl'), str(tmp_path / 'x.mypl')])
+    assert results[1].status == 1
+    assert results[1].output.startswith("ERROR: Could not open file")
+    text = mypl_batch.report(results)
+    assert str(tmp_path / 'x.mypl') in text
+    assert text.splitlines()[-1].startswith('2 programs, 1 failed')
+
+
+#----------------------------------------------------------------------
+# COMPILE-AND-RUN SERVER
+#----------------------------------------------------------------------
+
+async def send_requests(address, requests):
+    reader, writer = await asyncio.open_unix_connection(address)
+    responses = []
+    for req in requests:
+        writer.write(json.dumps(req).encode('utf-8') + b'\n')
+        await writer.drain()
+        responses.append(json.loads(await reader.readline()))
+    writer.close()
+    return responses
+
+def test_server_concurrent_clients(tmp_path):
+    echo = 'void main() {string s = input(); print(s + "!");}'
+    async def run():
+        server = mypl_server.MyPLServer(workers=2, limits=ExecutionLimits(max_instructions=10000))
+        address = await server.start(str(tmp_path / 'mypl.sock'))
+        try:
+            clients = [send_requests(address, [{'source': echo, 'stdin': f'c{i}\n'}] * 2)
+                       for i in range(4)]
+            clients.append(send_requests(address, [
+                {'source': 'void main() {while (true) {}}'},
+                {'source': 'void main() {int x = "a";}'},
+                {'source': 'void main() {print(1);}', 'max_instructions': 2.5},
+                {'stdin': ''},
+            ]))
+            return await asyncio.gather(*clients)
+        finally:
+            await server.close()
+    results = asyncio.run(run())
+    for i, responses in enumerate(results[:4]):
+        assert [r['output'] for r in responses] == [f'c{i}!', f'c{i}!']
+        assert [r['status'] for r in responses] == [0, 0]
+        assert responses[1]['cached']
+    limit, static, bad_limit, missing = results[4]
+    assert limit['status'] == 1
+    assert limit['error'].startswith('VM Error: instruction limit exceeded')
+    assert static['output'] == static['error'] + '\n'
+    assert static['error'].startswith('Static Error:')
+    assert bad_limit['error'].startswith('Bad request:')
+    assert missing['error'].startswith('Bad request:')
+
+def test_server_time_limit(tmp_path):
+    async def run():
+        server = mypl_server.MyPLServer(workers=1, limits=ExecutionLimits(time_limit=0.2))
+        address = await server.start(str(tmp_path / 'mypl.sock'))
+        try:
+            return await send_requests(address, [
+                {'source': 'void main() {while (true) {}}'},
+                {'source': 'void main() {print("ok");}', 'time_limit': 100},
+            ])
+        finally:
+            await server.close()
+    timeout, ok = asyncio.run(run())
+    assert timeout['error'].startswith('VM Error: time limit exceeded near line 1')
+    assert ok['output'] == 'ok'
+
+def test_server_recovers_from_dead_workers(tmp_path):
+    source = 'void main() {print("ok");}'
+    async def run():
+        server = mypl_server.MyPLServer(workers=1)
+        address = await server.start(str(tmp_path / 'mypl.sock'))
+        try:
+            before = await send_requests(address, [{'source': source}])
+            # kill the worker (as the OS might), then rerun the cached program
+            for process in list(server.executor._processes.values()):
+                process.kill()
+                process.join()
+            after = await send_requests(address, [{'source': source}] * 2)
+            return before + after
+        finally:
+            await server.close()
+    before, died, ok = asyncio.run(run())
+    assert before['output'] == 'ok'
+    assert died['status'] == 1
+    assert died['error'] == 'Server Error: worker process died'
+    assert ok['status'] == 0 and ok['output'] == 'ok' and ok['cached']
+
+def test_server_compiler_failure(tmp_path):
+    # the parser runs out of stack, and the client still gets a response
+    nested = 'void main() {int x = ' + '(' * 3000 + '1' + ')' * 3000 + ';}'
+    async def run():
+        server = mypl_server.MyPLServer(workers=1)
+        address = await server.start(str(tmp_path / 'mypl.sock'))
+        try:
+            return await send_requests(address, [{'source': nested},
+                                                 {'source': 'void main() {print(1);}'}])
+        finally:
+            await server.close()
+    failed, ok = asyncio.run(run())
+    assert failed['status'] == 1
+    assert failed['error'].startswith('Compiler Error: RecursionError')
+    assert ok['output'] == '1'
+
+@pytest.mark.skipif(not hasattr(signal, 'setitimer'), reason='needs timer signals')
+def test_server_hard_timeout(monkeypatch):
+    # a run the VM's own checks miss is still stopped by the worker timer
+    monkeypatch.setattr(mypl_server, 'HARD_TIMEOUT_GRACE', 0.0)
+    packed = mypl_server._compile('void main() {print("a"); while (true) {}}', None)
+    limits = ExecutionLimits(time_limit=0.1, check_interval=10 ** 9)
+    status, output, error = mypl_server._execute(packed, '', limits)
+    assert status == 1
+    assert error == 'VM Error: time limit exceeded'
+    assert output == 'a' + error + '\n'
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+
+def test_runs_use_their_own_streams(tmp_path, capsys):
+    # batch and server runs keep their I/O apart even in threads
+    program = 'void main() {string s = input(); for (int i = 0; i < 200; i = i + 1) {print(s);}}'
+    packed = mypl_server._compile(program, None)
+    write_programs(tmp_path, {'a.mypl': 'void main() {for (int i = 0; i < 200; i = i + 1) {print("a");}}'})
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            served = list(executor.map(lambda c: mypl_server._execute(packed, c, ExecutionLimits()),
+                                       'xyzw' * 4))
+            batched = list(executor.map(mypl_batch.run_program, [str(tmp_path / 'a.mypl')] * 8))
+    finally:
+        sys.setswitchinterval(interval)
+    assert [output for _, output, _ in served] == [c * 200 for c in 'xyzw' * 4]
+    assert [result.output for result in batched] == ['a' * 200] * 8
+    assert capsys.readouterr().out == ''
+
+def test_server_address_parsing():
+    assert mypl_server.parse_address('8000') == (None, '127.0.0.1', 8000)
+    assert mypl_server.parse_address('localhost:9') == (None, 'localhost', 9)
+    assert mypl_server.parse_address('/tmp/mypl.sock') == ('/tmp/mypl.sock', None, None)
+
+
+#----------------------------------------------------------------------
+# EXECUTION LIMITS
+#----------------------------------------------------------------------
+
+def test_instruction_limit_is_exact(capsys):
+    # straight-line code runs each instruction once
+    program = 'void main() {int x = 1; int y = x + 2; print(y);}'
+    count = len(build(program).frame_templates['main'].instructions)
+    for interval in [1, 2, 1000]:
+        vm = build(program)
+        vm.limits = ExecutionLimits(max_instructions=count, check_interval=interval)
+        vm.run()
+        vm = build(program)
+        vm.limits = ExecutionLimits(max_instructions=count - 1, check_interval=interval)
+        with pytest.raises(VMLimitError) as e:
+            vm.run()
+        assert e.value.limit == 'instruction'
+        assert e.value.function_name == 'main'
+        assert e.value.pc == count - 1
+        assert str(e.value).startswith('VM Error: instruction limit exceeded near line 1')
+        assert f'(in main at {count - 1}: OpCode.RET())' in str(e.value)
+    captured = capsys.readouterr()
+    assert captured.out == '33' * 3
+
+def test_call_depth_limit():
+    vm = build('int f(int x) {return f(x + 1);} void main() {f(0);}')
+    vm.limits = ExecutionLimits(max_call_depth=50, check_interval=10)
+    with pytest.raises(VMLimitError) as e:
+        vm.run()
+    assert e.value.limit == 'call depth'
+    assert e.value.function_name == 'f'
+    assert 50 < len(vm.call_stack) <= 60
+
+def test_heap_object_limit():
+    vm = build('void main() {while (true) {array int xs = new int[2];}}')
+    vm.limits = ExecutionLimits(max_heap_objects=100)
+    with pytest.raises(VMLimitError) as e:
+        vm.run()
+    assert e.value.limit == 'heap object'
+    assert len(vm.array_heap) == 100
+
+def test_heap_element_limit():
+    vm = build('void main() {while (true) {array int xs = new int[600];}}')
+    vm.limits = ExecutionLimits(max_heap_elements=1000)
+    with pytest.raises(VMLimitError) as e:
+        vm.run()
+    assert e.value.limit == 'heap element'
+    assert vm.heap_elements == 600
+    assert len(vm.array_heap) == 1
+
+def test_array_length_limit():
+    vm = build('void main() {array int xs = new int[40000000];}')
+    vm.limits = ExecutionLimits(max_array_length=10_000_000, time_limit=0.05)
+    start = time.perf_counter()
+    with pytest.raises(VMLimitError) as e:
+        vm.run()
+    assert time.perf_counter() - start < 1
+    assert e.value.limit == 'array length'
+    assert vm.array_heap == {}
+
+def test_array_length_unlimited():
+    # without limits there is no cap on array lengths
+    vm = build('void main() {array int xs = new int[20000000]; print(itos(length(xs)));}')
+    vm.stdout = io.StringIO()
+    vm.run()
+    assert vm.stdout.getvalue() == '20000000'
+    assert vm.heap_elements == 20000000
+
+def test_time_limit_checked_on_allocation():
+    # the periodic check never comes, so the allocation check stops it
+    vm = build('void main() {while (true) {array int xs = new int[10];}}')
+    vm.limits = ExecutionLimits(time_limit=0.05, check_interval=10 ** 9)
+    with pytest.raises(VMLimitError) as e:
+        vm.run()
+    assert e.value.limit == 'time'
+    assert str(e.value).startswith('VM Error: time limit exceeded near line 1')
+
+def test_time_limit():
+    vm = build('void main() {while (true) {}}')
+    vm.limits = ExecutionLimits(time_limit=0.05)
+    with pytest.raises(MyPLError) as e:
+        vm.run()
+    assert str(e.value).startswith('VM Error: time limit exceeded near line 1, column 21')
+
+def test_limits_allow_normal_runs(capsys):
+    vm = build('int f(int x) {if (x == 0) {return 0;} return 1 + f(x - 1);} '
+               'void main() {print(f(100));}')
+    vm.limits = ExecutionLimits(max_instructions=10000, max_call_depth=200,
+                                max_heap_objects=0, time_limit=10)
+    vm.run()
+    captured = capsys.readouterr()
+    assert captured.out == '100'
+
+
+#----------------------------------------------------------------------
+# OPCODE PROFILER
+#----------------------------------------------------------------------
+
+PROFILED_PROGRAM = (
+    'int sq(int x) {return x * x;} \n'
+    'void main() { \n'
+    '  int t = 0; \n'
+    '  for (int i = 0; i < 10; i = i + 1) {t = t + sq(i);} \n'
+    '  print(t); \n'
+    '} \n'
+)
+
+def test_profiler_counts(capsys):
+    vm = build(PROFILED_PROGRAM)
+    vm.profiler = OpcodeProfiler()
+    vm.run()
+    captured = capsys.readouterr()
+    assert captured.out == '285'
+    report = vm.profiler.report(top=1000)
+    opcodes = {row['opcode']: row['count'] for row in report['opcodes']}
+    functions = {row['function']: row['count'] for row in report['functions']}
+    assert opcodes['CALL'] == 10
+    assert opcodes['MUL'] == 10
+    assert opcodes['WRITE'] == 1
+    # sq runs its instructions once per call
+    assert functions['sq'] == 10 * len(vm.frame_templates['sq'].instructions)
+    assert report['instructions'] == sum(opcodes.values()) == sum(functions.values())
+    assert report['instructions'] == sum(row['count'] for row in report['hottest'])
+
+def test_profiler_reports_ir(capsys):
+    vm = build(PROFILED_PROGRAM)
+    vm.profiler = OpcodeProfiler()
+    vm.run()
+    report = vm.profiler.report(top=1000)
+    # instructions show their IR (as before they ran)
+    rows = {(row['function'], row['pc']): row for row in report['hottest']}
+    for (name, pc), row in rows.items():
+        assert row['instr'] == str(build(PROFILED_PROGRAM).frame_templates[name].instructions[pc])
+    assert rows[('sq', 3)]['instr'] == 'OpCode.MUL()'
+    assert rows[('sq', 3)]['count'] == 10
+    assert len(vm.profiler.report(top=3)['hottest']) == 3
+    table = vm.profiler.table()
+    assert 'sq 3: OpCode.MUL()' in table
+    assert table.splitlines()[0] == f'{report["instructions"]} instructions in {report["time"]:.3f} s'
+
+def test_profiler_with_limits():
+    vm = build(PROFILED_PROGRAM)
+    vm.profiler = OpcodeProfiler()
+    vm.limits = ExecutionLimits(max_instructions=50)
+    with pytest.raises(VMLimitError):
+        vm.run()
+    assert vm.profiler.report()['instructions'] == 50
+
+
+#----------------------------------------------------------------------
+# SOURCE LINE TABLES
+#----------------------------------------------------------------------
+
+LINES_PROGRAM = (
+    'int f(int x) { \n'
+    '  int y = x - 2; \n'
+    '  return x / y; \n'
+    '} \n'
+    'void main() { \n'
+    '  for (int i = 0; i < 3; i = i + 1) { \n'
+    '    print(f(i + 2)); \n'
+    '  } \n'
+    '} \n'
+)
+
+def test_line_table_runs():
+    vm = build(LINES_PROGRAM)
+    for template in vm.frame_templates.values():
+        table = template.line_table
+        # runs start at pc 0, in increasing pc order, with new positions
+        assert table[0][0] == 0
+        for run, next_run in zip(table, table[1:]):
+            assert run[0] < next_run[0] < len(template.instructions)
+            assert run[1] != next_run[1]
+        assert len(table) < len(template.instructions)
+        assert len(template.columns) == len(template.instructions)
+
+def test_line_table_runs_per_line():
+    # one run per stretch of a line, however many tokens it has
+    vm = build('void main() { \n  int x = 1 + 2 * 3 - 4; \n  print(itos(x) + "!"); \n}')
+    main = vm.frame_templates['main']
+    assert [line for _, line in main.line_table] == [2, 3, 1]
+    assert len(set(main.columns)) > 3
+
+def test_line_table_positions():
+    vm = build(LINES_PROGRAM)
+    f = vm.frame_templates['f']
+    div = [i for i, instr in enumerate(f.instructions) if instr.opcode == OpCode.DIV]
+    assert f.source_position(div[0]) == (3, 12)
+    main = vm.frame_templates['main']
+    lines = {main.source_position(i)[0] for i, instr in enumerate(main.instructions)
+             if instr.opcode in (OpCode.JMPF, OpCode.JMP, OpCode.CMPLT)}
+    assert lines == {6}
+    call = [i for i, instr in enumerate(main.instructions) if instr.opcode == OpCode.CALL]
+    assert main.source_position(call[0]) == (7, 11)
+    assert VMFrameTemplate('g', 0, [RET()]).source_position(0) is None
+
+def test_runtime_error_names_source_line(capsys):
+    vm = build(LINES_PROGRAM)
+    with pytest.raises(MyPLError) as e:
+        vm.run()
+    assert str(e.value) == ('VM Error: No division by 0 near line 3, column 12 '
+                            '(in f at 7: OpCode.DIV())')
+
+def test_line_tables_survive_caching_and_moves():
+    vm = build(LINES_PROGRAM)
+    text = mypl_bytecode.dumps(vm.frame_templates, LINES_PROGRAM)
+    cached = mypl_bytecode.loads(text, LINES_PROGRAM)
+    assert cached['f'].line_table == vm.frame_templates['f'].line_table
+    assert cached['f'].columns == vm.frame_templates['f'].columns
+    unpacked = unpack_template(pack_template(vm.frame_templates['f']))
+    assert unpacked.source_position(7) == (3, 12)
+    compiler = IncrementalCompiler()
+    compiler.compile(LINES_PROGRAM)
+    moved = compiler.compile('\n\n' + LINES_PROGRAM)
+    assert compiler.lowered == 0
+    assert moved.frame_templates['f'].source_position(7) == (5, 12)
+    with pytest.raises(MyPLError) as e:
+        moved.run()
+    assert 'near line 5, column 12' in str(e.value)
+
+def test_profile_names_source_lines():
+    vm = build(LINES_PROGRAM)
+    vm.profiler = OpcodeProfiler()
+    with pytest.raises(MyPLError):
+        vm.run()
+    report = vm.profiler.report(top=1000)
+    rows = {(row['function'], row['pc']): row for row in report['hottest']}
+    assert rows[('f', 7)]['line'] == 3
+    assert {row['line'] for row in report['lines']} == {1, 2, 3, 6, 7}
+
+
+#----------------------------------------------------------------------
+# SAMPLING PROFILER
+#----------------------------------------------------------------------
+
+def test_sampling_profiler_sample_count(capsys):
+    vm = build(PROFILED_PROGRAM)
+    vm.profiler = OpcodeProfiler()
+    vm.run()
+    total = vm.profiler.report()['instructions']
+    vm = build(PROFILED_PROGRAM)
+    vm.profiler = SamplingProfiler(interval=10)
+    vm.run()
+    # the first instruction is sampled, then every 10th
+    assert sum(vm.profiler.stacks.values()) == -(-total // 10)
+    folded = vm.profiler.folded()
+    counts = [int(line.rsplit(' ', 1)[1]) for line in folded.splitlines()]
+    assert sum(counts) == -(-total // 10)
+
+def test_sampling_profiler_folded_stacks(capsys):
+    vm = build(PROFILED_PROGRAM)
+    vm.profiler = SamplingProfiler(interval=1)
+    vm.run()
+    stacks = dict(line.rsplit(' ', 1) for line in vm.profiler.folded('function').splitlines())
+    assert set(stacks) == {'main', 'main;sq'}
+    # sq runs its instructions once per call
+    assert int(stacks['main;sq']) == 10 * len(vm.frame_templates['sq'].instructions)
+    by_line = vm.profiler.folded().splitlines()
+    assert all(line.startswith('main:') for line in by_line)
+    assert any(line.startswith('main:4;sq:1 ') for line in by_line)
+    by_pc = vm.profiler.folded('pc')
+    assert 'main@' in by_pc and ';sq@3 10\n' in by_pc
+
+def test_sampling_profiler_recursion():
+    vm = build('int f(int n) {if (n == 0) {return 0;} return f(n - 1);} '
+               'void main() {f(5);}')
+    vm.profiler = SamplingProfiler(interval=1)
+    vm.run()
+    deepest = max(vm.profiler.folded('function').splitlines(), key=len)
+    assert deepest.split(' ')[0] == 'main;' + ';'.join(['f'] * 6)
+
+
+#----------------------------------------------------------------------
+# CALL PROFILER
+#----------------------------------------------------------------------
+
+def test_call_profiler_counts(capsys):
+    vm = build(PROFILED_PROGRAM)
+    vm.profiler = OpcodeProfiler()
+    vm.run()
+    total = vm.profiler.report()['instructions']
+    vm = build(PROFILED_PROGRAM)
+    vm.call_profiler = CallProfiler()
+    vm.run()
+    report = vm.call_profiler.report()
+    functions = {row['function']: row for row in report['functions']}
+    sq_len = len(vm.frame_templates['sq'].instructions)
+    assert functions['sq']['calls'] == 10
+    assert functions['sq']['instructions'] == 10 * sq_len
+    assert functions['sq']['self_instructions'] == 10 * sq_len
+    assert functions['main']['calls'] == 1
+    assert functions['main']['instructions'] == total
+    assert functions['main']['self_instructions'] == total - 10 * sq_len
+    assert report['instructions'] == total
+    assert report['calls'] == 11
+    assert report['edges'] == [{'caller': 'main', 'callee': 'sq', 'calls': 10}]
+    assert functions['main']['time'] >= functions['sq']['time']
+
+def test_call_profiler_recursion():
+    vm = build('int f(int n) {if (n == 0) {return 0;} return f(n - 1);} '
+               'void main() {f(5);}')
+    vm.call_profiler = CallProfiler()
+    vm.run()
+    report = vm.call_profiler.report()
+    functions = {row['function']: row for row in report['functions']}
+    # the outermost call of f includes the recursive ones only once
+    assert functions['f']['calls'] == 6
+    assert functions['f']['instructions'] == functions['f']['self_instructions']
+    assert functions['main']['instructions'] == report['instructions']
+    edges = {(row['caller'], row['callee']): row['calls'] for row in report['edges']}
+    assert edges == {('main', 'f'): 1, ('f', 'f'): 5}
+
+def test_call_profiler_with_limits(capsys):
+    vm = build(PROFILED_PROGRAM)
+    vm.call_profiler = CallProfiler()
+    vm.limits = ExecutionLimits(max_instructions=50)
+    with pytest.raises(VMLimitError):
+        vm.run()
+    # the calls still running are ended at the last call or return
+    report = vm.call_profiler.report()
+    assert vm.call_profiler.stack == []
+    assert 0 < report['instructions'] <= 50
+    functions = {row['function']: row for row in report['functions']}
+    assert functions['main']['instructions'] == report['instructions']
+    assert 'caller -> callee' in vm.call_profiler.table()
+
+#----------------------------------------------------------------------
+# HEAP REPORT
+#----------------------------------------------------------------------
+
+HEAP_PROGRAM = (
+    'struct Node {int val; Node next;} \n'
+    'Node push(Node head, int v) {return new Node(v, head);} \n'
+    'void main() { \n'
+    '  Node head = null; \n'
+    '  for (int i = 0; i < 20; i = i + 1) {head = push(head, i);} \n'
+    '  array string names = new string[3]; \n'
+    '  names[0] = "a string long enough to count"; \n'
+    '  array int xs = new int[1000]; \n'
+    '} \n'
+)
+
+def test_alloc_instrs_name_types():
+    vm = build(HEAP_PROGRAM)
+    assert ALLOCS('Node') in vm.frame_templates['push'].instructions
+    main = vm.frame_templates['main'].instructions
+    assert ALLOCA('string') in main and ALLOCA('int') in main
+
+def test_heap_profiler_types_and_sites():
+    vm = build(HEAP_PROGRAM)
+    vm.heap_profiler = HeapProfiler()
+    vm.run()
+    report = vm.heap_profiler.report()
+    assert report['objects'] == 22 == len(vm.struct_heap) + len(vm.array_heap)
+    types = {row['type']: row for row in report['types']}
+    assert set(types) == {'Node', 'array string', 'array int'}
+    assert types['Node']['kind'] == 'struct' and types['Node']['objects'] == 20
+    assert types['array int']['kind'] == 'array' and types['array int']['objects'] == 1
+    # the bigger array comes first and holds at least its 1000 references
+    assert report['types'][0]['type'] == 'array int'
+    assert types['array int']['bytes'] >= 8000
+    # strings held are counted in their array's size
+    assert types['array string']['bytes'] > sys.getsizeof([None] * 3)
+    assert report['bytes'] == sum(row['bytes'] for row in report['types'])
+    assert report['peak'] == {'objects': 22, 'bytes': report['bytes']}
+    sites = {(row['function'], row['line']): row for row in report['sites']}
+    assert sites[('push', 2)]['objects'] == 20
+    assert sites[('push', 2)]['instr'] == str(ALLOCS('Node'))
+    assert sites[('main', 6)]['type'] == 'array string'
+    assert sites[('main', 8)]['type'] == 'array int'
+
+def test_heap_profiler_no_allocations():
+    vm = build('void main() {int x = 1;}')
+    vm.heap_profiler = HeapProfiler()
+    vm.run()
+    report = vm.heap_profiler.report()
+    assert report['objects'] == 0 and report['types'] == [] and report['sites'] == []
+    assert '0 objects' in vm.heap_profiler.table()
+
+#----------------------------------------------------------------------
+# PHASE TIMINGS
+#----------------------------------------------------------------------
+
+def test_instruction_count(capsys):
+    vm = build(PROFILED_PROGRAM)
+    vm.profiler = OpcodeProfiler()
+    vm.run()
+    total = vm.profiler.report()['instructions']
+    vm = build(PROFILED_PROGRAM)
+    vm.run()
+    assert vm.instruction_count == total
+    # also when checkpoints are scheduled
+    vm = build(PROFILED_PROGRAM)
+    vm.limits = ExecutionLimits(max_instructions=total, check_interval=7)
+    vm.run()
+    assert vm.instruction_count == total
+
+def test_token_list_parse():
+    program = 'int f(int x) {return x + 1;} \nvoid main() {print(itos(f(2)));} \n'
+    tokens = lex_tokens(Lexer(FileWrapper(io.StringIO(program))))
+    assert tokens[-1].token_type == TokenType.EOS
+    assert tokens[0].lexeme == 'int' and len(tokens) == 31
+    token_list = TokenList(tokens)
+    for _ in range(len(tokens) + 2):
+        last = token_list.next_token()
+    assert last.token_type == TokenType.EOS
+    ast = ASTParser(TokenList(tokens)).parse()
+    assert [f.fun_name.lexeme for f in ast.fun_defs] == ['f', 'main']
+
+def test_count_nodes():
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO('void main() {}')))).parse()
+    # program, function and its return type
+    assert count_nodes(ast) == 3
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO('void main() {int x = 1;}')))).parse()
+    # plus the declaration, its var def and data type, and the expr,
+    # term and rvalue
+    assert count_nodes(ast) == 9
+
+def test_phase_timer():
+    timer = PhaseTimer()
+    with timer.phase('lex'):
+        pass
+    with pytest.raises(MyPLError):
+        with timer.phase('parse'):
+            raise MyPLError('failed')
+    assert [name for name, _, _, _ in timer.phases] == ['lex', 'parse']
+    timer.counts['tokens'] = 12
+    timer.functions = {'main': 4}
+    table = timer.table()
+    assert 'total' in table and 'tokens:' in table and 'main' in table
+    assert 'RSS change (MB)' in table
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='needs /proc')
+def test_phase_timer_memory():
+    # each phase gets its own peak and change, not the process's
+    timer = PhaseTimer()
+    with timer.phase('big'):
+        data = bytearray(64 * 2 ** 20)
+        data[::4096] = b'x' * len(data[::4096])
+        del data
+    with timer.phase('small'):
+        data = [0] * 1000
+    (_, _, big_change, big_peak), (_, _, small_change, small_peak) = timer.phases
+    assert timer.phase_peaks
+    assert big_peak - small_peak > 32 * 2 ** 20
+    assert abs(big_change) < 32 * 2 ** 20 and abs(small_change) < 32 * 2 ** 20
+    assert 'peak RSS (MB)' in timer.table()
+
+#----------------------------------------------------------------------
+# EMBEDDING API
+#----------------------------------------------------------------------
+
+EMBEDDED_PROGRAM = (
+    'struct Box {int value;} \n'
+    'void main() { \n'
+    '  int n = stoi(input()); \n'
+    '  Box b = new Box(n); \n'
+    '  for (int i = 0; i < n; i = i + 1) {print(itos(b.value * i) + " ");} \n'
+    '} \n'
+)
+
+def test_api_compile_once_run_many():
+    program = mypl_api.compile(EMBEDDED_PROGRAM)
+    first = program.run('3\n')
+    assert (first.status, first.output, first.error) == (0, '0 3 6 ', None)
+    assert first.instructions > 0
+    second = program.run(io.StringIO('2\n'))
+    assert (second.status, second.output) == (0, '0 2 ')
+    # the same compiled templates, run again with the same result
+    templates = program.frame_templates
+    assert program.run('3\n').output == first.output
+    assert program.frame_templates is templates
+
+def test_api_run_errors():
+    program = mypl_api.compile(EMBEDDED_PROGRAM)
+    result = program.run('x\n')
+    assert result.status == 1 and result.output == ''
+    assert result.error.startswith('VM Error') and 'near line 3' in result.error
+    result = program.run('1000\n', limits=ExecutionLimits(max_instructions=100))
+    assert result.status == 1 and 'instruction limit' in result.error
+    assert result.output.startswith('0 1000 ') and result.instructions is None
+    # and the program still runs normally afterwards
+    assert program.run('1\n').output == '0 '
+
+def test_api_compile_errors():
+    with pytest.raises(MyPLError) as e:
+        mypl_api.compile('void main() {int x = "a";}')
+    assert str(e.value).startswith('Static Error')
+    with pytest.raises(MyPLError) as e:
+        mypl_api.compile('void main() {')
+    assert str(e.value).startswith('Parser Error')
+
+def test_api_stdout_stream(tmp_path):
+    out = io.StringIO()
+    result = mypl_api.compile(EMBEDDED_PROGRAM).run('2\n', stdout=out)
+    assert result.status == 0 and result.output is None
+    assert out.getvalue() == '0 2 '
+    path = tmp_path / 'p.mypl'
+    path.write_text(EMBEDDED_PROGRAM)
+    assert mypl_api.compile_file(str(path)).run('1\n').output == '0 '
+
+#----------------------------------------------------------------------
+# CONCURRENT VMS
+#----------------------------------------------------------------------
+
+CONCURRENT_PROGRAM = (
+    'struct Acc {int total;} \n'
+    'int tri(int n) {int t = 0; for (int i = 1; i <= n; i = i + 1) {t = t + i;} return t;} \n'
+    'void main() { \n'
+    '  int n = stoi(input()); \n'
+    '  string name = input(); \n'
+    '  Acc a = new Acc(0); \n'
+    '  array int xs = new int[n]; \n'
+    '  for (int i = 0; i < n; i = i + 1) {xs[i] = tri(i) * 2 - i; a.total = a.total + xs[i];} \n'
+    '  if (a.total > 100) {print(name + " big ");} \n'
+    '  print(name + ":" + itos(a.total)); \n'
+    '} \n'
+)
+
+def test_vm_leaves_instrs_unchanged():
+    vm = build('void main() {int x = 3 * 4 + 1; bool b = x < 20 and not false;}')
+    before = repr(vm)
+    vm.run()
+    assert repr(vm) == before
+    assert str(ADD()) in before and 'CMPLT()' in before
+
+def test_frame_templates_are_immutable():
+    vm = build('void main() {int x = 3 * 4 + 1; print(x);}')
+    main = vm.frame_templates['main']
+    assert type(main.instructions) == tuple and type(main.line_table) == tuple
+    with pytest.raises(FrozenInstanceError):
+        main.instructions = ()
+    # templates are built by appending and frozen when added to a VM
+    template = VMFrameTemplate('f', 0)
+    template.instructions.append(RET())
+    vm.add_frame_template(template)
+    assert vm.frame_templates['f'].instructions == (RET(),)
+    with pytest.raises(AttributeError):
+        template.instructions.append(RET())
+    cached = mypl_bytecode.loads(mypl_bytecode.dumps(vm.frame_templates, 'x'), 'x')
+    assert type(cached['main'].instructions) == tuple
+    assert type(cached['main'].line_table) == tuple
+
+def test_vm_own_streams(capsys):
+    vm = build('void main() {string s = input(); print(s + "!"); print(input());}')
+    vm.stdin = io.StringIO('one\ntwo')
+    vm.stdout = io.StringIO()
+    vm.run()
+    assert vm.stdout.getvalue() == 'one!two'
+    assert capsys.readouterr().out == ''
+    vm = build('void main() {print(input());}')
+    vm.stdin = io.StringIO('')
+    with pytest.raises(EOFError):
+        vm.run()
+
+def test_concurrent_lazy_lowering():
+    # VMs sharing lazily built templates lower each function once
+    lazy = build_lazy(CONCURRENT_PROGRAM + 'int unused() {return 0;} \n')
+    lowered = []
+    accept = FunDef.accept
+    def counting_accept(fun_def, visitor):
+        lowered.append(fun_def.fun_name.lexeme)
+        return accept(fun_def, visitor)
+    def run(job):
+        vm = VM()
+        vm.frame_templates = lazy.frame_templates
+        vm.unlowered_functions = lazy.unlowered_functions
+        vm.code_generator = lazy.code_generator
+        vm.stdin = io.StringIO(f'{job}\nvm\n')
+        vm.stdout = io.StringIO()
+        vm.run()
+        return vm.stdout.getvalue()
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    FunDef.accept = counting_accept
+    try:
+        with ThreadPoolExecutor(16) as executor:
+            outputs = list(executor.map(run, [5] * 32))
+    finally:
+        FunDef.accept = accept
+        sys.setswitchinterval(interval)
+    assert outputs == ['vm:30'] * 32
+    assert sorted(lowered) == ['main', 'tri']
+    assert set(lazy.unlowered_functions) == {'unused'}
+
+def test_concurrent_vms_stress():
+    program = mypl_api.compile(CONCURRENT_PROGRAM)
+    before = repr(program.frame_templates)
+    def expected(n, name):
+        total = sum(i * i for i in range(n))
+        return (f'{name} big ' if total > 100 else '') + f'{name}:{total}'
+    jobs = [(i % 40, f'vm{i}') for i in range(200)]
+    # switch threads as often as possible to interleave the VMs
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(16) as executor:
+            results = list(executor.map(lambda job: program.run(f'{job[0]}\n{job[1]}\n'), jobs))
+    finally:
+        sys.setswitchinterval(interval)
+    for result, job in zip(results, jobs):
+        assert result.status == 0
+        assert result.output == expected(*job)
+    # the shared templates are untouched
+    assert repr(program.frame_templates) == before
+
+
+#----------------------------------------------------------------------
+# BENCHMARK COMPARISON
+#----------------------------------------------------------------------
+
+def results(**benchmarks):
+    # suite results with the given {phase: times} for each benchmark
+    return {'python': '3', 'benchmarks': {
+        name: {phase: {'times': times} for phase, times in phases.items()}
+        for name, phases in benchmarks.items()}}
+
+def test_mann_whitney_p():
+    assert compare.mann_whitney_p([1, 2, 3, 4, 5], [6, 7, 8, 9, 10]) < 0.01
+    assert compare.mann_whitney_p([6, 7, 8, 9, 10], [1, 2, 3, 4, 5]) > 0.99
+    # all tied: no evidence either way
+    assert compare.mann_whitney_p([1, 1, 1], [1, 1, 1]) == 1.0
+    # ties get average ranks
+    assert 0.05 < compare.mann_whitney_p([1, 2, 2, 3], [2, 2, 3, 3]) < 0.5
+
+def test_compare_phase_threshold():
+    base = [0.100, 0.101, 0.102, 0.103, 0.104]
+    slower = [t * 1.05 for t in base]
+    assert compare.compare_phase(base, slower, 0.10, 0.05, 0.001)[0] == 'ok'
+    status, change, p = compare.compare_phase(base, [t * 1.5 for t in base], 0.10, 0.05, 0.001)
+    assert status == 'regression' and change == pytest.approx(0.5) and p < 0.05
+    status, _, _ = compare.compare_phase(base, [t * 0.5 for t in base], 0.10, 0.05, 0.001)
+    assert status == 'improvement'
+    # a slower median that the test cannot tell from noise is not flagged
+    noisy = [0.05, 0.06, 0.12, 0.3, 0.4]
+    status, change, p = compare.compare_phase(base, noisy, 0.10, 0.05, 0.001)
+    assert change > 0.10 and p >= 0.05 and status == 'ok'
+
+def test_compare_phase_small_samples():
+    # with fewer than 3 times on a side only the threshold is used
+    assert compare.compare_phase([0.1, 0.1], [0.2, 0.2], 0.10, 0.05, 0.001) == ('regression', 1.0, None)
+    assert compare.compare_phase([0.1], [0.105], 0.10, 0.05, 0.001)[0] == 'ok'
+
+def test_compare_phase_noise_floor():
+    status, _, p = compare.compare_phase([0.0002] * 5, [0.0008] * 5, 0.10, 0.05, 0.001)
+    assert status == 'noise' and p is None
+    # judged once either median reaches the minimum time
+    assert compare.compare_phase([0.0002] * 5, [0.002] * 5, 0.10, 0.05, 0.001)[0] == 'regression'
+
+def test_compare_missing_and_new():
+    base = results(a={'run': [1, 1, 1], 'parse': [1, 1, 1]}, b={'run': [1, 1, 1]})
+    current = results(a={'run': [1, 1, 1]}, c={'run': [1, 1, 1]})
+    rows = compare.compare(base, current)
+    assert [(r['benchmark'], r['phase'], r['status']) for r in rows] == [
+        ('a', 'run', 'ok'), ('a', 'parse', 'missing'), ('b', None, 'missing'), ('c', None, 'new')]
+    assert 'missing' in compare.table(rows)
+
+def test_compare_exit_status(tmp_path, capsys):
+    def run(base, current, *flags):
+        (tmp_path / 'base.json').write_text(json.dumps(base))
+        (tmp_path / 'current.json').write_text(json.dumps(current))
+        return compare.main([str(tmp_path / 'base.json'), str(tmp_path / 'current.json'), *flags])
+    base = results(a={'run': [0.1, 0.1, 0.1]}, b={'run': [0.1, 0.1, 0.1]})
+    assert run(base, base) == 0
+    assert run(base, results(a={'run': [0.1] * 3}, b={'run': [0.2, 0.21, 0.22]})) == 1
+    missing = results(a={'run': [0.1, 0.1, 0.1]})
+    assert run(base, missing) == 1
+    assert '1 missing' in capsys.readouterr().out
+    assert run(base, missing, '--allow-missing') == 0
+    assert compare.main([str(tmp_path / 'none.json'), str(tmp_path / 'base.json')]) == 2
@@ -9,17 +9,16 @@ CLASS: CPSC 326
 import argparse
 import sys
 import io
+import time
+from dataclasses import replace
 
+# only the modules every run needs are imported here; each mode imports
+# the rest of the pipeline itself, to keep the startup of short runs
+# (like --lex and --parse) fast
 from mypl_iowrapper import FileWrapper, StdInWrapper
 from mypl_error import MyPLError
 from mypl_lexer import Lexer
 from mypl_token import TokenType, Token
-from mypl_simple_parser import SimpleParser
-from mypl_ast_parser import ASTParser
-from mypl_printer import PrintVisitor
-from mypl_semantic_checker import SemanticChecker
-from mypl_code_gen import CodeGenerator
-from mypl_vm import VM
 
 
 def run_lex_mode(in_stream):
@@ -52,6 +51,7 @@ def run_parse_mode(in_stream):
         in_stream -- A wrapped input stream containing a mypl program.
 
     """
+    from mypl_simple_parser import SimpleParser
     try: 
         lexer = Lexer(in_stream)
         parser = SimpleParser(lexer)
@@ -70,6 +70,8 @@ def run_print_mode(in_stream):
         in_stream -- A wrapped input stream containing a mypl program.
 
     """
+    from mypl_ast_parser import ASTParser
+    from mypl_printer import PrintVisitor
     try: 
         lexer = Lexer(in_stream)
         parser = ASTParser(lexer)
@@ -91,6 +93,8 @@ def run_check_mode(in_stream):
         in_stream -- A wrapped input stream containing a mypl program.
 
     """
+    from mypl_ast_parser import ASTParser
+    from mypl_semantic_checker import SemanticChecker
     try: 
         lexer = Lexer(in_stream)
         parser = ASTParser(lexer)
@@ -113,6 +117,10 @@ def run_ir_mode(in_stream):
         in_stream -- A wrapped input stream containing a mypl program.
 
     """
+    from mypl_ast_parser import ASTParser
+    from mypl_semantic_checker import SemanticChecker
+    from mypl_code_gen import CodeGenerator
+    from mypl_vm import VM
     try: 
         lexer = Lexer(in_stream)
         parser = ASTParser(lexer)
@@ -128,29 +136,215 @@ def run_ir_mode(in_stream):
         exit(1)
 
     
-def run_normal_mode(in_stream):
+def run_normal_mode(in_stream, lazy=False, jobs=None, limits=None, profiler=None,
+                    call_profiler=None, heap_profiler=None):
     """Executes the given mypl program. Any output produced by the program
     is printed to standard output. 
 
     Args: 
         in_stream -- A wrapped input stream containing a mypl program.
+        lazy -- If true, generate each function's code on its first call.
+        jobs -- If given, check and generate code for functions in this
+            many worker processes (ignored if lazy).
+        limits -- The ExecutionLimits for the run (if any).
+        profiler -- The profiler to sample the run with (if any).
+        call_profiler -- The profiler to trace calls with (if any).
+        heap_profiler -- The profiler to trace allocations with (if any).
 
     """
+    from mypl_ast_parser import ASTParser
+    from mypl_semantic_checker import SemanticChecker
+    from mypl_code_gen import CodeGenerator
+    from mypl_vm import VM
     try: 
         lexer = Lexer(in_stream)
         parser = ASTParser(lexer)
         ast = parser.parse()
-        visitor = SemanticChecker()
-        ast.accept(visitor)
         vm = VM()
-        codegen = CodeGenerator(vm)
-        ast.accept(codegen)
+        if jobs and not lazy:
+            from mypl_parallel import compile_program
+            compile_program(ast, vm, jobs)
+        else:
+            visitor = SemanticChecker()
+            ast.accept(visitor)
+            codegen = CodeGenerator(vm, lazy)
+            ast.accept(codegen)
+        vm.limits = limits
+        vm.profiler = profiler
+        vm.call_profiler = call_profiler
+        vm.heap_profiler = heap_profiler
         vm.run()
     except MyPLError as ex:
         print(ex)
         exit(1)
 
 
+
+def write_profile(profiler, json_path=None):
+    """Prints the profiler's report table to standard error (so it
+    does not mix with the program's output), and if given, writes the
+    report as JSON to json_path.
+
+    """
+    sys.stdout.flush()
+    print(profiler.table(), file=sys.stderr)
+    if json_path:
+        import json
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(profiler.report(), f, indent=2)
+
+
+
+def run_timings_mode(in_stream, limits=None):
+    """Executes the given mypl program like run_normal_mode, timing each
+    phase (lex, parse, check, codegen and run) and printing the times,
+    the change in and peak of the resident set size during each, and
+    counts of tokens, AST nodes and instructions to standard error when
+    done.
+
+    Args:
+        in_stream -- A wrapped input stream containing a mypl program.
+        limits -- The ExecutionLimits for the run (if any).
+
+    """
+    from mypl_ast_parser import ASTParser
+    from mypl_semantic_checker import SemanticChecker
+    from mypl_code_gen import CodeGenerator
+    from mypl_vm import VM
+    from mypl_timings import PhaseTimer, TokenList, lex_tokens, count_nodes
+    timer = PhaseTimer()
+    try:
+        with timer.phase('lex'):
+            tokens = lex_tokens(Lexer(in_stream))
+        timer.counts['tokens'] = len(tokens) - 1
+        with timer.phase('parse'):
+            ast = ASTParser(TokenList(tokens)).parse()
+        timer.counts['AST nodes'] = count_nodes(ast)
+        with timer.phase('check'):
+            ast.accept(SemanticChecker())
+        vm = VM()
+        with timer.phase('codegen'):
+            ast.accept(CodeGenerator(vm))
+        timer.functions = {name: len(template.instructions)
+                           for name, template in vm.frame_templates.items()}
+        timer.counts['instructions generated'] = sum(timer.functions.values())
+        vm.limits = limits
+        with timer.phase('run'):
+            vm.run()
+        timer.counts['instructions executed'] = vm.instruction_count
+    except MyPLError as ex:
+        print(ex)
+        exit(1)
+    finally:
+        sys.stdout.flush()
+        print(timer.table(), file=sys.stderr)
+
+
+
+def run_cached_mode(source, cache_path, limits=None):
+    """Executes the given mypl program like run_normal_mode, but loads
+    the compiled program from the bytecode cache file if it is up to
+    date, and otherwise compiles it and writes the cache file.
+
+    Args:
+        source -- The mypl program source (a string).
+        cache_path -- The path of the program's .myplc cache file.
+        limits -- The ExecutionLimits for the run (if any).
+
+    """
+    from mypl_ast_parser import ASTParser
+    from mypl_semantic_checker import SemanticChecker
+    from mypl_code_gen import CodeGenerator
+    from mypl_vm import VM
+    import mypl_bytecode
+    try:
+        vm = VM()
+        frame_templates = mypl_bytecode.load(cache_path, source)
+        if frame_templates is None:
+            lexer = Lexer(FileWrapper(io.StringIO(source)))
+            parser = ASTParser(lexer)
+            ast = parser.parse()
+            visitor = SemanticChecker()
+            ast.accept(visitor)
+            codegen = CodeGenerator(vm)
+            ast.accept(codegen)
+            mypl_bytecode.save(cache_path, source, vm.frame_templates)
+        else:
+            vm.frame_templates = frame_templates
+        vm.limits = limits
+        vm.run()
+    except MyPLError as ex:
+        print(ex)
+        exit(1)
+
+
+
+def run_batch_mode(paths, jobs=None, report_path=None, limits=None):
+    """Executes each of the given mypl programs in a pool of worker
+    processes and prints a summary report with per-program status and
+    timings. Exits with status 1 if any program failed.
+
+    Args:
+        paths -- The mypl program files and directories of programs.
+        jobs -- Number of worker processes (default: CPU count).
+        report_path -- If given, also write the results (including each
+            program's output) to this JSON file.
+        limits -- The ExecutionLimits for each program (if any).
+
+    """
+    import json
+    import mypl_batch
+    start = time.perf_counter()
+    results = mypl_batch.run_batch(paths, jobs, limits)
+    wall_time = time.perf_counter() - start
+    print(mypl_batch.report(results, wall_time))
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump([vars(r) for r in results], f, indent=2)
+    if any(r.status != 0 for r in results):
+        exit(1)
+
+
+
+def run_serve_mode(address, jobs=None, limits=None, cache_dir=None):
+    """Runs the compile-and-run server until interrupted.
+
+    Args:
+        address -- A Unix socket path, a port number, or HOST:PORT.
+        jobs -- Number of worker processes (default: CPU count).
+        limits -- The ExecutionLimits for each program (default: the
+            server's default limits).
+        cache_dir -- Directory for .myplc files shared by the workers.
+
+    """
+    import asyncio
+    import mypl_server
+    path, host, port = mypl_server.parse_address(address)
+    server = mypl_server.MyPLServer(jobs, limits or mypl_server.DEFAULT_LIMITS, cache_dir)
+    try:
+        asyncio.run(server.serve_forever(path, host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+def execution_limits(args, defaults=None):
+    """Returns the ExecutionLimits given on the command line (starting
+    from the given defaults), or None if there are none.
+
+    """
+    given = {}
+    for name in ['max_instructions', 'max_call_depth', 'max_heap_objects',
+                 'max_heap_elements', 'max_array_length', 'time_limit']:
+        value = getattr(args, name)
+        if value is not None:
+            given[name] = value
+    if defaults is not None:
+        return replace(defaults, **given)
+    if not given:
+        return None
+    from mypl_vm import ExecutionLimits
+    return ExecutionLimits(**given)
+
     
 if __name__ == '__main__':
     # initial help/usage info
@@ -170,9 +364,77 @@ if __name__ == '__main__':
     group.add_argument('--check', action='store_true', help=help_msg)
     help_msg = 'displays intermediate code'
     group.add_argument('--ir', action='store_true', help=help_msg)
+    help_msg = 'cache compiled program next to the source file (.myplc)'
+    group.add_argument('--cache', action='store_true', help=help_msg)
+    help_msg = 'cache compiled programs in the given directory'
+    argparser.add_argument('--cache-dir', metavar='DIR', help=help_msg)
+    help_msg = 'generate code for each function on its first call'
+    argparser.add_argument('--lazy', action='store_true', help=help_msg)
+    help_msg = 'use N worker processes (to compile functions, or for --batch and --serve)'
+    argparser.add_argument('--jobs', type=int, metavar='N', help=help_msg)
+    help_msg = 'run each mypl program (file or directory of files) in a worker pool'
+    group.add_argument('--batch', nargs='+', metavar='PATH', help=help_msg)
+    help_msg = 'serve programs on a Unix socket path, port, or HOST:PORT'
+    group.add_argument('--serve', metavar='ADDRESS', help=help_msg)
+    help_msg = 'most instructions a program may execute'
+    argparser.add_argument('--max-instructions', type=int, metavar='N', help=help_msg)
+    help_msg = 'most nested function calls a program may make'
+    argparser.add_argument('--max-call-depth', type=int, metavar='N', help=help_msg)
+    help_msg = 'most structs and arrays a program may allocate'
+    argparser.add_argument('--max-heap-objects', type=int, metavar='N', help=help_msg)
+    help_msg = 'most array elements a program may allocate in total'
+    argparser.add_argument('--max-heap-elements', type=int, metavar='N', help=help_msg)
+    help_msg = 'most elements a program may allocate in one array'
+    argparser.add_argument('--max-array-length', type=int, metavar='N', help=help_msg)
+    help_msg = 'most seconds a program may run'
+    argparser.add_argument('--time-limit', type=float, metavar='S', help=help_msg)
+    help_msg = 'profile instructions by opcode, function and pc (report to stderr)'
+    group.add_argument('--profile', action='store_true', help=help_msg)
+    help_msg = 'profile calls, time and instructions by function (report to stderr)'
+    group.add_argument('--call-profile', action='store_true', help=help_msg)
+    help_msg = 'report the time, memory and counts of each phase (to stderr)'
+    group.add_argument('--timings', action='store_true', help=help_msg)
+    help_msg = 'report heap allocations by type and site at exit (to stderr)'
+    group.add_argument('--heap-report', action='store_true', help=help_msg)
+    help_msg = ('with --profile, --call-profile or --heap-report, also write the report '
+                'as JSON to FILE')
+    argparser.add_argument('--profile-json', metavar='FILE', help=help_msg)
+    help_msg = 'sample the call stack and write folded stacks (for flamegraphs) to FILE'
+    group.add_argument('--flamegraph', metavar='FILE', help=help_msg)
+    help_msg = 'instructions between call stack samples (default 997)'
+    argparser.add_argument('--sample-interval', type=int, default=997, metavar='N',
+                           help=help_msg)
+    help_msg = 'write batch results as JSON to the given file'
+    argparser.add_argument('--report', metavar='FILE', help=help_msg)
     help_msg = 'mypl program file (optional)'
     argparser.add_argument('filename', nargs='?', help=help_msg)
     args = argparser.parse_args()
+    # a cache directory also picks the cached mode (except for the
+    # server, whose workers share it), and caching needs a source file
+    modes = ['lex', 'parse', 'print', 'check', 'ir', 'batch', 'profile', 'call_profile',
+             'timings', 'heap_report', 'flamegraph']
+    if args.cache_dir and not args.serve:
+        for name in modes:
+            if getattr(args, name):
+                argparser.error(f'argument --{name.replace("_", "-")}: '
+                                'not allowed with argument --cache-dir')
+    if (args.cache or args.cache_dir) and not args.serve and not args.filename:
+        argparser.error('argument --cache/--cache-dir: needs a filename '
+                        '(standard input is not cached)')
+    if args.profile_json and not (args.profile or args.call_profile or args.heap_report):
+        argparser.error('argument --profile-json: needs --profile, --call-profile '
+                        'or --heap-report')
+    limits = execution_limits(args)
+    # batch mode reads its own files
+    if args.batch:
+        run_batch_mode(args.batch + ([args.filename] if args.filename else []),
+                       args.jobs, args.report, limits)
+        exit(0)
+    if args.serve:
+        import mypl_server
+        limits = execution_limits(args, mypl_server.DEFAULT_LIMITS)
+        run_serve_mode(args.serve, args.jobs, limits, args.cache_dir)
+        exit(0)
     # get the input (file or standard in)
     in_stream = StdInWrapper(sys.stdin)
     if args.filename:
@@ -192,8 +454,44 @@ if __name__ == '__main__':
         run_check_mode(in_stream)
     elif args.ir:
         run_ir_mode(in_stream)
+    elif args.cache or args.cache_dir:
+        import mypl_bytecode
+        source = in_stream.stream.read()
+        cache_path = mypl_bytecode.cache_path(args.filename, source, args.cache_dir)
+        run_cached_mode(source, cache_path, limits)
+    elif args.timings:
+        run_timings_mode(in_stream, limits)
+    elif args.heap_report:
+        from mypl_profile import HeapProfiler
+        profiler = HeapProfiler()
+        try:
+            run_normal_mode(in_stream, args.lazy, args.jobs, limits, heap_profiler=profiler)
+        finally:
+            write_profile(profiler, args.profile_json)
+    elif args.call_profile:
+        from mypl_profile import CallProfiler
+        profiler = CallProfiler()
+        try:
+            run_normal_mode(in_stream, args.lazy, args.jobs, limits, call_profiler=profiler)
+        finally:
+            write_profile(profiler, args.profile_json)
+    elif args.profile:
+        from mypl_profile import OpcodeProfiler
+        profiler = OpcodeProfiler()
+        try:
+            run_normal_mode(in_stream, args.lazy, args.jobs, limits, profiler)
+        finally:
+            write_profile(profiler, args.profile_json)
+    elif args.flamegraph:
+        from mypl_profile import SamplingProfiler
+        profiler = SamplingProfiler(max(1, args.sample_interval))
+        try:
+            run_normal_mode(in_stream, args.lazy, args.jobs, limits, profiler)
+        finally:
+            with open(args.flamegraph, 'w', encoding='utf-8') as f:
+                f.write(profiler.folded())
     else:
-        run_normal_mode(in_stream)
+        run_normal_mode(in_stream, args.lazy, args.jobs, limits)
     # close the (wrapped) input stream
     in_stream.close()
 
@@ -0,0 +1,109 @@
+"""Python API for embedding MyPL: compile a program once and run it many
+times.
+
+    program = mypl_api.compile(source)
+    result = program.run(stdin='3\\n')
+    result.status, result.output
+
+A compiled Program holds the program's frame templates, so each run
+gets a new VM (with empty heaps) but does not lex, parse, check or
+generate code again. The templates are immutable and the VM does its
+I/O through its own streams, so a Program can be run from many threads
+at once. Compile errors raise a MyPLError; errors during a run end it with
+status 1 and the error message in the result.
+
+NAME: Lauren Nguyen
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import io
+import time
+import traceback
+from dataclasses import dataclass
+
+from mypl_error import MyPLError
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_vm import VM
+
+
+@dataclass
+class RunResult:
+    """The result of one run of a program."""
+    status: int                 # 0 if the program ran to completion, else 1
+    output: str                 # standard output (None if sent to a stream)
+    error: str = None           # the error message (or traceback), if any
+    time: float = 0.0           # run time in seconds
+    instructions: int = None    # instructions executed (if it completed)
+
+
+class Program:
+    """A compiled MyPL program that can be run any number of times."""
+
+    def __init__(self, frame_templates):
+        """Creates a program from its frame templates (function name ->
+        VMFrameTemplate, as built by the code generator)."""
+        self.frame_templates = frame_templates
+
+
+    def run(self, stdin='', stdout=None, limits=None):
+        """Runs the program in a new VM.
+
+        Args:
+            stdin -- The program's standard input, as a string or a
+                readable text stream (default: empty).
+            stdout -- A writable text stream for the program's output
+                (default: the output is captured in the result).
+            limits -- The ExecutionLimits for the run (if any).
+
+        Returns: The RunResult.
+
+        """
+        output = io.StringIO() if stdout is None else stdout
+        if type(stdin) == str:
+            stdin = io.StringIO(stdin)
+        error = None
+        vm = VM()
+        vm.frame_templates = self.frame_templates
+        vm.limits = limits
+        vm.stdin = stdin
+        vm.stdout = output
+        start = time.perf_counter()
+        try:
+            vm.run()
+        except MyPLError as ex:
+            error = str(ex)
+        except Exception:
+            # an interpreter crash (or the end of stdin)
+            error = traceback.format_exc()
+        return RunResult(0 if error is None else 1,
+                         output.getvalue() if stdout is None else None,
+                         error, time.perf_counter() - start,
+                         vm.instruction_count if error is None else None)
+
+
+def compile(source):
+    """Compiles the given MyPL source string.
+
+    Returns: The compiled Program.
+
+    Raises: A MyPLError if the program has a lexer, syntax or static
+    error.
+
+    """
+    ast = ASTParser(Lexer(FileWrapper(io.StringIO(source)))).parse()
+    ast.accept(SemanticChecker())
+    vm = VM()
+    ast.accept(CodeGenerator(vm))
+    return Program(vm.frame_templates)
+
+
+def compile_file(path):
+    """Compiles the MyPL program in the given file (see compile)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return compile(f.read())
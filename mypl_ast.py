@@ -75,39 +75,106 @@ class Visitor:
         pass
     
 
+
+#----------------------------------------------------------------------
+# Iterative (explicit stack) traversal
+#----------------------------------------------------------------------
+
+def iterative(visit_fun):
+    """Decorator for visitor functions written as generators. Instead of
+    calling child.accept(self), the visit function yields each child
+    node to visit, and the walk visits it before resuming the function
+    (so any state the child sets, like a current type, is available
+    right after the yield). Nested children are visited from an explicit
+    stack of generators, so traversal depth is not limited by Python's
+    recursion limit. Calling the decorated function directly (e.g.,
+    through program.accept(visitor)) runs the whole walk.
+
+    Args:
+        visit_fun -- The generator visit function to wrap.
+
+    """
+    def visit(visitor, node):
+        walk(visitor, visit_fun(visitor, node))
+    visit.generator = visit_fun
+    visit.__name__ = visit_fun.__name__
+    visit.__doc__ = visit_fun.__doc__
+    return visit
+
+
+def walk(visitor, generator):
+    """Runs the given visit generator to completion, visiting each node
+    it (and its nested generators) yields. Visit functions that are not
+    marked iterative are called directly.
+
+    Args:
+        visitor -- The visitor performing the walk.
+        generator -- The generator of the starting visit function.
+
+    """
+    # node type -> (visit function, its generator or None), looked up
+    # once per type for the walk
+    visit_funs = {}
+    stack = [generator]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        node = next(stack[-1], _DONE)
+        if node is _DONE:
+            pop()
+            continue
+        node_type = type(node)
+        entry = visit_funs.get(node_type)
+        if entry is None:
+            visit_fun = getattr(visitor, VISIT_FUNCTIONS[node_type])
+            entry = (visit_fun, getattr(visit_fun, 'generator', None))
+            visit_funs[node_type] = entry
+        visit_fun, nested = entry
+        if nested is None:
+            visit_fun(node)
+        else:
+            push(nested(visitor, node))
+
+# marks the end of a visit generator
+_DONE = object()
+
+
     
 #----------------------------------------------------------------------
 # AST Classes
 #----------------------------------------------------------------------
 
+# Note: node classes are slotted (no per-instance __dict__) to keep the
+# memory footprint of large ASTs down, so only declared fields can be set.
+
 # General Program-Related Basic AST Classes
 
-@dataclass
+@dataclass(slots=True)
 class DataType:
     is_array: bool
     type_name: Token
     def accept(self, visitor):
         visitor.visit_data_type(self)
 
-@dataclass
+@dataclass(slots=True)
 class VarDef:
     data_type: DataType
     var_name: Token
     def accept(self, visitor):
         visitor.visit_var_def(self)
 
-@dataclass
+@dataclass(slots=True)
 class Stmt:
     pass
 
-@dataclass
+@dataclass(slots=True)
 class StructDef:
     struct_name: Token
     fields: List[VarDef]
     def accept(self, visitor):
         visitor.visit_struct_def(self)
 
-@dataclass
+@dataclass(slots=True)
 class FunDef:
     return_type: DataType
     fun_name: Token
@@ -116,7 +183,7 @@ class FunDef:
     def accept(self, visitor):
         visitor.visit_fun_def(self)
 
-@dataclass
+@dataclass(slots=True)
 class Program: 
     struct_defs: List[StructDef]
     fun_defs: List[FunDef]
@@ -126,15 +193,15 @@ class Program:
 
 # Expression Related Classes
 
-@dataclass
+@dataclass(slots=True)
 class RValue:
     pass                        
 
-@dataclass
+@dataclass(slots=True)
 class ExprTerm:
     pass                        
 
-@dataclass
+@dataclass(slots=True)
 class Expr:
     not_op: bool
     first: ExprTerm
@@ -143,32 +210,32 @@ class Expr:
     def accept(self, visitor):
         visitor.visit_expr(self)
 
-@dataclass
+@dataclass(slots=True)
 class CallExpr(Stmt, RValue):
     fun_name: Token
     args: List[Expr]
     def accept(self, visitor):
         visitor.visit_call_expr(self)
         
-@dataclass
+@dataclass(slots=True)
 class SimpleTerm(ExprTerm):
     rvalue: RValue
     def accept(self, visitor):
         visitor.visit_simple_term(self)
         
-@dataclass
+@dataclass(slots=True)
 class ComplexTerm(ExprTerm):
     expr: Expr
     def accept(self, visitor):
         visitor.visit_complex_term(self)
 
-@dataclass
+@dataclass(slots=True)
 class SimpleRValue(RValue):
     value: Token
     def accept(self, visitor):
         visitor.visit_simple_rvalue(self)
 
-@dataclass
+@dataclass(slots=True)
 class NewRValue(RValue):
     type_name: Token
     array_expr: Expr
@@ -176,12 +243,12 @@ class NewRValue(RValue):
     def accept(self, visitor):
         visitor.visit_new_rvalue(self)
     
-@dataclass
+@dataclass(slots=True)
 class VarRef:
     var_name: Token
     array_expr: Expr
         
-@dataclass
+@dataclass(slots=True)
 class VarRValue(RValue):
     path: List[VarRef]
     def accept(self, visitor):
@@ -190,34 +257,34 @@ class VarRValue(RValue):
         
 # Statement Related Classes
 
-@dataclass
+@dataclass(slots=True)
 class ReturnStmt(Stmt):
     expr: Expr
     def accept(self, visitor):
         visitor.visit_return_stmt(self)
 
-@dataclass
+@dataclass(slots=True)
 class VarDecl(Stmt):
     var_def: VarDef
     expr: Expr
     def accept(self, visitor):
         visitor.visit_var_decl(self)
 
-@dataclass
+@dataclass(slots=True)
 class AssignStmt(Stmt):
     lvalue: List[VarRef]
     expr: Expr
     def accept(self, visitor):
         visitor.visit_assign_stmt(self)
 
-@dataclass
+@dataclass(slots=True)
 class WhileStmt(Stmt):
     condition: Expr
     stmts: List[Stmt]
     def accept(self, visitor):
         visitor.visit_while_stmt(self)
         
-@dataclass
+@dataclass(slots=True)
 class ForStmt(Stmt):
     var_decl: VarDecl
     condition: Expr
@@ -226,12 +293,12 @@ class ForStmt(Stmt):
     def accept(self, visitor):
         visitor.visit_for_stmt(self)
 
-@dataclass
+@dataclass(slots=True)
 class BasicIf:
     condition: Expr
     stmts: List[Stmt]
 
-@dataclass
+@dataclass(slots=True)
 class IfStmt(Stmt):
     if_part: BasicIf
     else_ifs: List[BasicIf]
@@ -239,9 +306,33 @@ class IfStmt(Stmt):
     def accept(self, visitor):
         visitor.visit_if_stmt(self)
         
-@dataclass
+@dataclass(slots=True)
 class TryCatchStmt(Stmt):
     try_part: List[Stmt]
     catch_parts:List[Stmt]
     def accept(self, visitor):
         visitor.visit_try_catch_stmt(self)
+
+
+# visitor function name for each visitable AST class
+VISIT_FUNCTIONS = {
+    Program: 'visit_program',
+    StructDef: 'visit_struct_def',
+    FunDef: 'visit_fun_def',
+    ReturnStmt: 'visit_return_stmt',
+    VarDecl: 'visit_var_decl',
+    AssignStmt: 'visit_assign_stmt',
+    WhileStmt: 'visit_while_stmt',
+    ForStmt: 'visit_for_stmt',
+    IfStmt: 'visit_if_stmt',
+    TryCatchStmt: 'visit_try_catch_stmt',
+    CallExpr: 'visit_call_expr',
+    Expr: 'visit_expr',
+    DataType: 'visit_data_type',
+    VarDef: 'visit_var_def',
+    SimpleTerm: 'visit_simple_term',
+    ComplexTerm: 'visit_complex_term',
+    SimpleRValue: 'visit_simple_rvalue',
+    NewRValue: 'visit_new_rvalue',
+    VarRValue: 'visit_var_rvalue',
+}
@@ -11,17 +11,35 @@ from mypl_lexer import *
 from mypl_ast import *
 
 
+# binding power of each binary operator (higher binds tighter)
+BIN_OP_POWERS = {
+    TokenType.OR: 1,
+    TokenType.AND: 2,
+    TokenType.EQUAL: 4, TokenType.NOT_EQUAL: 4,
+    TokenType.LESS: 4, TokenType.LESS_EQ: 4,
+    TokenType.GREATER: 4, TokenType.GREATER_EQ: 4,
+    TokenType.PLUS: 5, TokenType.MINUS: 5,
+    TokenType.TIMES: 6, TokenType.DIVIDE: 6,
+}
+
+# binding power of the prefix not operator
+NOT_POWER = 3
+
+
 class ASTParser:
 
-    def __init__(self, lexer):
+    def __init__(self, lexer, legacy_exprs=False):
         """Create a MyPL syntax checker (parser). 
         
         Args:
             lexer -- The lexer to use in the parser.
+            legacy_exprs -- If true, build expressions as right-nested
+                            chains with no operator precedence.
 
         """
         self.lexer = lexer
         self.curr_token = None
+        self.legacy_exprs = legacy_exprs
 
         
     def parse(self):
@@ -102,11 +120,7 @@ class ASTParser:
         
     def is_bin_op(self):
         """Returns true if the current token is a binary operator."""
-        ts = [TokenType.PLUS, TokenType.MINUS, TokenType.TIMES, TokenType.DIVIDE,
-              TokenType.AND, TokenType.OR, TokenType.EQUAL, TokenType.LESS,
-              TokenType.GREATER, TokenType.LESS_EQ, TokenType.GREATER_EQ,
-              TokenType.NOT_EQUAL]
-        return self.match_any(ts)
+        return self.curr_token.token_type in BIN_OP_POWERS
 
 
 
@@ -330,28 +344,49 @@ class ASTParser:
         
 
     def stmt(self):
+        """Parses a single statement, returning its AST node. Statements
+        within nested blocks are parsed from an explicit stack of
+        generators (each yield requests the next nested statement), so
+        block nesting depth is not limited by Python's recursion limit.
+
+        """
+        stack = [self.stmt_steps()]
+        value = None
+        while stack:
+            try:
+                stack[-1].send(value)
+            except StopIteration as done:
+                stack.pop()
+                value = done.value
+            else:
+                stack.append(self.stmt_steps())
+                value = None
+        return value
+
+
+    def stmt_steps(self):
         
         # if is it is a try catch stmt
         if(self.match(TokenType.TRY)):
-            try_node = self.try_stmt()
+            try_node = yield from self.try_stmt()
             return try_node
 
         # if it is a while stmt
         if(self.match(TokenType.WHILE)):
             # create local while node to hold return of while_stmt
-            while_node = self.while_stmt()
+            while_node = yield from self.while_stmt()
             return while_node
 
         # if it is a if stmt
         if(self.match(TokenType.IF)):
             # create local if node to hold return of if stmt
-            if_node = self.if_stmt()
+            if_node = yield from self.if_stmt()
             return if_node
 
         # if it is a for loop
         if(self.match(TokenType.FOR)):
             # create local for node to hold return of for_stmt
-            for_node = self.for_stmt()
+            for_node = yield from self.for_stmt()
             return for_node
 
 
@@ -562,7 +597,7 @@ class ASTParser:
                 or self.match(TokenType.INT_TYPE) or self.match(TokenType.DOUBLE_TYPE) or self.match(TokenType.STRING_TYPE) or self.match(TokenType.BOOL_TYPE) 
                 or self.match(TokenType.ASSIGN) or self.match(TokenType.ARRAY) or self.match(TokenType.ID)) or self.match(TokenType.TRY):
                     # creating local node to hold return from stmt()
-                    stmt_node = self.stmt()
+                    stmt_node = (yield)
 
                     # appending built node to the list
                     stmt_list.append(stmt_node)
@@ -578,7 +613,7 @@ class ASTParser:
             else_if_list = []
 
             # creting local variable to hold return of if_stmt_t(elifs and else), sending in intialized list
-            elif_node = self.if_stmt_t(else_if_list)
+            elif_node = yield from self.if_stmt_t(else_if_list)
 
             # creating list to hold elses
             else_node = []
@@ -634,7 +669,7 @@ class ASTParser:
                 self.match(TokenType.INT_TYPE) or self.match(TokenType.DOUBLE_TYPE) or self.match(TokenType.STRING_TYPE) or self.match(TokenType.BOOL_TYPE) or 
                 self.match(TokenType.ARRAY) or self.match(TokenType.ASSIGN) or self.match(TokenType.ID)) or self.match(TokenType.TRY):
                         # creating local node to hold return of stmt
-                        stmt_node = self.stmt()
+                        stmt_node = (yield)
 
                         # appending built node to the stmt list
                         stmt_list.append(stmt_node)
@@ -660,7 +695,7 @@ class ASTParser:
                 self.match(TokenType.INT_TYPE) or self.match(TokenType.DOUBLE_TYPE) or self.match(TokenType.STRING_TYPE) or self.match(TokenType.BOOL_TYPE) or 
                 self.match(TokenType.ARRAY) or self.match(TokenType.ASSIGN) or self.match(TokenType.ID)) or self.match(TokenType.TRY):
                     # creating local node to hold return of stmt
-                    stmt_node = self.stmt()
+                    stmt_node = (yield)
 
                     # appending built node to the stmt list
                     stmt_list.append(stmt_node)
@@ -694,7 +729,7 @@ class ASTParser:
                 or self.match(TokenType.SEMICOLON) or self.match(TokenType.ARRAY) or self.match(TokenType.ID) or self.match(TokenType.ASSIGN) or self.match(TokenType.TRY)):
                 
                 # calling stmt()
-                stmt_node = self.stmt()
+                stmt_node = (yield)
                 
                 # appending node to list
                 stmt_list.append(stmt_node)
@@ -714,7 +749,7 @@ class ASTParser:
                 or self.match(TokenType.SEMICOLON) or self.match(TokenType.ARRAY) or self.match(TokenType.ID) or self.match(TokenType.ASSIGN)):
                 
                 # calling stmt
-                stmt_node = self.stmt()
+                stmt_node = (yield)
 
                 # adding node to list
                 stmt_list.append(stmt_node)
@@ -752,7 +787,7 @@ class ASTParser:
                     or self.match(TokenType.INT_TYPE) or self.match(TokenType.DOUBLE_TYPE) or self.match(TokenType.STRING_TYPE) or self.match(TokenType.BOOL_TYPE) 
                     or self.match(TokenType.SEMICOLON) or self.match(TokenType.ARRAY) or self.match(TokenType.ID) or self.match(TokenType.ASSIGN) or self.match(TokenType.TRY)):
                     # adding node to list
-                    stmt_list.append(self.stmt())
+                    stmt_list.append((yield))
 
             # setting stmts param to built list
             while_node.stmts = stmt_list
@@ -805,7 +840,7 @@ class ASTParser:
                self.match(TokenType.INT_TYPE) or self.match(TokenType.DOUBLE_TYPE) or self.match(TokenType.STRING_TYPE) or self.match(TokenType.BOOL_TYPE) or 
                self.match(TokenType.ARRAY) or self.match(TokenType.ASSIGN) or self.match(TokenType.ID) or self.match(TokenType.TRY)):
                 # setting node to found stmt
-                stmt_node = self.stmt()
+                stmt_node = (yield)
 
                 # adding node to list
                 stmt_list.append(stmt_node)
@@ -873,7 +908,81 @@ class ASTParser:
         return return_node
 
 
-    def expr(self, expr_node = None):
+    def expr(self):
+        """Parses an expression, returning the root Expr node."""
+        if self.legacy_exprs:
+            return self.legacy_expr()
+        return self.prec_expr(0)
+
+
+    def prec_expr(self, min_power):
+        """Parses an expression using precedence climbing, stopping at the
+        first binary operator that binds no tighter than min_power.
+
+        Args:
+            min_power -- The binding power of the enclosing operator.
+
+        """
+        lhs = self.prefix_expr()
+        while self.is_bin_op():
+            power = BIN_OP_POWERS[self.curr_token.token_type]
+            if power <= min_power:
+                break
+            op = self.bin_op()
+            # every operator is left associative, so a chain is nested
+            # leftward one operator at a time by this loop
+            rhs = self.prec_expr(power)
+            lhs = Expr(False, self.as_term(lhs), op, self.as_rest(rhs, power))
+        return lhs
+
+
+    def prefix_expr(self):
+        """Parses an expression operand: an rvalue, a not expression, or a
+        parenthesized expression.
+
+        """
+        if self.match_any([TokenType.INT_VAL, TokenType.DOUBLE_VAL, TokenType.BOOL_VAL,
+                           TokenType.STRING_VAL, TokenType.NULL_VAL, TokenType.ID,
+                           TokenType.NEW]):
+            return Expr(False, self.rvalue(), None, None)
+        elif self.match(TokenType.NOT):
+            self.advance()
+            operand = self.prec_expr(NOT_POWER)
+            return Expr(True, self.as_term(operand), None, None)
+        elif self.match(TokenType.LPAREN):
+            self.advance()
+            expr_node = self.prec_expr(0)
+            self.eat(TokenType.RPAREN, 'Expecting )')
+            return expr_node
+        self.error('Improper expression syntax')
+
+
+    def as_term(self, expr_node):
+        """Returns the given expression as an ExprTerm, only wrapping it in
+        a ComplexTerm if it is more than a single term.
+
+        """
+        if expr_node.op is None and not expr_node.not_op:
+            return expr_node.first
+        return ComplexTerm(expr_node)
+
+
+    def as_rest(self, expr_node, power):
+        """Returns the given expression for use as the right operand of a
+        binary operator with the given binding power, parenthesizing it if
+        its own operator binds no tighter.
+
+        """
+        if expr_node.op is not None and BIN_OP_POWERS[expr_node.op.token_type] <= power:
+            return Expr(False, ComplexTerm(expr_node), None, None)
+        return expr_node
+
+
+    def legacy_expr(self):
+        """Parses an expression as a right-nested chain with no operator
+        precedence (the original tree shape).
+
+        """
         # creating node from the Expr class
         expr_node = Expr(None, None, None, None)
 
@@ -895,7 +1004,7 @@ class ASTParser:
             self.advance()
 
             # finding the expression after the NOT
-            expr_node = self.expr()
+            expr_node = self.legacy_expr()
 
             # setting not_op to true since it has a NOT
             expr_node.not_op = True
@@ -910,7 +1019,7 @@ class ASTParser:
             self.advance()
 
             # setting expr param in complex node to the found expr
-            complex_term_node.expr = self.expr()
+            complex_term_node.expr = self.legacy_expr()
 
             # setting the first param(ExprTerm) to the complex node
             expr_node.first = complex_term_node
@@ -919,14 +1028,12 @@ class ASTParser:
             self.error('Improper expression syntax')
         
         # looking for binary operators
-        if self.match_any([TokenType.PLUS, TokenType.MINUS, TokenType.TIMES, TokenType.DIVIDE
-                        ,TokenType.AND, TokenType.OR, TokenType.EQUAL, TokenType.LESS, TokenType.GREATER
-                        , TokenType.LESS_EQ, TokenType.GREATER_EQ, TokenType.NOT_EQUAL]):
+        if self.is_bin_op():
                         # determining bin operator to expr param
                         expr_node.op = self.bin_op()
 
                         # finding the rest of the expression
-                        expr_results = self.expr()
+                        expr_results = self.legacy_expr()
 
                         # setting the results of expr param to the rest of the expr
                         expr_node.rest = expr_results
@@ -935,62 +1042,8 @@ class ASTParser:
         return expr_node
 
     def bin_op(self):
-        if(self.match(TokenType.PLUS)):
-            operator_node = self.curr_token
-            self.advance()
-            return operator_node
-
-        if(self.match(TokenType.MINUS)):
-            operator_node = self.curr_token
-            self.advance()
-            return operator_node
-
-        if(self.match(TokenType.TIMES)):
-            operator_node = self.curr_token
-            self.advance()
-            return operator_node
-
-        if(self.match(TokenType.DIVIDE)):
-            operator_node = self.curr_token
-            self.advance()
-            return operator_node
-
-        if(self.match(TokenType.AND)):
-            operator_node = self.curr_token
-            self.advance()
-            return operator_node
-
-        if(self.match(TokenType.OR)):
-            operator_node = self.curr_token
-            self.advance()
-            return operator_node
-
-        if(self.match(TokenType.EQUAL)):
-            operator_node = self.curr_token
-            self.advance()
-            return operator_node
-
-        if(self.match(TokenType.LESS)):
-            operator_node = self.curr_token
-            self.advance()
-            return operator_node
-
-        if(self.match(TokenType.GREATER)):
-            operator_node = self.curr_token
-            self.advance()
-            return operator_node
-
-        if(self.match(TokenType.LESS_EQ)):
-            operator_node = self.curr_token
-            self.advance()
-            return operator_node
-
-        if(self.match(TokenType.GREATER_EQ)):
-            operator_node = self.curr_token
-            self.advance()
-            return operator_node
-            
-        if(self.match(TokenType.NOT_EQUAL)):
+        # consuming and returning the binary operator token
+        if self.is_bin_op():
             operator_node = self.curr_token
             self.advance()
             return operator_node
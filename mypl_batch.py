@@ -0,0 +1,129 @@
+"""Batch runner for executing many MyPL programs in a worker pool.
+
+Each program is compiled and run in its own VM by one of a pool of
+reused worker processes (so the Python startup and imports are paid
+once per worker instead of once per program). A program's standard
+output and exit status are captured exactly as a separate `mypl.py`
+run would produce them: errors are printed to the output and give
+status 1.
+
+NAME: Lauren Nguyen
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import io
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from mypl_error import MyPLError
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_vm import VM
+
+
+@dataclass
+class ProgramResult:
+    """The result of running one program in a batch."""
+    path: str               # the program's file
+    status: int             # exit status (0 if the program ran to completion)
+    output: str             # everything the program wrote to standard output
+    error: str = None       # the error message (or traceback), if any
+    time: float = 0.0       # compile plus run time in seconds
+
+
+def collect_files(paths):
+    """Returns the program files for the given files and directories (the
+    .mypl files in each directory, in sorted order).
+
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(name for name in os.listdir(path) if name.endswith('.mypl'))
+            files.extend(os.path.join(path, name) for name in names)
+        else:
+            files.append(path)
+    return files
+
+
+def run_program(path, limits=None):
+    """Compiles and runs the given program file in a new VM (within the
+    given ExecutionLimits, if any).
+
+    Returns: The ProgramResult. The program's standard input is empty.
+
+    """
+    output = io.StringIO()
+    error = None
+    start = time.perf_counter()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read()
+        ast = ASTParser(Lexer(FileWrapper(io.StringIO(source)))).parse()
+        ast.accept(SemanticChecker())
+        vm = VM()
+        ast.accept(CodeGenerator(vm))
+        vm.limits = limits
+        # the program's I/O goes through the VM's own streams
+        vm.stdin = io.StringIO()
+        vm.stdout = output
+        vm.run()
+    except OSError:
+        error = f"ERROR: Could not open file '{path}'"
+        print(error, file=output)
+    except MyPLError as ex:
+        error = str(ex)
+        print(error, file=output)
+    except Exception:
+        # an interpreter crash (printed to stderr by mypl.py)
+        error = traceback.format_exc()
+    status = 0 if error is None else 1
+    return ProgramResult(path, status, output.getvalue(), error,
+                         time.perf_counter() - start)
+
+
+def run_batch(paths, workers=None, limits=None):
+    """Runs each of the given program files in a pool of worker
+    processes.
+
+    Args:
+        paths -- The program files and directories of programs to run.
+        workers -- Number of worker processes (default: CPU count).
+        limits -- The ExecutionLimits for each program (if any).
+
+    Returns: The list of ProgramResults, in the order of the files.
+
+    """
+    files = collect_files(paths)
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, len(files) // (workers * 4))
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(run_program, files, [limits] * len(files),
+                                 chunksize=chunk_size))
+
+
+def report(results, wall_time=None):
+    """Returns the summary report for the given batch results: one line
+    per program with its status, time and output size, then the totals.
+
+    """
+    width = max([len(r.path) for r in results] + [4])
+    lines = [f'{"file":<{width}} {"status":>6} {"time (ms)":>10} {"output":>8}']
+    for r in results:
+        lines.append(f'{r.path:<{width}} {r.status:>6} {r.time * 1000:>10.2f} '
+                     f'{len(r.output):>8}')
+    failed = sum(1 for r in results if r.status != 0)
+    total = sum(r.time for r in results)
+    summary = f'{len(results)} programs, {failed} failed, {total:.3f} s total'
+    if wall_time is not None:
+        summary += f', {wall_time:.3f} s wall'
+    lines.append(summary)
+    return '\n'.join(lines)
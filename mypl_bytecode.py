@@ -0,0 +1,164 @@
+"""Compiled bytecode (.myplc) files for caching MyPL VM frame templates.
+
+A .myplc file holds the frame templates the code generator produced for
+a source program, along with the hash of that source and a stamp of the
+compiler that produced it. Loading returns None for any file that is
+missing, stale (different source or compiler) or corrupt, so callers
+can always fall back to compiling from source.
+
+NAME: Lauren Nguyen
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import hashlib
+import json
+import os
+from array import array
+
+from mypl_opcode import OpCode
+from mypl_frame import VMFrameTemplate, VMInstr
+
+
+# bump when the .myplc layout changes
+BYTECODE_VERSION = 3
+
+BYTECODE_MAGIC = 'MYPLC'
+
+BYTECODE_SUFFIX = '.myplc'
+
+# modules whose source determines the generated code
+COMPILER_MODULES = ['mypl_token.py', 'mypl_lexer.py', 'mypl_ast.py',
+                    'mypl_ast_parser.py', 'mypl_semantic_checker.py',
+                    'mypl_code_gen.py', 'mypl_frame.py', 'mypl_opcode.py',
+                    'mypl_bytecode.py']
+
+# operand types an instruction may carry
+OPERAND_TYPES = (int, float, str, bool, type(None))
+
+_compiler_stamp = None
+
+
+def compiler_stamp():
+    """Returns a string identifying the current compiler: the bytecode
+    format version and a digest of the compiler's source files.
+
+    """
+    global _compiler_stamp
+    if _compiler_stamp is None:
+        digest = hashlib.sha256()
+        base = os.path.dirname(os.path.abspath(__file__))
+        for name in COMPILER_MODULES:
+            try:
+                with open(os.path.join(base, name), 'rb') as f:
+                    digest.update(f.read())
+            except OSError:
+                digest.update(name.encode('utf-8'))
+        _compiler_stamp = f'{BYTECODE_VERSION}:{digest.hexdigest()[:16]}'
+    return _compiler_stamp
+
+
+def source_hash(source):
+    """Returns the content hash of the given MyPL source string."""
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def cache_path(source_path, source, cache_dir=None):
+    """Returns the .myplc path for a source file.
+
+    Args:
+        source_path -- The path of the MyPL source file.
+        source -- The contents of the source file.
+        cache_dir -- Directory to hold cache files, named by content
+            hash; if None the file is placed next to the source.
+
+    """
+    if cache_dir is None:
+        return os.path.splitext(source_path)[0] + BYTECODE_SUFFIX
+    return os.path.join(cache_dir, source_hash(source) + BYTECODE_SUFFIX)
+
+
+def dumps(frame_templates, source):
+    """Returns the .myplc (JSON) text for the given frame templates
+    compiled from the given source.
+
+    """
+    frames = []
+    for template in frame_templates.values():
+        instrs = [[instr.opcode.name, instr.operand, instr.comment]
+                  for instr in template.instructions]
+        frames.append([template.function_name, template.arg_count, instrs,
+                       template.line_table, template.columns.tolist()])
+    return json.dumps({'magic': BYTECODE_MAGIC,
+                       'compiler': compiler_stamp(),
+                       'source': source_hash(source),
+                       'frames': frames}, separators=(',', ':'))
+
+
+def loads(text, source):
+    """Returns the frame templates (function name -> VMFrameTemplate)
+    stored in .myplc text, or None if the text is corrupt or was not
+    compiled from the given source by the current compiler.
+
+    """
+    try:
+        data = json.loads(text)
+        if (data['magic'] != BYTECODE_MAGIC or
+                data['compiler'] != compiler_stamp() or
+                data['source'] != source_hash(source)):
+            return None
+        frame_templates = {}
+        for name, arg_count, instrs, line_table, columns in data['frames']:
+            if type(name) != str or type(arg_count) != int:
+                return None
+            template = VMFrameTemplate(name, arg_count, [])
+            for opcode, operand, comment in instrs:
+                if not isinstance(operand, OPERAND_TYPES) or type(comment) != str:
+                    return None
+                template.instructions.append(VMInstr(OpCode[opcode], operand, comment))
+            for pc, line in line_table:
+                if type(pc) != int or type(line) != int:
+                    return None
+                template.line_table.append((pc, line))
+            if any(type(column) != int for column in columns):
+                return None
+            template.columns = array('i', columns)
+            frame_templates[name] = template.freeze()
+        return frame_templates
+    except (ValueError, KeyError, TypeError, OverflowError, RecursionError):
+        return None
+
+
+def load(path, source):
+    """Returns the frame templates cached at path for the given source,
+    or None if there is no valid entry.
+
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except (OSError, ValueError):
+        return None
+    return loads(text, source)
+
+
+def save(path, source, frame_templates):
+    """Writes the frame templates compiled from source to path. The file
+    is replaced atomically; failures to write are ignored since the
+    cache is only an optimization.
+
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(dumps(frame_templates, source))
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
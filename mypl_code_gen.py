@@ -6,43 +6,115 @@ CLASS: CPSC 326
 
 """
 
+import threading
 
 from mypl_token import *
 from mypl_ast import *
-from mypl_var_table import *
-from mypl_frame import *
-from mypl_opcode import *
-from mypl_vm import *
+from mypl_var_table import VarTable
+# only the frame template and instruction helpers (not the VM itself,
+# which is passed in, so importing this module stays cheap)
+from mypl_frame import (
+    VMFrameTemplate, ADD, ALLOCA, ALLOCS, AND, CALL, CATCH_END, CATCH_START,
+    CMPEQ, CMPLE, CMPLT, CMPNE, DIV, DUP, GETC, GETF, GETI, JMP, JMPF, LEN,
+    LOAD, MUL, NOP, NOT, OR, PUSH, READ, RET, SETF, SETI, STORE, SUB, TODBL,
+    TOINT, TOSTR, TRY_END, TRY_START, WRITE)
+
+
+# binary operator -> (instruction, whether the operands are swapped);
+# a > b is generated as b < a (and a >= b as b <= a)
+BIN_OP_INSTRS = {
+    '+': (ADD, False), '-': (SUB, False), '*': (MUL, False), '/': (DIV, False),
+    '<': (CMPLT, False), '>': (CMPLT, True),
+    '<=': (CMPLE, False), '>=': (CMPLE, True),
+    'and': (AND, False), 'or': (OR, False),
+    '!=': (CMPNE, False), '==': (CMPEQ, False),
+}
+
+
+def term_node(term):
+    """Returns the node an expression term wraps, so that visiting it
+    skips the term's own (pass through) visit."""
+    term_type = type(term)
+    if term_type is SimpleTerm:
+        return term.rvalue
+    if term_type is ComplexTerm:
+        return term.expr
+    return term
 
 
 class CodeGenerator (Visitor):
 
-    def __init__(self, vm):
+    def __init__(self, vm, lazy=False):
         """Creates a new Code Generator given a VM. 
         
         Args:
             vm -- The target vm.
+            lazy -- If true, each function's code is generated on its
+                first call instead of up front.
         """
         # the vm to add frames to
         self.vm = vm
+        # whether to defer function code generation to the vm
+        self.lazy = lazy
         # the current frame template being generated
         self.curr_template = None
         # for var -> index mappings wrt to environments
         self.var_table = VarTable()
         # struct name -> StructDef for struct field info
         self.struct_defs = {}
+        # struct name -> {field name -> (index, DataType)}
+        self.struct_fields = {}
+        # token giving the source position of the instructions being
+        # generated, and the position of each instruction generated so far
+        self.curr_pos = None
+        self.curr_positions = []
+        # held while lowering a function on its first call (lazy mode),
+        # since VMs sharing lazily built templates share this generator
+        self.lock = threading.Lock()
 
     
     def add_instr(self, instr):
         """Helper function to add an instruction to the current template."""
         self.curr_template.instructions.append(instr)
+        self.curr_positions.append(self.curr_pos)
+
+
+    def add_positions(self):
+        """Helper function to build the current template's line table and
+        columns from the positions of its instructions."""
+        template = self.curr_template
+        positions = self.curr_positions
+        template.columns.fromlist(
+            [0 if token is None else token.column for token in positions])
+        table = template.line_table
+        line = None
+        for pc, token in enumerate(positions):
+            # start a new run if the source line changed
+            if token is not None and token.line != line:
+                line = token.line
+                table.append((pc, line))
 
         
-    def visit_program(self, program):
+    def record_structs(self, program):
+        """Records the program's struct definitions and their field maps
+        (needed before generating code for any function)."""
         for struct_def in program.struct_defs:
             struct_def.accept(self)
+            # field map in declaration order
+            fields = {}
+            for i, var_def in enumerate(struct_def.fields):
+                fields[var_def.var_name.lexeme] = (i, var_def.data_type)
+            self.struct_fields[struct_def.struct_name.lexeme] = fields
+
+        
+    @iterative
+    def visit_program(self, program):
+        self.record_structs(program)
         for fun_def in program.fun_defs:
-            fun_def.accept(self)
+            if self.lazy:
+                self.vm.add_unlowered_function(fun_def, self)
+            else:
+                yield fun_def
 
     
     def visit_struct_def(self, struct_def):
@@ -50,9 +122,12 @@ class CodeGenerator (Visitor):
         self.struct_defs[struct_def.struct_name.lexeme] = struct_def
 
         
+    @iterative
     def visit_fun_def(self, fun_def):
         # creating a new template for a new function
         self.curr_template = VMFrameTemplate(fun_def.fun_name.lexeme, 0, [])
+        self.curr_positions = []
+        self.curr_pos = fun_def.fun_name
 
         # pushing new enviorment through var table
         self.var_table.push_environment()
@@ -67,13 +142,10 @@ class CodeGenerator (Visitor):
             for i in range(0, len(fun_def.params)):
 
                 # accepting param
-                fun_def.params[i].accept(self)
+                yield fun_def.params[i]
 
-                # adding param name to var table
-                self.var_table.add(fun_def.params[i].var_name.lexeme)
-
-                # finding index it was stored at
-                j = self.var_table.get(fun_def.params[i].var_name.lexeme)
+                # adding param name to var table, finding index it was stored at
+                j = self.var_table.add(fun_def.params[i].var_name.lexeme)
 
                 # storing on the stack
                 self.add_instr(STORE(j))
@@ -91,7 +163,7 @@ class CodeGenerator (Visitor):
         for stmt in fun_def.stmts:
 
             # accepting
-            stmt.accept(self)
+            yield stmt
 
             # appending to list to keep count
             stmt_list.append(stmt)
@@ -99,6 +171,9 @@ class CodeGenerator (Visitor):
         # finding length of statements in func
         length = len(stmt_list)
 
+        # an implicit return is at the function's name
+        self.curr_pos = fun_def.fun_name
+
         # if there are no arguements, no return statement is present, push one
         if length == 0:
             self.add_instr(PUSH(None))
@@ -112,43 +187,50 @@ class CodeGenerator (Visitor):
         # pop environment
         self.var_table.pop_environment()
 
-        # adding frame to the vm
+        # adding frame (and its source positions) to the vm
+        self.add_positions()
         self.vm.add_frame_template(self.curr_template)
     
+    @iterative
     def visit_return_stmt(self, return_stmt):
 
         # accepting return
-        return_stmt.expr.accept(self)
+        yield return_stmt.expr
 
         # addign return
         self.add_instr(RET())
 
         
+    @iterative
     def visit_var_decl(self, var_decl):
 
         # if there is an expr after assign
         if var_decl.expr:
 
             # accept expr, push what ever is assigned onto stack
-            var_decl.expr.accept(self)
+            yield var_decl.expr
+            self.curr_pos = var_decl.var_def.var_name
         else:
 
             # otherwise push Null
+            self.curr_pos = var_decl.var_def.var_name
             self.add_instr(PUSH(None))
         
-        # adding the var name into the var_table
-        self.var_table.add(var_decl.var_def.var_name.lexeme)
-
-        # finding the index it was inserted in
-        i = self.var_table.get(var_decl.var_def.var_name.lexeme)
+        # adding the var name into the var_table, finding the index it was inserted in
+        i = self.var_table.add(var_decl.var_def.var_name.lexeme)
 
         # storing the variable at index found
         self.add_instr(STORE(i))
 
 
     
+    @iterative
     def visit_assign_stmt(self, assign_stmt):
 
+        # loads and stores are at the assigned variable
+        var_name = assign_stmt.lvalue[0].var_name
+        self.curr_pos = var_name
+
         # if path is one
         if len(assign_stmt.lvalue) == 1:
             # index to load from
@@ -160,16 +242,18 @@ class CodeGenerator (Visitor):
                 self.add_instr(LOAD(i))
 
                 # getting array expr
-                assign_stmt.lvalue[0].array_expr.accept(self)
+                yield assign_stmt.lvalue[0].array_expr
 
                 # accepting val
-                assign_stmt.expr.accept(self)
+                yield assign_stmt.expr
 
                 # setting index
+                self.curr_pos = var_name
                 self.add_instr(SETI())
             # basic assign stmt
             else:
-                assign_stmt.expr.accept(self)
+                yield assign_stmt.expr
+                self.curr_pos = var_name
                 self.add_instr(STORE(i))
 
         # structs
@@ -181,14 +265,16 @@ class CodeGenerator (Visitor):
                 curr_field = assign_stmt.lvalue[-1].var_name.lexeme
                 for i in range(1, len(assign_stmt.lvalue) - 1):
                     self.add_instr(GETF(assign_stmt.lvalue[i].var_name.lexeme))
-                assign_stmt.expr.accept(self)
+                yield assign_stmt.expr
+                self.curr_pos = var_name
                 self.add_instr(SETF(curr_field))
 
             # if there is an array in the first path
             else:
                 i = self.var_table.get(assign_stmt.lvalue[0].var_name.lexeme)
                 self.add_instr(LOAD(i))
-                assign_stmt.lvalue[0].array_expr.accept(self)
+                yield assign_stmt.lvalue[0].array_expr
+                self.curr_pos = var_name
                 self.add_instr(GETI())
                 curr_field = assign_stmt.lvalue[-1].var_name.lexeme
 
@@ -197,9 +283,11 @@ class CodeGenerator (Visitor):
                     self.add_instr(LOAD(oid))
                     self.add_instr(GETF(assign_stmt.lvalue[i].var_name.lexeme))
                     
-                assign_stmt.expr.accept(self)
+                yield assign_stmt.expr
+                self.curr_pos = var_name
                 self.add_instr(SETF(curr_field))
 
+    @iterative
     def visit_try_catch_stmt(self, try_stmt):
         # pushing enviorment to accept stmts
         self.var_table.push_environment()
@@ -209,7 +297,7 @@ class CodeGenerator (Visitor):
 
         # accepting statements
         for stmt in try_stmt.try_part:
-            stmt.accept(self)
+            yield stmt
         
         # setting try flag false
         self.add_instr(TRY_END())
@@ -223,19 +311,23 @@ class CodeGenerator (Visitor):
         self.add_instr(CATCH_START())
         # accepting statements
         for stmt in try_stmt.catch_parts:
-            stmt.accept(self)
+            yield stmt
 
         self.add_instr(CATCH_END())
         # popping environment
         self.var_table.pop_environment()
     
+    @iterative
     def visit_while_stmt(self, while_stmt):
 
         # saving index to jump back to
         stored_index = len(self.curr_template.instructions) 
 
         # accepting condition
-        while_stmt.condition.accept(self)
+        yield while_stmt.condition
+
+        # loop jumps are at the condition
+        cond_pos = self.curr_pos
 
         # creating jump_instr with a dummy value
         jump_instr = JMPF(-1)
@@ -248,12 +340,13 @@ class CodeGenerator (Visitor):
 
         # accepting statements
         for stmt in while_stmt.stmts:
-            stmt.accept(self)
+            yield stmt
 
         # popping environment
         self.var_table.pop_environment()
         
         # jumping back to the previous index AKA where the condition starts
+        self.curr_pos = cond_pos
         self.add_instr(JMP(stored_index))
 
         # adding landing spot for JMPF
@@ -265,19 +358,23 @@ class CodeGenerator (Visitor):
         
 
         
+    @iterative
     def visit_for_stmt(self, for_stmt):
 
         # pushing enviorment for var_decl
         self.var_table.push_environment()
 
         # accepting var decl
-        for_stmt.var_decl.accept(self)
+        yield for_stmt.var_decl
 
         # storing index where we need to jump back to to loop
         stored_index = len(self.curr_template.instructions)
 
         # accepting condition
-        for_stmt.condition.accept(self)
+        yield for_stmt.condition
+
+        # loop jumps are at the condition
+        cond_pos = self.curr_pos
 
         # setting dummy value for JMPF
         jump_instr = JMPF(-1)
@@ -288,13 +385,14 @@ class CodeGenerator (Visitor):
         # accepting stmts
         self.var_table.push_environment()
         for stmt in for_stmt.stmts:
-            stmt.accept(self)
+            yield stmt
         self.var_table.pop_environment()
 
         # accepting assign stmt AFTER stmts
-        for_stmt.assign_stmt.accept(self)
+        yield for_stmt.assign_stmt
 
         # jump back to stored index
+        self.curr_pos = cond_pos
         self.add_instr(JMP(stored_index))
 
         # pushing landing spot for JMPF
@@ -307,18 +405,19 @@ class CodeGenerator (Visitor):
         self.var_table.pop_environment()
 
     
+    @iterative
     def visit_if_stmt(self, if_stmt):
 
         # basic ifs
         if if_stmt.else_ifs == [] and if_stmt.else_stmts == []:
             jump_instr = JMPF(-1)
 
-            if_stmt.if_part.condition.accept(self)
+            yield if_stmt.if_part.condition
             self.add_instr(jump_instr)
 
             self.var_table.push_environment()
             for stmt in if_stmt.if_part.stmts:
-                stmt.accept(self)
+                yield stmt
             self.var_table.pop_environment()
             self.add_instr(NOP())
             jump_instr.operand = len(self.curr_template.instructions) - 1
@@ -327,43 +426,43 @@ class CodeGenerator (Visitor):
         elif if_stmt.else_ifs == [] and if_stmt.else_stmts != []:
             jump_instr = JMPF(-1)
 
-            if_stmt.if_part.condition.accept(self)
+            yield if_stmt.if_part.condition
             self.add_instr(jump_instr)
 
             self.var_table.push_environment()
             for stmt in if_stmt.if_part.stmts:
-                stmt.accept(self)
+                yield stmt
             self.var_table.pop_environment()
             self.add_instr(NOP())
             jump_instr.operand = len(self.curr_template.instructions) - 1
 
             self.var_table.push_environment()
             for stmt in if_stmt.else_stmts:
-                stmt.accept(self)
+                yield stmt
             self.var_table.pop_environment()
 
         # full if statement
         elif if_stmt.else_ifs != [] and if_stmt.else_stmts != []:
             jump_instr = JMPF(-1)
 
-            if_stmt.if_part.condition.accept(self)
+            yield if_stmt.if_part.condition
             self.add_instr(jump_instr)
 
             self.var_table.push_environment()
             for stmt in if_stmt.if_part.stmts:
-                stmt.accept(self)
+                yield stmt
             self.var_table.pop_environment()
             self.add_instr(NOP())
 
             jump_instr.operand = len(self.curr_template.instructions) - 1
 
             for i in range(0, len(if_stmt.else_ifs)):
-                if_stmt.else_ifs[i].condition.accept(self)
+                yield if_stmt.else_ifs[i].condition
                 self.add_instr(jump_instr)
 
                 self.var_table.push_environment()
                 for stmt in if_stmt.else_ifs[i].stmts:
-                    stmt.accept(self)
+                    yield stmt
                 self.var_table.pop_environment()
                 
                 self.add_instr(NOP())
@@ -371,7 +470,7 @@ class CodeGenerator (Visitor):
 
             self.var_table.push_environment()
             for stmt in if_stmt.else_stmts:
-                stmt.accept(self)
+                yield stmt
             self.var_table.pop_environment()
 
             self.add_instr(NOP())
@@ -379,41 +478,53 @@ class CodeGenerator (Visitor):
 
 
 
+    @iterative
     def visit_call_expr(self, call_expr):
+        # the call is at the function name (after the args)
+        fun_name = call_expr.fun_name
+        self.curr_pos = fun_name
+
         # print
         if call_expr.fun_name.lexeme == 'print':
             for i in range(0, len(call_expr.args)):
-                call_expr.args[i].accept(self)
+                yield call_expr.args[i]
+            self.curr_pos = fun_name
             self.add_instr(WRITE())
 
         # STOI
         elif call_expr.fun_name.lexeme == 'stoi':
-            call_expr.args[0].accept(self)
+            yield call_expr.args[0]
+            self.curr_pos = fun_name
             self.add_instr(TOINT())
 
         # DTOI
         elif call_expr.fun_name.lexeme == 'dtoi':
-            call_expr.args[0].accept(self)
+            yield call_expr.args[0]
+            self.curr_pos = fun_name
             self.add_instr(TOINT())
 
         # STOD
         elif call_expr.fun_name.lexeme == 'stod':
-            call_expr.args[0].accept(self)
+            yield call_expr.args[0]
+            self.curr_pos = fun_name
             self.add_instr(TODBL())
 
         # DTOS
         elif call_expr.fun_name.lexeme == 'dtos':
-            call_expr.args[0].accept(self)
+            yield call_expr.args[0]
+            self.curr_pos = fun_name
             self.add_instr(TOSTR())
 
         # ITOD
         elif call_expr.fun_name.lexeme == 'itod':
-            call_expr.args[0].accept(self)
+            yield call_expr.args[0]
+            self.curr_pos = fun_name
             self.add_instr(TODBL())
 
         # ITOS
         elif call_expr.fun_name.lexeme == 'itos':
-            call_expr.args[0].accept(self)
+            yield call_expr.args[0]
+            self.curr_pos = fun_name
             self.add_instr(TOSTR())
 
         # INPUT
@@ -422,108 +533,50 @@ class CodeGenerator (Visitor):
 
         # LEN
         elif call_expr.fun_name.lexeme == 'length':
-            call_expr.args[0].accept(self)
+            yield call_expr.args[0]
+            self.curr_pos = fun_name
             self.add_instr(LEN())
 
         # GET
         elif call_expr.fun_name.lexeme == 'get':
-            call_expr.args[0].accept(self)
-            call_expr.args[1].accept(self)
+            yield call_expr.args[0]
+            yield call_expr.args[1]
+            self.curr_pos = fun_name
             self.add_instr(GETC())
  
         # Non built in function calls
         else:
             for i in range (len(call_expr.args)):
-                call_expr.args[i].accept(self)
+                yield call_expr.args[i]
+            self.curr_pos = fun_name
             self.add_instr(CALL(call_expr.fun_name.lexeme))
 
         
+    @iterative
     def visit_expr(self, expr):
 
         # checking if expr is more than a simple r value
-        if expr.op:
-
-            # ADDITION
-            if expr.op.lexeme == '+':
-                expr.first.accept(self)
-                expr.rest.accept(self)
-                self.add_instr(ADD())
-
-            # SUBTRACTION
-            elif expr.op.lexeme == '-':
-                expr.first.accept(self)
-                expr.rest.accept(self)
-                self.add_instr(SUB())
-
-            # DIVISION
-            elif expr.op.lexeme == '/':
-                expr.first.accept(self)
-                expr.rest.accept(self)
-                self.add_instr(DIV())
-
-            # MULTIPLICATION
-            elif expr.op.lexeme == '*':
-                expr.first.accept(self)
-                expr.rest.accept(self)
-                self.add_instr(MUL())
-
-            # LESS THAN
-            elif expr.op.lexeme == '<':
-                expr.first.accept(self)
-                expr.rest.accept(self)
-                self.add_instr(CMPLT())
-
-            # GREATER THAN
-            elif expr.op.lexeme == '>':
+        op = expr.op
+        if op:
+            instr, swapped = BIN_OP_INSTRS[op.lexeme]
+            if swapped:
                 # accepting rest first to achieve "greater than" by comparing second val first
-                expr.rest.accept(self)
-                expr.first.accept(self)
-                self.add_instr(CMPLT())
-
-            # LESS THAN EQUAL TO
-            elif expr.op.lexeme == '<=':
-                expr.first.accept(self)
-                expr.rest.accept(self)
-                self.add_instr(CMPLE())
-
-            # GREATER THAN EQUAL TO
-            elif expr.op.lexeme == '>=':
-                # accepting rest first to achieve "greater than" by comparing second val first
-                expr.rest.accept(self)
-                expr.first.accept(self)
-                self.add_instr(CMPLE())
-
-            # AND
-            elif expr.op.lexeme == 'and':
-                expr.first.accept(self)
-                expr.rest.accept(self)
-                self.add_instr(AND())
-
-            # OR
-            elif expr.op.lexeme == 'or':
-                expr.first.accept(self)
-                expr.rest.accept(self)
-                self.add_instr(OR())
-
-            # NOT EQUAL TO
-            elif expr.op.lexeme == '!=':
-                expr.first.accept(self)
-                expr.rest.accept(self)
-                self.add_instr(CMPNE())
-
-            # EQUAL TO
-            elif expr.op.lexeme == '==':
-                expr.first.accept(self)
-                expr.rest.accept(self)
-                self.add_instr(CMPEQ())
+                yield expr.rest
+                yield term_node(expr.first)
+            else:
+                yield term_node(expr.first)
+                yield expr.rest
+            self.curr_pos = op
+            self.add_instr(instr())
+
         # NOT
         elif expr.not_op:
-            expr.first.accept(self)
+            yield term_node(expr.first)
             self.add_instr(NOT())
         
         # SIMPLE R VALUE
         else:
-            expr.first.accept(self)
+            yield term_node(expr.first)
 
             
     def visit_data_type(self, data_type):
@@ -536,15 +589,18 @@ class CodeGenerator (Visitor):
         pass
 
     
+    @iterative
     def visit_simple_term(self, simple_term):
-        simple_term.rvalue.accept(self)
+        yield simple_term.rvalue
 
         
+    @iterative
     def visit_complex_term(self, complex_term):
-        complex_term.expr.accept(self)
+        yield complex_term.expr
 
         
     def visit_simple_rvalue(self, simple_rvalue):
+        self.curr_pos = simple_rvalue.value
         val = simple_rvalue.value.lexeme
         if simple_rvalue.value.token_type == TokenType.INT_VAL:
             self.add_instr(PUSH(int(val)))
@@ -562,37 +618,41 @@ class CodeGenerator (Visitor):
             self.add_instr(PUSH(None))
 
     
+    @iterative
     def visit_new_rvalue(self, new_rvalue):
         # struct
         if new_rvalue.array_expr == None:
 
-            # finding current struct we are instantiating
-            curr_struct = self.struct_defs[new_rvalue.type_name.lexeme]
+            # finding fields of the struct we are instantiating
+            fields = self.struct_fields[new_rvalue.type_name.lexeme]
 
-            # allocating struct
-            self.add_instr(ALLOCS())
+            # allocating struct (the operand names its type for the VM's
+            # heap report)
+            self.curr_pos = new_rvalue.type_name
+            self.add_instr(ALLOCS(new_rvalue.type_name.lexeme))
 
             # looking thrrough fields
-            for i in range(0, len(curr_struct.fields)):
+            for field_name, (i, _) in fields.items():
+                self.curr_pos = new_rvalue.type_name
                 self.add_instr(DUP())
 
                 # accepting struct_params
-                new_rvalue.struct_params[i].accept(self)
-
-                # finding field name
-                field_name = curr_struct.fields[i].var_name.lexeme
+                yield new_rvalue.struct_params[i]
 
                 # setting field
+                self.curr_pos = new_rvalue.type_name
                 self.add_instr(SETF(field_name))
         else:
             # finding array expr
-            new_rvalue.array_expr.accept(self)
+            yield new_rvalue.array_expr
 
-            # allocating array
-            self.add_instr(ALLOCA())
+            # allocating array (of the element type)
+            self.curr_pos = new_rvalue.type_name
+            self.add_instr(ALLOCA(new_rvalue.type_name.lexeme))
 
 
     
+    @iterative
     def visit_var_rvalue(self, var_rvalue):
 
         # creating flag to find the first expression in path
@@ -600,6 +660,7 @@ class CodeGenerator (Visitor):
 
         # iterating through path
         for varref in var_rvalue.path:
+            self.curr_pos = varref.var_name
 
             # inital path val
             if cnt == 0:
@@ -612,30 +673,32 @@ class CodeGenerator (Visitor):
                 if varref.array_expr != None:
 
                     # accept the array expr
-                    varref.array_expr.accept(self)
+                    yield varref.array_expr
 
                     # get index
+                    self.curr_pos = varref.var_name
                     self.add_instr(GETI())
             else:
                 # if it is an array
                 if varref.array_expr != None:
+                    # finding index to load val
+                    index = self.var_table.get(varref.var_name.lexeme)
+
                     # if it is not in the var table or in struct_defs
-                    if(self.var_table.get(varref.var_name.lexeme) == None) and not (varref.var_name.lexeme in self.struct_defs):
+                    if(index == None) and not (varref.var_name.lexeme in self.struct_defs):
 
                         # get field
                         self.add_instr(GETF(varref.var_name.lexeme))
                     else:
 
-                        # finding index to load val
-                        index = self.var_table.get(varref.var_name.lexeme)
-
                         # loading val
                         self.add_instr(LOAD(index))
                     
                     # accepting array expr
-                    varref.array_expr.accept(self)
+                    yield varref.array_expr
 
                     # getting index of array
+                    self.curr_pos = varref.var_name
                     self.add_instr(GETI())
                 else:
 
@@ -67,3 +67,28 @@ def VMError(message):
 
 
 
+
+
+
+class VMLimitError(MyPLError):
+    """For runtime errors from exceeding a VM execution limit."""
+
+    def __init__(self, limit, function_name, pc, instr, position=None):
+        """Create a VMLimitError exception object.
+
+        Args:
+            limit -- The name of the limit exceeded (e.g., 'instruction').
+            function_name -- The function running when the limit was hit.
+            pc -- The index of the instruction about to run.
+            instr -- That instruction.
+            position -- The instruction's source (line, column), if known.
+
+        """
+        message = f'VM Error: {limit} limit exceeded'
+        if position:
+            message += f' near line {position[0]}, column {position[1]}'
+        super().__init__(f'{message} (in {function_name} at {pc}: {instr})')
+        self.limit = limit
+        self.function_name = function_name
+        self.pc = pc
+        self.position = position
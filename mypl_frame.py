@@ -8,17 +8,54 @@ CLASS: CPSC 326
 """
 
 
-from dataclasses import dataclass, field
+from array import array
+from bisect import bisect_right
+from dataclasses import FrozenInstanceError, dataclass, field
 from typing import Any
 from mypl_opcode import OpCode
 
 
 @dataclass
 class VMFrameTemplate:
-    """A VM function-call frame template (type)."""
+    """A VM function-call frame template (type). A template is built by
+    appending to its lists and is frozen when it is added to a VM, so
+    that any number of VMs can share it."""
     function_name: str
     arg_count: int
     instructions: list['VMInstr'] = field(default_factory=list) 
+    # run-length source lines: (first pc, line) for each run of
+    # instructions generated from the same source line
+    line_table: list[tuple] = field(default_factory=list)
+    # source column of each instruction (0 if unknown)
+    columns: array = field(default_factory=lambda: array('i'))
+
+    def freeze(self):
+        """Makes the template immutable (its lists become tuples, its
+        columns a read-only view, and its fields can no longer be set).
+
+        Returns: The template.
+
+        """
+        if not self.__dict__.get('frozen'):
+            self.instructions = tuple(self.instructions)
+            self.line_table = tuple(self.line_table)
+            self.columns = memoryview(self.columns).toreadonly()
+            self.__dict__['frozen'] = True
+        return self
+
+    def __setattr__(self, name, value):
+        if self.__dict__.get('frozen'):
+            raise FrozenInstanceError(f'cannot assign to field {name!r}')
+        super().__setattr__(name, value)
+
+    def source_position(self, pc):
+        """Returns the (line, column) the instruction at pc was generated
+        from, or None if unknown."""
+        i = bisect_right(self.line_table, pc, key=lambda run: run[0]) - 1
+        if i < 0:
+            return None
+        column = self.columns[pc] if pc < len(self.columns) else 0
+        return self.line_table[i][1], column
 
     
 @dataclass
@@ -124,8 +161,8 @@ def TODBL():
 def TOSTR():
     return VMInstr(OpCode.TOSTR)
 
-def ALLOCS():
-    return VMInstr(OpCode.ALLOCS)
+def ALLOCS(struct_name=None):
+    return VMInstr(OpCode.ALLOCS, struct_name)
 
 def SETF(field_name):
     return VMInstr(OpCode.SETF, field_name)
@@ -133,8 +170,8 @@ def SETF(field_name):
 def GETF(field_name):
     return VMInstr(OpCode.GETF, field_name)
 
-def ALLOCA():
-    return VMInstr(OpCode.ALLOCA)
+def ALLOCA(elem_type=None):
+    return VMInstr(OpCode.ALLOCA, elem_type)
 
 def SETI():
     return VMInstr(OpCode.SETI)
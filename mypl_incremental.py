@@ -0,0 +1,238 @@
+"""Incremental compiler driver for edit-run loops over MyPL programs.
+
+The source is split into its top-level struct and function definitions
+and each definition is fingerprinted by its text. Across compiles, an
+unchanged definition reuses its parsed AST, and an unchanged function
+whose dependencies are also unchanged reuses its (checked) frame
+template. A function's dependencies are the structs and functions it
+names, followed through struct field types and function signatures, so
+changing a struct layout or a function signature recompiles every
+function that could see the change.
+
+NAME: Lauren Nguyen
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import hashlib
+import io
+import re
+
+from mypl_error import MyPLError
+from mypl_iowrapper import FileWrapper
+from mypl_token import TokenType
+from mypl_lexer import Lexer
+from mypl_ast import Program
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_frame import VMFrameTemplate
+from mypl_vm import VM
+
+
+# comments, string literals and braces (all the splitter needs to see)
+SPLIT_PATTERN = re.compile(r'//[^\n]*|"[^"\n]*"|[{}]')
+
+WHITESPACE = re.compile(r'\s*')
+
+
+def split_definitions(source):
+    """Splits MyPL source into top-level definition chunks.
+
+    Returns: A list of (text, line, column) tuples, where line and
+    column give the position just before the chunk's first character.
+    Each chunk starts at a definition's first non-whitespace character
+    (so moving a definition doesn't change its text) and ends with its
+    closing brace, except for any trailing text after the last one.
+
+    """
+    chunks = []
+    depth = 0
+    start = 0
+    line = 1
+
+    def add_chunk(start, end):
+        first = WHITESPACE.match(source, start).end()
+        first_line = line + source.count('\n', start, first)
+        column = first - (source.rfind('\n', 0, first) + 1)
+        chunks.append((source[first:end], first_line, column))
+        return first_line + source.count('\n', first, end)
+
+    for match in SPLIT_PATTERN.finditer(source):
+        brace = match.group()
+        if brace == '{':
+            depth += 1
+        elif brace == '}':
+            depth -= 1
+            if depth == 0:
+                line = add_chunk(start, match.end())
+                start = match.end()
+    if source[start:].strip():
+        add_chunk(start, len(source))
+    return chunks
+
+
+def relocate_template(template, delta):
+    """Returns the frame template with its source lines moved by delta
+    lines (sharing the instructions and columns)."""
+    if not delta:
+        return template
+    line_table = [(pc, line + delta) for pc, line in template.line_table]
+    return VMFrameTemplate(template.function_name, template.arg_count,
+                           template.instructions, line_table, template.columns)
+
+
+class RecordingLexer(Lexer):
+    """Lexer starting at a given source position that records every
+    token it returns (so the tokens can be relocated later)."""
+
+    def __init__(self, in_stream, line, column):
+        super().__init__(in_stream)
+        self.line = line
+        self.column = column
+        self.tokens = []
+
+    def next_token(self):
+        token = super().next_token()
+        self.tokens.append(token)
+        return token
+
+
+class ParsedChunk:
+    """The parse of one definition chunk."""
+
+    def __init__(self, text, line, column):
+        lexer = RecordingLexer(FileWrapper(io.StringIO(text)), line, column)
+        self.program = ASTParser(lexer).parse()
+        self.tokens = lexer.tokens
+        self.line = line
+        # identifiers used (candidate struct and function dependencies)
+        self.names = {t.lexeme for t in self.tokens if t.token_type == TokenType.ID}
+        self.digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+    def relocate(self, line):
+        """Moves the chunk's tokens to start at the given line."""
+        delta = line - self.line
+        if delta:
+            for token in self.tokens:
+                token.line += delta
+            self.line = line
+
+
+class IncrementalCompiler:
+    """Compiles successive versions of a MyPL program, reusing the work
+    for definitions (and their dependencies) that did not change."""
+
+    def __init__(self):
+        # (chunk text, start column) -> ParsedChunk
+        self.chunks = {}
+        # function name -> (dependency key, frame template, chunk line)
+        self.functions = {}
+        # number of chunks parsed and functions lowered by the last compile
+        self.parsed = 0
+        self.lowered = 0
+
+
+    def compile(self, source):
+        """Checks and generates code for the given program source.
+
+        Returns: A VM holding the program's frame templates.
+
+        Raises: The MyPLError for the first error in the program.
+
+        """
+        chunks = self.parse(source)
+        program = Program([], [])
+        struct_chunks = {}
+        fun_chunks = {}
+        for chunk in chunks:
+            for struct_def in chunk.program.struct_defs:
+                program.struct_defs.append(struct_def)
+                struct_chunks[struct_def.struct_name.lexeme] = chunk
+            for fun_def in chunk.program.fun_defs:
+                program.fun_defs.append(fun_def)
+                fun_chunks[fun_def.fun_name.lexeme] = chunk
+        # program-level and struct checks are cheap; always redo them
+        checker = SemanticChecker()
+        checker.record_program(program)
+        for struct_def in checker.structs.values():
+            struct_def.accept(checker)
+        vm = VM()
+        codegen = CodeGenerator(vm)
+        codegen.record_structs(program)
+        functions = {}
+        self.lowered = 0
+        for fun_def in program.fun_defs:
+            name = fun_def.fun_name.lexeme
+            chunk = fun_chunks[name]
+            key = self.dependency_key(chunk, checker, struct_chunks)
+            cached = self.functions.get(name)
+            if cached is not None and cached[0] == key:
+                vm.add_frame_template(relocate_template(cached[1], chunk.line - cached[2]))
+            else:
+                fun_def.accept(checker)
+                fun_def.accept(codegen)
+                self.lowered += 1
+            functions[name] = (key, vm.frame_templates[name], chunk.line)
+        self.functions = functions
+        return vm
+
+
+    def parse(self, source):
+        """Returns the ParsedChunk of each definition in the source,
+        reusing (and relocating) the parses of unchanged definitions.
+
+        """
+        chunks = {}
+        parsed = []
+        self.parsed = 0
+        try:
+            for text, line, column in split_definitions(source):
+                chunk = self.chunks.get((text, column))
+                # (a repeated definition gets its own parse)
+                if chunk is None or (text, column) in chunks:
+                    chunk = ParsedChunk(text, line, column)
+                    self.parsed += 1
+                else:
+                    chunk.relocate(line)
+                chunks[(text, column)] = chunk
+                parsed.append(chunk)
+        except MyPLError:
+            # report the error exactly as a whole-program parse would
+            ASTParser(Lexer(FileWrapper(io.StringIO(source)))).parse()
+            raise
+        self.chunks = chunks
+        return parsed
+
+
+    def dependency_key(self, chunk, checker, struct_chunks):
+        """Returns the key identifying a function's chunk together with
+        everything it can depend on: the layouts of the structs and the
+        signatures of the functions it names, transitively through
+        struct field types and signature types.
+
+        """
+        parts = set()
+        seen = set()
+        names = list(chunk.names)
+        while names:
+            name = names.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            if name in checker.structs:
+                # a struct's layout is its text; follow its field types
+                struct_chunk = struct_chunks[name]
+                parts.add(('struct', name, struct_chunk.digest))
+                names.extend(struct_chunk.names - seen)
+            elif name in checker.functions:
+                fun_def = checker.functions[name]
+                types = [fun_def.return_type] + [p.data_type for p in fun_def.params]
+                signature = [(t.is_array, t.type_name.lexeme) for t in types]
+                parts.add(('fun', name, tuple(signature)))
+                names.extend(t.type_name.lexeme for t in types)
+            else:
+                parts.add(('undefined', name))
+        return chunk.digest, frozenset(parts)
@@ -8,7 +8,6 @@ CLASS: CPSC 326
 
 from mypl_token import *
 from mypl_error import *
-import re
 
 
 class Lexer:
@@ -95,7 +94,7 @@ class Lexer:
                     ch = self.read() # read new line char
                     self.column = 1 # reset cols
                     self.line +=1 # add to line
-                if(ch.isspace()):
+                elif(ch.isspace()):
                     ch = self.read()
 
         # EOF
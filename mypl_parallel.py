@@ -0,0 +1,122 @@
+"""Parallel semantic checking and code generation for MyPL programs.
+
+The program's struct definitions and function signatures are checked
+and recorded up front. Function bodies are then checked and lowered in
+chunks by worker processes, and the resulting frame templates are merged
+into the VM in source order. Errors are reported deterministically: the
+first error in source order wins, exactly as with a serial compile.
+
+NAME: Lauren Nguyen
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from mypl_error import MyPLError
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_frame import VMFrameTemplate, VMInstr
+from mypl_opcode import OpCode
+from mypl_vm import VM
+
+
+# opcodes by index, and index of each opcode, for packing templates
+OPCODES = list(OpCode)
+OPCODE_INDEXES = {opcode: i for i, opcode in enumerate(OPCODES)}
+
+
+# the program being compiled and this worker's checker and code
+# generator (set in each worker process by _init_worker)
+_program = None
+_checker = None
+_codegen = None
+
+
+def _init_worker(program):
+    """Sets up a worker process to check and lower the program's
+    functions.
+
+    """
+    global _program, _checker, _codegen
+    _program = program
+    _checker = SemanticChecker()
+    _checker.record_program(program)
+    _codegen = CodeGenerator(VM())
+    _codegen.record_structs(program)
+
+
+def pack_template(template):
+    """Returns a frame template as plain tuples (much cheaper to send
+    between processes than the dataclasses)."""
+    instrs = [(OPCODE_INDEXES[instr.opcode], instr.operand, instr.comment)
+              for instr in template.instructions]
+    return (template.function_name, template.arg_count, instrs, template.line_table,
+            template.columns.tobytes())
+
+
+def unpack_template(packed):
+    """Returns the frame template for a packed template."""
+    name, arg_count, instrs, line_table, columns = packed
+    return VMFrameTemplate(name, arg_count, [VMInstr(OPCODES[opcode], operand, comment)
+                                             for opcode, operand, comment in instrs],
+                           line_table, array('i', columns))
+
+
+def _compile_chunk(start, end):
+    """Checks and lowers functions start..end-1 (in source order).
+
+    Returns: The list of (packed) frame templates, ending with a MyPLError
+    instead if one of the functions has an error (later functions in
+    the chunk are skipped).
+
+    """
+    results = []
+    for fun_def in _program.fun_defs[start:end]:
+        try:
+            fun_def.accept(_checker)
+            fun_def.accept(_codegen)
+        except MyPLError as ex:
+            results.append(ex)
+            break
+        results.append(pack_template(_codegen.vm.frame_templates.pop(fun_def.fun_name.lexeme)))
+    return results
+
+
+def compile_program(program, vm, workers=None, chunk_size=None):
+    """Semantically checks the program and generates its code into the
+    VM, checking and lowering function bodies in worker processes.
+
+    Args:
+        program -- The Program AST.
+        vm -- The VM to add the frame templates to.
+        workers -- Number of worker processes (default: CPU count).
+        chunk_size -- Functions per task (default: split the functions
+            evenly, four tasks per worker).
+
+    Raises: The MyPLError for the first error in source order.
+
+    """
+    # signatures and structs are checked serially, as in visit_program
+    checker = SemanticChecker()
+    checker.record_program(program)
+    for struct_def in checker.structs.values():
+        struct_def.accept(checker)
+    workers = workers or os.cpu_count() or 1
+    count = len(program.fun_defs)
+    if chunk_size is None:
+        chunk_size = max(1, -(-count // (workers * 4)))
+    starts = range(0, count, chunk_size)
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(program,)) as executor:
+        ends = [min(start + chunk_size, count) for start in starts]
+        # map returns chunk results in source order
+        for results in executor.map(_compile_chunk, starts, ends):
+            for result in results:
+                if isinstance(result, MyPLError):
+                    executor.shutdown(cancel_futures=True)
+                    raise result
+                vm.add_frame_template(unpack_template(result))
@@ -47,38 +47,41 @@ class PrintVisitor(Visitor):
 
     # Visitor Functions
     
+    @iterative
     def visit_program(self, program):
         for struct in program.struct_defs:
-            struct.accept(self)
+            yield struct
             self.output('\n')
         for fun in program.fun_defs:
-            fun.accept(self)
+            yield fun
             self.output('\n')            
 
             
+    @iterative
     def visit_struct_def(self, struct_def):
         self.output('struct ' + struct_def.struct_name.lexeme + ' {\n')
         self.indent += 1
         for var_def in struct_def.fields:
             self.output_indent()
-            var_def.accept(self)
+            yield var_def
             self.output(';\n')
         self.indent -= 1
         self.output('}\n')
 
 
+    @iterative
     def visit_fun_def(self, fun_def):
-        fun_def.return_type.accept(self)
+        yield fun_def.return_type
         self.output(' ' + fun_def.fun_name.lexeme + '(')
         for i in range(len(fun_def.params)):
-            fun_def.params[i].accept(self)
+            yield fun_def.params[i]
             if i < len(fun_def.params) - 1:
                 self.output(', ')
         self.output(') {\n')
         self.indent += 1
         for stmt in fun_def.stmts:
             self.output_indent()
-            stmt.accept(self)
+            yield stmt
             self.output_semicolon(stmt)
             self.output('\n')
         self.indent -= 1
@@ -87,51 +90,56 @@ class PrintVisitor(Visitor):
 
     # TODO: Finish the rest of the visitor functions below
 
+    @iterative
     def visit_return_stmt(self, return_stmt):
         self.output('return ' )
-        return_stmt.expr.accept(self)
+        yield return_stmt.expr
 
+    @iterative
     def visit_var_decl(self, var_decl):
-        var_decl.var_def.accept(self)
+        yield var_decl.var_def
         if(var_decl.expr != None and var_decl.var_def.data_type.type_name.lexeme == 'string'):
             self.output(' = ')
             self.output('"')
-            var_decl.expr.accept(self)
+            yield var_decl.expr
             self.output('"')
         else:
             self.output(' = ')
-            var_decl.expr.accept(self)
+            yield var_decl.expr
 
+    @iterative
     def visit_assign_stmt(self, assign_stmt):
         for i in range(len(assign_stmt.lvalue)):
             self.output(assign_stmt.lvalue[i].var_name.lexeme)
             self.output(' = ')
-            assign_stmt.expr.accept(self)
+            yield assign_stmt.expr
 
+    @iterative
     def visit_while_stmt(self, while_stmt):
         self.output('while (')
-        while_stmt.condition.accept(self)
+        yield while_stmt.condition
         self.output(') { \n')
         self.indent +=1
         for stmt in while_stmt.stmts:
             self.output_indent()
-            stmt.accept(self)
+            yield stmt
             self.output_semicolon(stmt)
             self.output('\n')
         self.indent-=1
 
+    @iterative
     def visit_for_stmt(self, for_stmt):
         self.output('for (')
-        for_stmt.var_decl.accept(self)
+        yield for_stmt.var_decl
         self.output('; ')
-        for_stmt.condition.accept(self)
+        yield for_stmt.condition
         self.output('; ')
-        for_stmt.assign_stmt.accept(self)
+        yield for_stmt.assign_stmt
         self.output(') { \n')
         self.indent+=1
         for stmt in for_stmt.stmts:
             self.output_indent()
-            stmt.accept(self)
+            yield stmt
             self.output_semicolon(stmt)
             self.output('\n')
         self.indent-=1
@@ -139,11 +147,12 @@ class PrintVisitor(Visitor):
         self.output('} \n')
 
 
+    @iterative
     def visit_if_stmt(self, if_stmt):
         # just if case
         if((len(if_stmt.else_ifs) == 0) and (len(if_stmt.else_stmts) == 0)):
             self.output("if (")
-            if_stmt.if_part.condition.accept(self)
+            yield if_stmt.if_part.condition
             self.output(") { \n")
             self.indent+=1
             if(if_stmt.if_part.stmts == None):
@@ -151,7 +160,7 @@ class PrintVisitor(Visitor):
             else:
                 for stmt in if_stmt.if_part.stmts:
                     self.output_indent()
-                    stmt.accept(self)
+                    yield stmt
                     self.output_semicolon(stmt)
                     self.output('\n')
                 self.indent-=1
@@ -161,12 +170,12 @@ class PrintVisitor(Visitor):
         # no else, elifs case
         elif((len(if_stmt.else_ifs) != 0) and (len(if_stmt.else_stmts) == 0)):
             self.output("if (")
-            if_stmt.if_part.condition.accept(self)
+            yield if_stmt.if_part.condition
             self.output(") { \n")
             self.indent+=1
             for stmt in if_stmt.if_part.stmts:
                 self.output_indent()
-                stmt.accept(self)
+                yield stmt
                 self.output_semicolon(stmt)
                 self.output('\n')
             self.indent-=1
@@ -177,12 +186,12 @@ class PrintVisitor(Visitor):
             for i in range(len(if_stmt.else_ifs)):
                 self.output_indent()
                 self.output("else if (")
-                if_stmt.else_ifs[i].condition.accept(self)
+                yield if_stmt.else_ifs[i].condition
                 self.output(") { \n")
                 self.indent+=1
                 for stmt in if_stmt.else_ifs[i].stmts:
                     self.output_indent()
-                    stmt.accept(self)
+                    yield stmt
                     self.output_semicolon(stmt)
                     self.output('\n')
                 self.indent-=1
@@ -193,12 +202,12 @@ class PrintVisitor(Visitor):
         # no elif, else
         elif((len(if_stmt.else_ifs) == 0) and (len(if_stmt.else_stmts) != 0)):
             self.output("if (")
-            if_stmt.if_part.condition.accept(self)
+            yield if_stmt.if_part.condition
             self.output(") { \n")
             self.indent+=1
             for stmt in if_stmt.if_part.stmts:
                 self.output_indent()
-                stmt.accept(self)
+                yield stmt
                 self.output_semicolon(stmt)
                 self.output('\n')
             self.indent-=1
@@ -210,7 +219,7 @@ class PrintVisitor(Visitor):
             self.indent+=1
             for stmt in if_stmt.else_stmts:
                     self.output_indent()
-                    stmt.accept(self)
+                    yield stmt
                     self.output_semicolon(stmt)
                     self.output('\n')
             self.indent-=1
@@ -221,12 +230,12 @@ class PrintVisitor(Visitor):
         # full if statement
         elif((len(if_stmt.else_ifs) != 0) and (len(if_stmt.else_stmts) != 0)):
             self.output("if (")
-            if_stmt.if_part.condition.accept(self)
+            yield if_stmt.if_part.condition
             self.output(") { \n")
             self.indent+=1
             for stmt in if_stmt.if_part.stmts:
                 self.output_indent()
-                stmt.accept(self)
+                yield stmt
                 self.output_semicolon(stmt)
                 self.output('\n')
             self.indent-=1
@@ -236,12 +245,12 @@ class PrintVisitor(Visitor):
             for i in range(len(if_stmt.else_ifs)):
                 self.output_indent()
                 self.output("else if (")
-                if_stmt.else_ifs[i].condition.accept(self)
+                yield if_stmt.else_ifs[i].condition
                 self.output(") { \n")
                 self.indent+=1
                 for stmt in if_stmt.else_ifs[i].stmts:
                     self.output_indent()
-                    stmt.accept(self)
+                    yield stmt
                     self.output_semicolon(stmt)
                     self.output('\n')
                 self.indent-=1
@@ -254,7 +263,7 @@ class PrintVisitor(Visitor):
             self.indent+=1
             for stmt in if_stmt.else_stmts:
                     self.output_indent()
-                    stmt.accept(self)
+                    yield stmt
                     self.output_semicolon(stmt)
                     self.output('\n')
             self.indent-=1
@@ -263,27 +272,29 @@ class PrintVisitor(Visitor):
         
             
     
+    @iterative
     def visit_call_expr(self, call_expr):
         self.output(call_expr.fun_name.lexeme + ' (')
         for i in range(len(call_expr.args)):
             self.output("string found")
-            call_expr.args[i].accept(self)
+            yield call_expr.args[i]
             if i < len(call_expr.args) - 1:
                 self.output(', ')
         self.output(')')
         
     
+    @iterative
     def visit_expr(self, expr):
         if(expr.not_op == True):
             self.output('not ')
-        expr.first.accept(self)
+        yield expr.first
 
         if expr.op != None:
             self.output(' ')
             self.output(expr.op.lexeme + ' ')
 
         if expr.rest != None:
-            expr.rest.accept(self)
+            yield expr.rest
     
     def visit_data_type(self, data_type):
         if(data_type.is_array == False):
@@ -294,40 +305,45 @@ class PrintVisitor(Visitor):
         elif(data_type.is_array.lexeme == True):
             self.output('array ' + data_type.type_name.lexeme)
 
+    @iterative
     def visit_var_def(self, var_def):
-        var_def.data_type.accept(self)
+        yield var_def.data_type
         self.output(' ' + var_def.var_name.lexeme)
 
+    @iterative
     def visit_simple_term(self, simple_term):
-        simple_term.rvalue.accept(self)
+        yield simple_term.rvalue
 
+    @iterative
     def visit_complex_term(self, complex_term):
         self.output('(')
-        complex_term.expr.accept(self)
+        yield complex_term.expr
         self.output(')')
 
     def visit_simple_rvalue(self, simple_rvalue):
         self.output(simple_rvalue.value.lexeme)
     
+    @iterative
     def visit_new_rvalue(self, new_rvalue):
         self.output("new " + new_rvalue.type_name.lexeme)
         if(new_rvalue.array_expr != None):
                 self.output('[')
-                new_rvalue.array_expr.accept(self)
+                yield new_rvalue.array_expr
                 self.output(']')
         if(new_rvalue.struct_params != None):
             for i in range(len(new_rvalue.struct_params)):
-                new_rvalue.struct_params[i].accept(self)
+                yield new_rvalue.struct_params[i]
                 if i < len(new_rvalue.struct_params) - 1:
                     self.output(', ')
             self.output(')')
 
+    @iterative
     def visit_var_rvalue(self, var_rvalue):
     
         for i in range(len(var_rvalue.path)):
             self.output(var_rvalue.path[i].var_name.lexeme)
             if(var_rvalue.path[i].array_expr != None):
                 self.output('[')
-                var_rvalue.path[i].array_expr.accept(self)
+                yield var_rvalue.path[i].array_expr
                 self.output(']')
     
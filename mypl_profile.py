@@ -0,0 +1,383 @@
+"""Execution profilers for the MyPL VM.
+
+A profiler is attached to a VM through `vm.profiler` and sampled by the
+run loop every `profiler.interval` instructions (through the same
+countdown as the execution limits, which costs an unprofiled run no
+measurable time; see benchmarks/results/run_loop.txt). Each sample sees the VM and the frame about to run the
+instruction at `frame.pc - 1`. A call profiler is attached through
+`vm.call_profiler` instead and only told of each CALL and RET, and a
+heap profiler through `vm.heap_profiler`, told of each ALLOCS and ALLOCA.
+
+NAME: Lauren Nguyen
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import sys
+import time
+from mypl_opcode import OpCode
+
+
+class OpcodeProfiler:
+    """Counts and times every instruction executed, by opcode, by
+    function, and by (function, pc).
+
+    The time of an instruction runs from its sample to the next one, so
+    it includes the (roughly constant) cost of the sampling itself.
+
+    """
+
+    def __init__(self):
+        self.interval = 1
+        # (function name, pc) -> [count, seconds]
+        self.counters = {}
+        # function name -> frame template (to look up the instructions
+        # when reporting)
+        self.templates = {}
+        # the counter of the instruction running and its start time
+        self.current = None
+        self.start = None
+
+
+    def sample(self, vm, frame):
+        """Records the start of the instruction at frame.pc - 1."""
+        now = time.perf_counter()
+        if self.current is not None:
+            self.current[1] += now - self.start
+        key = (frame.template.function_name, frame.pc - 1)
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters[key] = [0, 0.0]
+            self.templates[key[0]] = frame.template
+        counter[0] += 1
+        self.current = counter
+        self.start = time.perf_counter()
+
+
+    def finish(self):
+        """Ends the timing of the last instruction run."""
+        if self.current is not None:
+            self.current[1] += time.perf_counter() - self.start
+            self.current = None
+
+
+    def report(self, top=20):
+        """Returns the profile as a dictionary (suitable for JSON) with
+        the totals, the opcodes, functions and source lines sorted by
+        time, and the top hottest instructions.
+
+        """
+        self.finish()
+        opcodes = {}
+        functions = {}
+        lines = {}
+        instructions = []
+        for (name, pc), (count, seconds) in self.counters.items():
+            template = self.templates[name]
+            instr = template.instructions[pc]
+            position = template.source_position(pc)
+            line = position[0] if position else None
+            for totals, key in [(opcodes, instr.opcode.name), (functions, name), (lines, line)]:
+                entry = totals.setdefault(key, [0, 0.0])
+                entry[0] += count
+                entry[1] += seconds
+            instructions.append({'function': name, 'pc': pc, 'line': line,
+                                 'instr': str(instr), 'count': count, 'time': seconds})
+        def by_time(totals, label):
+            rows = [{label: key, 'count': count, 'time': seconds}
+                    for key, (count, seconds) in totals.items()]
+            return sorted(rows, key=lambda row: (-row['time'], -row['count']))
+        instructions.sort(key=lambda row: (-row['time'], -row['count']))
+        return {'instructions': sum(row['count'] for row in instructions),
+                'time': sum(row['time'] for row in instructions),
+                'opcodes': by_time(opcodes, 'opcode'),
+                'functions': by_time(functions, 'function'),
+                'lines': by_time(lines, 'line')[:top],
+                'hottest': instructions[:top]}
+
+
+    def table(self, top=20):
+        """Returns the profile report as a human-readable table."""
+        report = self.report(top)
+        total = report['time'] or 1.0
+        lines = [f'{report["instructions"]} instructions in {report["time"]:.3f} s']
+        for label, rows in [('opcode', report['opcodes']),
+                            ('function', report['functions']),
+                            ('line', report['lines'])]:
+            lines.append('')
+            lines.append(f'{label:<20} {"count":>12} {"time (s)":>10} {"%":>6}')
+            for row in rows:
+                lines.append(f'{str(row[label]):<20} {row["count"]:>12} '
+                             f'{row["time"]:>10.4f} {100 * row["time"] / total:>6.1f}')
+        lines.append('')
+        lines.append(f'{"hottest instruction":<40} {"line":>6} {"count":>12} '
+                     f'{"time (s)":>10} {"%":>6}')
+        for row in report['hottest']:
+            where = f'{row["function"]} {row["pc"]}: {row["instr"]}'
+            lines.append(f'{where:<40} {str(row["line"]):>6} {row["count"]:>12} '
+                         f'{row["time"]:>10.4f} {100 * row["time"] / total:>6.1f}')
+        return '\n'.join(lines)
+
+
+
+class SamplingProfiler:
+    """Records the MyPL call stack every interval instructions, for
+    flamegraphs of where a program spends its time.
+
+    The default interval is prime so that samples don't line up with
+    the instruction counts of loop bodies.
+
+    """
+
+    def __init__(self, interval=997):
+        self.interval = interval
+        # call stack, as a tuple of (function name, pc) from main to the
+        # running function -> number of samples
+        self.stacks = {}
+        # function name -> frame template (to map pcs to source lines)
+        self.templates = {}
+
+
+    def sample(self, vm, frame):
+        """Records the current call stack."""
+        stack = tuple([(f.template.function_name, f.pc - 1) for f in vm.call_stack])
+        count = self.stacks.get(stack)
+        if count is None:
+            count = 0
+            for f in vm.call_stack:
+                self.templates[f.template.function_name] = f.template
+        self.stacks[stack] = count + 1
+
+
+    def label(self, name, pc, detail):
+        """Returns the flamegraph frame label for a function at a pc."""
+        if detail == 'pc':
+            return f'{name}@{pc}'
+        if detail == 'line':
+            position = self.templates[name].source_position(pc)
+            if position:
+                return f'{name}:{position[0]}'
+        return name
+
+
+    def folded(self, detail='line'):
+        """Returns the samples as folded stacks (one "main;f;g count"
+        line per distinct stack, as read by flamegraph tools).
+
+        Args:
+            detail -- How to label each frame: 'function' (by name),
+                'line' (name:source line, the default) or 'pc'
+                (name@pc).
+
+        """
+        counts = {}
+        for stack, count in self.stacks.items():
+            key = ';'.join(self.label(name, pc, detail) for name, pc in stack)
+            counts[key] = counts.get(key, 0) + count
+        return ''.join(f'{key} {count}\n' for key, count in sorted(counts.items()))
+
+
+
+class CallProfiler:
+    """Counts the calls of each function with their inclusive and
+    exclusive (self) instruction counts and wall times, and the calls
+    along each caller -> callee edge of the call graph.
+
+    The VM calls enter and leave at each CALL and RET (and enter for
+    main), so the overhead grows with the number of calls, not of
+    instructions. A function's inclusive totals count each outermost
+    call only, so recursion isn't counted twice.
+
+    """
+
+    def __init__(self):
+        # function name -> [calls, instructions, self instructions,
+        # seconds, self seconds]
+        self.functions = {}
+        # (caller, callee) -> calls
+        self.edges = {}
+        # running calls, main first, as [function name, instructions
+        # started at the call, start time, instructions and seconds in
+        # callees]
+        self.stack = []
+        # function name -> number of its calls on the stack
+        self.active = {}
+        # instructions started as of the last call or return
+        self.last_count = 0
+
+
+    def enter(self, name, count):
+        """Records a call to the named function, given the count of
+        instructions started so far (including the CALL)."""
+        if self.stack:
+            edge = (self.stack[-1][0], name)
+            self.edges[edge] = self.edges.get(edge, 0) + 1
+        totals = self.functions.get(name)
+        if totals is None:
+            totals = self.functions[name] = [0, 0, 0, 0.0, 0.0]
+        totals[0] += 1
+        self.active[name] = self.active.get(name, 0) + 1
+        self.last_count = count
+        self.stack.append([name, count, time.perf_counter(), 0, 0.0])
+
+
+    def leave(self, count):
+        """Records the return of the running call, given the count of
+        instructions started so far (including the RET)."""
+        now = time.perf_counter()
+        name, start_count, start, callee_count, callee_time = self.stack.pop()
+        instructions = count - start_count
+        seconds = now - start
+        totals = self.functions[name]
+        totals[2] += instructions - callee_count
+        totals[4] += seconds - callee_time
+        self.active[name] -= 1
+        if self.active[name] == 0:
+            totals[1] += instructions
+            totals[3] += seconds
+        if self.stack:
+            self.stack[-1][3] += instructions
+            self.stack[-1][4] += seconds
+        self.last_count = count
+
+
+    def finish(self):
+        """Ends the calls still running (if the run stopped on an
+        error), as of the last call or return."""
+        while self.stack:
+            self.leave(self.last_count)
+
+
+    def report(self):
+        """Returns the profile as a dictionary (suitable for JSON) with
+        the functions sorted by self time and the call graph edges
+        sorted by calls.
+
+        """
+        self.finish()
+        functions = [{'function': name, 'calls': calls,
+                      'instructions': instructions, 'self_instructions': own,
+                      'time': seconds, 'self_time': own_seconds}
+                     for name, (calls, instructions, own, seconds, own_seconds)
+                     in self.functions.items()]
+        functions.sort(key=lambda row: (-row['self_time'], row['function']))
+        edges = [{'caller': caller, 'callee': callee, 'calls': calls}
+                 for (caller, callee), calls in self.edges.items()]
+        edges.sort(key=lambda row: (-row['calls'], row['caller'], row['callee']))
+        return {'calls': sum(row['calls'] for row in functions),
+                'instructions': sum(row['self_instructions'] for row in functions),
+                'time': sum(row['self_time'] for row in functions),
+                'functions': functions,
+                'edges': edges}
+
+
+    def table(self):
+        """Returns the profile report as a human-readable table."""
+        report = self.report()
+        total = report['time'] or 1.0
+        lines = [f'{report["calls"]} calls, {report["instructions"]} instructions '
+                 f'in {report["time"]:.3f} s', '',
+                 f'{"function":<20} {"calls":>9} {"instrs":>12} {"self":>12} '
+                 f'{"time (s)":>10} {"self (s)":>10} {"self %":>6}']
+        for row in report['functions']:
+            lines.append(f'{row["function"]:<20} {row["calls"]:>9} '
+                         f'{row["instructions"]:>12} {row["self_instructions"]:>12} '
+                         f'{row["time"]:>10.4f} {row["self_time"]:>10.4f} '
+                         f'{100 * row["self_time"] / total:>6.1f}')
+        lines.append('')
+        lines.append(f'{"caller -> callee":<41} {"calls":>9}')
+        for row in report['edges']:
+            edge = f'{row["caller"]} -> {row["callee"]}'
+            lines.append(f'{edge:<41} {row["calls"]:>9}')
+        return '\n'.join(lines)
+
+
+
+class HeapProfiler:
+    """Tracks the structs and arrays a program allocates, by allocation
+    site (the function and pc of the ALLOCS or ALLOCA) and by struct
+    type or array element type, with their approximate sizes.
+
+    An object's size is measured when the report is made, as the size
+    of its dict or list plus that of the strings it holds (other values
+    count as the references the container holds). The VM never frees
+    objects, so the live heap peaks at exit and every object survives.
+
+    """
+
+    def __init__(self):
+        # the VM whose heap is tracked
+        self.vm = None
+        # (function name, pc) -> [kind, type name, instruction text,
+        # source line, object ids]
+        self.sites = {}
+
+
+    def alloc(self, vm, frame, oid):
+        """Records the object just allocated by the instruction at
+        frame.pc - 1."""
+        self.vm = vm
+        key = (frame.template.function_name, frame.pc - 1)
+        site = self.sites.get(key)
+        if site is None:
+            instr = frame.template.instructions[frame.pc - 1]
+            kind = 'struct' if instr.opcode == OpCode.ALLOCS else 'array'
+            position = frame.template.source_position(frame.pc - 1)
+            line = position[0] if position else None
+            site = self.sites[key] = [kind, instr.operand or '?', str(instr), line, []]
+        site[4].append(oid)
+
+
+    def size(self, obj):
+        """Returns the approximate size in bytes of a struct or array."""
+        values = obj.values() if type(obj) == dict else obj
+        return sys.getsizeof(obj) + sum(sys.getsizeof(v) for v in values if type(v) == str)
+
+
+    def report(self, top=20):
+        """Returns the heap report as a dictionary (suitable for JSON)
+        with the totals, the types sorted by bytes, and the top
+        allocation sites by bytes.
+
+        """
+        types = {}
+        sites = []
+        for (name, pc), (kind, type_name, instr, line, oids) in self.sites.items():
+            heap = self.vm.struct_heap if kind == 'struct' else self.vm.array_heap
+            size = sum(self.size(heap[oid]) for oid in oids if oid in heap)
+            label = type_name if kind == 'struct' else f'array {type_name}'
+            entry = types.setdefault(label, [kind, 0, 0])
+            entry[1] += len(oids)
+            entry[2] += size
+            sites.append({'function': name, 'pc': pc, 'line': line, 'instr': instr,
+                          'type': label, 'objects': len(oids), 'bytes': size})
+        sites.sort(key=lambda row: (-row['bytes'], -row['objects']))
+        types = [{'type': label, 'kind': kind, 'objects': objects, 'bytes': size}
+                 for label, (kind, objects, size) in types.items()]
+        types.sort(key=lambda row: (-row['bytes'], -row['objects'], row['type']))
+        objects = sum(row['objects'] for row in types)
+        size = sum(row['bytes'] for row in types)
+        return {'objects': objects, 'bytes': size,
+                'peak': {'objects': objects, 'bytes': size},
+                'types': types, 'sites': sites[:top]}
+
+
+    def table(self, top=20):
+        """Returns the heap report as a human-readable table."""
+        report = self.report(top)
+        total = report['bytes'] or 1
+        lines = [f'{report["objects"]} objects, ~{report["bytes"]} bytes '
+                 f'(peak live heap, at exit)', '',
+                 f'{"type":<20} {"objects":>10} {"bytes":>12} {"%":>6}']
+        for row in report['types']:
+            lines.append(f'{row["type"]:<20} {row["objects"]:>10} {row["bytes"]:>12} '
+                         f'{100 * row["bytes"] / total:>6.1f}')
+        lines.append('')
+        lines.append(f'{"allocation site":<40} {"line":>6} {"objects":>10} '
+                     f'{"bytes":>12} {"%":>6}')
+        for row in report['sites']:
+            where = f'{row["function"]} {row["pc"]}: {row["instr"]}'
+            lines.append(f'{where:<40} {str(row["line"]):>6} {row["objects"]:>10} '
+                         f'{row["bytes"]:>12} {100 * row["bytes"] / total:>6.1f}')
+        return '\n'.join(lines)
@@ -21,14 +21,77 @@ CONDITIONAL_BOOL_RHS_LHS = ['<', '>', '<=', '>=']
 OPERATORS_NO_PLUS = ['-', '*', '/']
 COMPAIRSON_OPERATORS = ['and', 'or']
 
+# token type of each built-in type name (struct names use ID)
+TYPE_TOKENS = {'int': TokenType.INT_TYPE, 'double': TokenType.DOUBLE_TYPE,
+               'bool': TokenType.BOOL_TYPE, 'string': TokenType.STRING_TYPE,
+               'void': TokenType.VOID_TYPE}
+
+# canonical (interned) instances of the built-in types; these carry no
+# source position, error positions are tracked separately by the checker
+INT = DataType(False, Token(TokenType.INT_TYPE, 'int', 0, 0))
+DOUBLE = DataType(False, Token(TokenType.DOUBLE_TYPE, 'double', 0, 0))
+BOOL = DataType(False, Token(TokenType.BOOL_TYPE, 'bool', 0, 0))
+STRING = DataType(False, Token(TokenType.STRING_TYPE, 'string', 0, 0))
+VOID = DataType(False, Token(TokenType.VOID_TYPE, 'void', 0, 0))
+
+# canonical type of each literal value
+VALUE_TYPES = {TokenType.INT_VAL: INT, TokenType.DOUBLE_VAL: DOUBLE,
+               TokenType.STRING_VAL: STRING, TokenType.BOOL_VAL: BOOL,
+               TokenType.NULL_VAL: VOID}
+
+
+class TypeRegistry:
+    """Interns DataType objects so that each distinct MyPL type has
+    exactly one instance, and two types are equal iff they are the
+    same object."""
+
+    def __init__(self):
+        self.scalar_types = {'int': INT, 'double': DOUBLE, 'bool': BOOL,
+                             'string': STRING, 'void': VOID}
+        self.array_types = {}
+
+
+    def get(self, type_name, is_array=False):
+        """Returns the canonical DataType for the given type name.
+
+        Args:
+            type_name: The base or struct type name (a string)
+            is_array: True to get the array-of type_name type
+
+        """
+        types = self.array_types if is_array else self.scalar_types
+        data_type = types.get(type_name)
+        if data_type is None:
+            token_type = TYPE_TOKENS.get(type_name, TokenType.ID)
+            data_type = DataType(is_array, Token(token_type, type_name, 0, 0))
+            types[type_name] = data_type
+        return data_type
+
+
+    def canonical(self, data_type):
+        """Returns the canonical instance of a DataType from the AST."""
+        return self.get(data_type.type_name.lexeme, data_type.is_array)
+
+
+def is_base_type(data_type):
+    """True if the (canonical) data type is a non-array base type."""
+    return (data_type is INT or data_type is DOUBLE or data_type is BOOL
+            or data_type is STRING)
+
+
 class SemanticChecker(Visitor):
     """Visitor implementation to semantically check MyPL programs."""
 
     def __init__(self):
         self.structs = {}
+        # struct name -> {field name -> (index, canonical DataType)}
+        self.struct_fields = {}
         self.functions = {}
         self.symbol_table = SymbolTable()
+        self.types = TypeRegistry()
         self.curr_type = None
+        # source token the current type came from (for error positions)
+        self.curr_pos = None
 
 
     # Helper Functions
@@ -50,25 +113,62 @@ class SemanticChecker(Visitor):
             struct_def: The StructDef object 
             field_name: The name of the field
 
-        Returns: The corresponding DataType or None if the field name
-        is not in the struct_def.
+        Returns: The corresponding (canonical) DataType or None if the
+        field name is not in the struct_def.
 
         """
-        for var_def in struct_def.fields:
-            if var_def.var_name.lexeme == field_name:
-                return var_def.data_type
-        return None
+        field = self.struct_fields[struct_def.struct_name.lexeme].get(field_name)
+        if field is None:
+            return None
+        return field[1]
 
         
-    # Visitor Functions
-    
-    def visit_program(self, program):
+    def check_relational(self, op, lhs_type, rhs_type):
+        """Checks a relational (comparison) operator's operand types and
+        sets the current type to bool when they are compatible.
+
+        Args:
+            op: The operator token
+            lhs_type: The (canonical) type of the left operand
+            rhs_type: The (canonical) type of the right operand
+
+        """
+        if op.lexeme == '==' or op.lexeme == '!=':
+            # null can be compared against anything
+            if lhs_type is not VOID or rhs_type is not VOID:
+                if lhs_type is rhs_type or lhs_type is VOID or rhs_type is VOID:
+                    self.curr_type = BOOL
+                else:
+                    self.error(f"Incorrect usage of bool comparision: '{op.lexeme}'", op)
+
+        elif lhs_type is rhs_type and (lhs_type is DOUBLE or lhs_type is INT or lhs_type is STRING):
+            self.curr_type = BOOL
+
+        elif lhs_type is BOOL and rhs_type is BOOL:
+            self.error(f"Incorrect usage of bool comparision: '{op.lexeme}'", op)
+
+
+    def record_program(self, program):
+        """Checks and records the program's struct definitions and
+        function signatures, without checking any struct or function
+        bodies.
+
+        Args:
+            program: The Program object
+
+        """
         # check and record struct defs
         for struct in program.struct_defs:
             struct_name = struct.struct_name.lexeme
             if struct_name in self.structs:
                 self.error(f'duplicate {struct_name} definition', struct.struct_name)
             self.structs[struct_name] = struct
+        # build each struct's field map (fields may reference any struct)
+        for struct_name, struct in self.structs.items():
+            fields = {}
+            for i, var_def in enumerate(struct.fields):
+                fields[var_def.var_name.lexeme] = (i, self.types.canonical(var_def.data_type))
+            self.struct_fields[struct_name] = fields
         # check and record function defs
         for fun in program.fun_defs:
             fun_name = fun.fun_name.lexeme
@@ -84,12 +184,19 @@ class SemanticChecker(Visitor):
         # check main function
         if 'main' not in self.functions:
             self.error('missing main function', None)
+
+        
+    # Visitor Functions
+    
+    @iterative
+    def visit_program(self, program):
+        self.record_program(program)
         # check each struct
         for struct in self.structs.values():
-            struct.accept(self)
+            yield struct
         # check each function
         for fun in self.functions.values():
-            fun.accept(self)
+            yield fun
         
         
     def visit_struct_def(self, struct_def):
@@ -122,10 +229,11 @@ class SemanticChecker(Visitor):
                 else:
                     field_names.add(field_name)
                 # add field to symbol table
-                self.symbol_table.add(field_name, var_def.data_type)
+                self.symbol_table.add(field_name, self.types.canonical(var_def.data_type))
         self.symbol_table.pop_environment()
         
 
+    @iterative
     def visit_fun_def(self, fun_def):
         self.symbol_table.push_environment()
 
@@ -143,7 +251,7 @@ class SemanticChecker(Visitor):
                 else:
                     param_names.add(param_name)
                 # Add parameters to the symbol table
-                self.symbol_table.add(param_name, param.data_type)
+                self.symbol_table.add(param_name, self.types.canonical(param.data_type))
 
         # checking return type is valid
         if fun_def.return_type is not None:
@@ -152,12 +260,12 @@ class SemanticChecker(Visitor):
                 self.error(f'Unsupported return type "{return_type_name}"', fun_def.return_type.type_name)
 
         # adding return type to symbol table
-        self.symbol_table.add('return', fun_def.return_type)
+        self.symbol_table.add('return', self.types.canonical(fun_def.return_type))
         
         # Visit each statement in the function body
         self.symbol_table.push_environment()
         for stmt in fun_def.stmts:
-            stmt.accept(self)
+            yield stmt
         self.symbol_table.pop_environment()
         
 
@@ -165,114 +273,72 @@ class SemanticChecker(Visitor):
 
 
         
+    @iterative
     def visit_return_stmt(self, return_stmt):
         # Retrieve the return type from the symbol table
         return_type = self.symbol_table.get('return')
 
         # Visit the expression attached to the return statement
-        return_stmt.expr.accept(self)
+        yield return_stmt.expr
 
         # Check if the type of the returned expression is compatible with the return type
         if return_type.is_array:
-            if return_type.type_name.token_type == TokenType.VOID_TYPE:
-                self.error(f'Return type mismatch: Expected "{return_type.type_name.lexeme}, but got "{self.curr_type.type_name.lexeme}"', self.curr_type.type_name)
-            if return_type.type_name.token_type != self.curr_type.type_name.token_type:
-                self.error(f'Return type mismatch: Expected "{return_type.type_name.lexeme}, but got "{self.curr_type.type_name.lexeme}"', self.curr_type.type_name)
+            if return_type is not self.curr_type:
+                self.error(f'Return type mismatch: Expected "{return_type.type_name.lexeme}, but got "{self.curr_type.type_name.lexeme}"', self.curr_pos)
       
         # if the type is not a array
         else:
             # if return type is not void check for compatible types
-            if return_type.type_name.lexeme != 'void':
-                if return_type.type_name.lexeme != self.curr_type.type_name.lexeme:
-                    if(self.curr_type.type_name.lexeme != 'void'):
-                        self.error(f'Return type mismatch: Expected "{return_type.type_name.lexeme}" or "null", but got "{self.curr_type.type_name.lexeme}"', self.curr_type.type_name)
+            if return_type is not VOID:
+                if return_type is not self.curr_type and self.curr_type is not VOID:
+                    self.error(f'Return type mismatch: Expected "{return_type.type_name.lexeme}" or "null", but got "{self.curr_type.type_name.lexeme}"', self.curr_pos)
             # ensureing that void has no return stmt
-            if return_type.type_name.lexeme == 'void' and self.curr_type.type_name.lexeme != 'void':
-                self.error(f'Return type mismatch: Void return type, no Return expected.', self.curr_type.type_name)
+            elif self.curr_type is not VOID:
+                self.error(f'Return type mismatch: Void return type, no Return expected.', self.curr_pos)
 
             
+    @iterative
     def visit_var_decl(self, var_decl):
         # storing current variable name
         var_name = var_decl.var_def.var_name.lexeme
 
-        # storing the declared data type
-        declared_type = var_decl.var_def.data_type
+        # storing the (canonical) declared data type
+        declared_type = self.types.canonical(var_decl.var_def.data_type)
 
         # checking intitalized variables
         if var_decl.expr != None:
 
-            # if it is an array
-            if var_decl.var_def.data_type.is_array:
+            # accepting expression
+            yield var_decl.expr
 
-                # accepting expression
-                var_decl.expr.accept(self)
+            # Check if variable name exists in the current function symbol table
+            if self.symbol_table.exists_in_curr_env(var_name):
+                self.error(f'duplicate variable definition: {var_name}', var_decl.var_def.var_name)
 
-                # Check if variable name exists in the current function symbol table
-                if self.symbol_table.exists_in_curr_env(var_name):
-                    self.error(f'duplicate variable definition: {var_name}', var_decl.var_def.var_name)
+            # if it is an array
+            if declared_type.is_array:
 
                 # checking compatible data types
-                if self.curr_type.is_array == False and self.curr_type.type_name.token_type != TokenType.VOID_TYPE:
+                if self.curr_type.is_array == False and self.curr_type is not VOID:
                     self.error("Incorrect array syntax", var_decl.var_def.var_name)
 
                 # checking more compatuble types
-                if declared_type.type_name.token_type != self.curr_type.type_name.token_type and self.curr_type.type_name.token_type != TokenType.VOID_TYPE:
+                if declared_type is not self.curr_type and self.curr_type is not VOID:
                     self.error(f'Mismatched typing: {var_name}', var_decl.var_def.var_name)
-                
-                # adding the vairable to symbol table
-                self.symbol_table.add(var_name, var_decl.var_def.data_type)
 
-            else:
-                # get expression
-                var_decl.expr.accept(self)
-                # Check if variable name exists in the current function symbol table
-                if self.symbol_table.exists_in_curr_env(var_name):
-                    self.error(f'duplicate variable definition: {var_name}', var_decl.var_def.var_name)
-
-                # check if type is in structs
-                if declared_type.type_name.lexeme in self.structs:
-                    assigned_type = self.structs[declared_type.type_name.lexeme]
-                else:
-                    # Check if the assigned type matches the declared type
-                    if declared_type.type_name.token_type != self.curr_type.type_name.token_type and self.curr_type.type_name.token_type != TokenType.VOID_TYPE:
-                        self.error(f'Type mismatch: Cannot assign {self.curr_type} to {declared_type}', var_decl.var_def.var_name)
-                    if(declared_type.is_array != self.curr_type.is_array):
-                        self.error(f'Type mismatch: Cannot assign {self.curr_type} to {declared_type}', var_decl.var_def.var_name)
-
-                # add variable to symbol table
-                self.symbol_table.add(var_name, var_decl.var_def.data_type)
+            # Check if the assigned type matches the declared type
+            elif declared_type is not self.curr_type and self.curr_type is not VOID:
+                self.error(f'Type mismatch: Cannot assign {self.curr_type} to {declared_type}', var_decl.var_def.var_name)
 
         # checking non initalized variables
-        elif var_decl.expr == None:
-            # array case
-            if var_decl.var_def.data_type.is_array:
-
-                # Check if variable name exists in the current function symbol table
-                if self.symbol_table.exists_in_curr_env(var_name):
-                    self.error(f'duplicate variable definition: {var_name}', var_decl.var_def.var_name)
-
-                # Check if the assigned type matches the declared type
-                if declared_type.type_name.token_type != self.curr_type.type_name.token_type and self.curr_type.type_name.token_type != TokenType.VOID_TYPE:
-                    self.error(f'Type mismatch: Cannot assign {assigned_type} to {declared_type}', var_decl.var_def.var_name)
-
-                # checking compatible data types
-                if(declared_type.is_array != self.curr_type.is_array):
-                    self.error(f'Type mismatch: Cannot assign {self.curr_type} to {declared_type}', var_decl.var_def.var_name)
+        elif self.symbol_table.exists_in_curr_env(var_name):
+            self.error(f'duplicate variable definition: {var_name}', var_decl.var_def.var_name)
 
-                # add to symbol table
-                self.symbol_table.add(var_name, var_decl.var_def.data_type)
-            else:
-                # assigned type == curr type
-                assigned_type = self.curr_type
-
-                # Check if variable name exists in the current function symbol table
-                if self.symbol_table.exists_in_curr_env(var_name):
-                    self.error(f'duplicate variable definition: {var_name}', var_decl.var_def.var_name)
-                
-                # add to symbol table
-                self.symbol_table.add(var_name, var_decl.var_def.data_type)
+        # add variable to symbol table
+        self.symbol_table.add(var_name, declared_type)
         
         
+    @iterative
     def visit_assign_stmt(self, assign_stmt):
         # checking use before def
         if not (self.symbol_table.exists(assign_stmt.lvalue[0].var_name.lexeme)) and (assign_stmt.lvalue[0].var_name.lexeme not in self.structs):
@@ -288,17 +354,14 @@ class SemanticChecker(Visitor):
                 self.error("Variable must be of type array", None)
             
             # accept expression inside array []
-            assign_stmt.lvalue[0].array_expr.accept(self)
-
-            # saving rhs
-            rhs_type = self.curr_type
+            yield assign_stmt.lvalue[0].array_expr
 
-            # if it is not an int in the array expression or the flag is false, error again
-            if(rhs_type.type_name.lexeme != 'int') or (rhs_type.is_array != False):
+            # if it is not an int in the array expression, error again
+            if self.curr_type is not INT:
                 self.error("array expressions have to be ints", None)
             
-            # setting lhs to the checked data type
-            lhs_type = DataType(False, lhs_type.type_name)
+            # setting lhs to the array's element type
+            lhs_type = self.types.get(lhs_type.type_name.lexeme)
 
         # running through lhs values
         for i in range(1, len(assign_stmt.lvalue)):
@@ -310,48 +373,41 @@ class SemanticChecker(Visitor):
             # finding current struct
             curr_struct = self.structs[lhs_type.type_name.lexeme]
 
-            # flag to check for correct fields
-            valid_field = False
-            # itereating through struct fields
-            for field in curr_struct.fields:
-
-                # if the field type is the same as the assigned field type
-                if(assign_stmt.lvalue[i].var_name.lexeme == field.var_name.lexeme):
-
-                    # if the assigned types array has o expr but the fields type is declared as an array, error
-                    if(assign_stmt.lvalue[i].array_expr == None) and (field.data_type.is_array == True):
-                        self.error("field type does not match", None)
+            # finding the field type, if none then field is invalid
+            field_type = self.get_field_type(curr_struct, assign_stmt.lvalue[i].var_name.lexeme)
+            if field_type is None:
+                self.error("Not a vaild field in struct", None)
 
-                    # setting flag as valid field type has been found
-                    valid_field = True
+            # if the assigned types array has o expr but the fields type is declared as an array, error
+            if(assign_stmt.lvalue[i].array_expr == None) and (field_type.is_array == True):
+                self.error("field type does not match", None)
 
-                    # setting lhs_type to the fields data_type
-                    lhs_type = field.data_type
-            # if the flag is false, then field type is invalid
-            if valid_field == False:
-                self.error("Not a vaild field in struct", None)
+            # setting lhs_type to the fields data_type (or its element
+            # type if the field is indexed)
+            if assign_stmt.lvalue[i].array_expr == None:
+                lhs_type = field_type
+            else:
+                lhs_type = self.types.get(field_type.type_name.lexeme)
         # if the assign stmt expr is none
         if assign_stmt.expr != None:
 
             # accept self
-            assign_stmt.expr.accept(self)
+            yield assign_stmt.expr
 
             # save rhs
             rhs_type = self.curr_type
 
-            # if the type is not null
-            if rhs_type.type_name.lexeme != 'void':
-
-                # check both sides are compatible
-                if (lhs_type.type_name.lexeme != rhs_type.type_name.lexeme):
-                    self.error("Variables do not match", None)
+            # if the type is not null, check both sides are compatible
+            if rhs_type is not VOID and lhs_type is not rhs_type:
+                self.error("Variables do not match", None)
             
+    @iterative
     def visit_while_stmt(self, while_stmt):
 
         self.symbol_table.push_environment()
 
         # accepting while condition
-        while_stmt.condition.accept(self)
+        yield while_stmt.condition
 
         # ensuring there is a condition
         if while_stmt.condition == None:
@@ -361,14 +417,14 @@ class SemanticChecker(Visitor):
         condition_type = self.curr_type
 
         # Check if the condition is of type bool, error if not
-        if (condition_type.type_name.token_type != TokenType.BOOL_TYPE and condition_type.type_name.token_type != TokenType.BOOL_VAL) or condition_type.is_array == True:
-            self.error("Condition in while statement must be of type bool", condition_type.type_name)
+        if condition_type is not BOOL:
+            self.error("Condition in while statement must be of type bool", self.curr_pos)
             
 
         # Visit the statements inside the while block
         self.symbol_table.push_environment()
         for stmt in while_stmt.stmts:
-            stmt.accept(self)
+            yield stmt
         self.symbol_table.pop_environment()
         
         
@@ -377,6 +433,7 @@ class SemanticChecker(Visitor):
         
 
         
+    @iterative
     def visit_for_stmt(self, for_stmt):
 
         self.symbol_table.push_environment()
@@ -390,28 +447,28 @@ class SemanticChecker(Visitor):
             self.error("For loops must include a assign sttement", for_stmt.assign_stmt)
 
         # accepting the var_decl
-        for_stmt.var_decl.accept(self)
+        yield for_stmt.var_decl
 
         # accepting the var_decl
-        for_stmt.condition.accept(self)
+        yield for_stmt.condition
 
         # store current type before calling assign
         condition_type = self.curr_type
 
         # Check if the condition is of type bool
-        if (condition_type.type_name.token_type != TokenType.BOOL_TYPE and condition_type.type_name.token_type != TokenType.BOOL_VAL) or condition_type.is_array == True:
-            self.error("Condition in for statement must be of type bool", condition_type.type_name)
+        if condition_type is not BOOL:
+            self.error("Condition in for statement must be of type bool", self.curr_pos)
 
         # if there is no op in the expr, it is not type bool
         if for_stmt.condition.op == None:
-            self.error("for statement must be a conditional", condition_type.type_name)
+            self.error("for statement must be a conditional", self.curr_pos)
             
-        for_stmt.assign_stmt.accept(self)
+        yield for_stmt.assign_stmt
 
         # accepting stmts in for loops
         self.symbol_table.push_environment()
         for stmt in for_stmt.stmts:
-            stmt.accept(self)
+            yield stmt
         self.symbol_table.pop_environment()
 
 
@@ -419,12 +476,13 @@ class SemanticChecker(Visitor):
 
         
         
+    @iterative
     def visit_if_stmt(self, if_stmt):
 
         self.symbol_table.push_environment()
 
         # accepting the if part condition of if statement
-        if_stmt.if_part.condition.accept(self)
+        yield if_stmt.if_part.condition
 
         # if there is no condition in if, error
         if if_stmt.if_part.condition == None:
@@ -435,13 +493,13 @@ class SemanticChecker(Visitor):
         condition_type = self.curr_type
         
         # Check if the condition is of type bool
-        if (condition_type.type_name.token_type != TokenType.BOOL_TYPE and condition_type.type_name.token_type != TokenType.BOOL_VAL) or condition_type.is_array == True:
-            self.error("Condition in if statement must be of type bool", condition_type.type_name)
+        if condition_type is not BOOL:
+            self.error("Condition in if statement must be of type bool", self.curr_pos)
         
         # Visit the statements inside the if block
         self.symbol_table.push_environment()
         for stmt in if_stmt.if_part.stmts:
-            stmt.accept(self)
+            yield stmt
         self.symbol_table.pop_environment()
         
                
@@ -454,35 +512,36 @@ class SemanticChecker(Visitor):
             for else_if_part in if_stmt.else_ifs:
                 
                 # accepting else if condition
-                else_if_part.condition.accept(self)
+                yield else_if_part.condition
 
                 # finding current type to ensure it is a bool
                 condition_type = self.curr_type
 
                 # checking correct expr type
-                if (condition_type.type_name.token_type != TokenType.BOOL_TYPE and condition_type.type_name.token_type != TokenType.BOOL_VAL) or condition_type.is_array == True:
-                    self.error("Condition in else-if statement must be of type bool", condition_type.type_name)
+                if condition_type is not BOOL:
+                    self.error("Condition in else-if statement must be of type bool", self.curr_pos)
 
                 # Visit the statements inside the else if block
                 self.symbol_table.push_environment()
                 for stmt in else_if_part.stmts:
-                    stmt.accept(self)
+                    yield stmt
                 self.symbol_table.pop_environment()
                 
             self.symbol_table.pop_environment()
         
         if if_stmt.else_stmts:
-            self.symbol_table.push_environment
+            self.symbol_table.push_environment()
             # Visit the else statements, if any
             self.symbol_table.push_environment()
             for stmt in if_stmt.else_stmts:
-                stmt.accept(self)
+                yield stmt
             self.symbol_table.pop_environment()
             
             self.symbol_table.pop_environment()
             
         
         
+    @iterative
     def visit_call_expr(self, call_expr):
 
         # ensuring function that is being called is declared
@@ -503,18 +562,14 @@ class SemanticChecker(Visitor):
                     self.error(f'Expected {expected_params} arguments, but got {provided_args} for function {call_expr.fun_name.lexeme}', call_expr.fun_name)
                 
                 # accept the first arguement
-                call_expr.args[0].accept(self)
-
-                # if not a literal or base type, error
-                if self.curr_type.type_name.token_type == TokenType.ID:
-                    self.error("Inccorect print syntax", call_expr.fun_name)
+                yield call_expr.args[0]
 
-                # if not a literal or base type, error
-                if ((self.curr_type.type_name.token_type != TokenType.STRING_VAL and self.curr_type.type_name.token_type != TokenType.STRING_TYPE and self.curr_type.type_name.token_type != TokenType.INT_VAL and self.curr_type.type_name.token_type != TokenType.INT_TYPE and self.curr_type.type_name.token_type != TokenType.DOUBLE_VAL and self.curr_type.type_name.token_type != TokenType.DOUBLE_TYPE and self.curr_type.type_name.token_type != TokenType.BOOL_VAL and self.curr_type.type_name.token_type != TokenType.BOOL_TYPE))or self.curr_type.is_array == True:
+                # if not a base type, error
+                if not is_base_type(self.curr_type):
                     self.error("Inccorect print syntax", call_expr.fun_name)
 
                 # setting current typ
-                self.curr_type = DataType(False, Token(TokenType.VOID_TYPE, 'void',call_expr.fun_name.line, call_expr.fun_name.column))
+                self.curr_type = VOID
 
             if call_expr.fun_name.lexeme == 'input':
                 # the number of parameters expected by the function
@@ -526,7 +581,7 @@ class SemanticChecker(Visitor):
                 # Check if the number of arguments matches the number of parameters
                 if provided_args != expected_params:
                     self.error(f'Expected {expected_params} arguments, but got {provided_args} for function {call_expr.fun_name.lexeme}', call_expr.fun_name)
-                self.curr_type = DataType(False, Token(TokenType.STRING_TYPE, 'string',call_expr.fun_name.line, call_expr.fun_name.column))
+                self.curr_type = STRING
 
             if call_expr.fun_name.lexeme == 'stoi':
                 expected_params = 1
@@ -537,12 +592,12 @@ class SemanticChecker(Visitor):
                     self.error(f'Expected {expected_params} arguments, but got {provided_args} for function {call_expr.fun_name.lexeme}', call_expr.fun_name)
 
                 # Ensure that the argument passed is a string
-                call_expr.args[0].accept(self)
-                if self.curr_type.type_name.token_type != TokenType.STRING_TYPE and self.curr_type.type_name.token_type != TokenType.STRING_VAL:
+                yield call_expr.args[0]
+                if self.curr_type is not STRING:
                     self.error(f'Argument of stoi function must be of type string, but got {self.curr_type.type_name.lexeme}', call_expr.fun_name)
                 
                 # Assuming the itos function returns an integer, set the current type accordingly
-                self.curr_type = DataType(False, Token(TokenType.INT_TYPE, 'int',call_expr.fun_name.line, call_expr.fun_name.column))
+                self.curr_type = INT
 
             if call_expr.fun_name.lexeme == 'itos':
                 # the number of parameters expected by the function
@@ -556,13 +611,13 @@ class SemanticChecker(Visitor):
                     self.error(f'Expected {expected_params} arguments, but got {provided_args} for function {call_expr.fun_name.lexeme}', call_expr.fun_name)
 
                 # Ensure that the argument passed is a int
-                call_expr.args[0].accept(self)
+                yield call_expr.args[0]
 
-                if self.curr_type.type_name.token_type != TokenType.INT_TYPE and self.curr_type.type_name.token_type != TokenType.INT_VAL:
+                if self.curr_type is not INT:
                     self.error(f'Argument of itos function must be of type int, but got {self.curr_type.type_name.lexeme}', call_expr.fun_name)
                 
                 # Assuming the itos function returns an integer, set the current type accordingly
-                self.curr_type = DataType(False, Token(TokenType.STRING_TYPE, 'string',call_expr.fun_name.line, call_expr.fun_name.column))
+                self.curr_type = STRING
 
             if call_expr.fun_name.lexeme == 'itod':
                 # the number of parameters expected by the function
@@ -576,13 +631,13 @@ class SemanticChecker(Visitor):
                     self.error(f'Expected {expected_params} arguments, but got {provided_args} for function {call_expr.fun_name.lexeme}', call_expr.fun_name)
 
                 # Ensure that the argument passed is a int
-                call_expr.args[0].accept(self)
+                yield call_expr.args[0]
 
-                if self.curr_type.type_name.token_type != TokenType.INT_TYPE and self.curr_type.type_name.token_type != TokenType.INT_VAL:
+                if self.curr_type is not INT:
                     self.error(f'Argument of itod function must be of type int, but got {self.curr_type.type_name.lexeme}', call_expr.fun_name)
                 
                 # Assuming the itod function returns an double, set the current type accordingly
-                self.curr_type = DataType(False, Token(TokenType.DOUBLE_TYPE, 'string',call_expr.fun_name.line, call_expr.fun_name.column))
+                self.curr_type = DOUBLE
 
 
             if call_expr.fun_name.lexeme == 'dtoi':
@@ -597,12 +652,12 @@ class SemanticChecker(Visitor):
                     self.error(f'Expected {expected_params} arguments, but got {provided_args} for function {call_expr.fun_name.lexeme}', call_expr.fun_name)
 
                 # Ensure that the argument passed is a double
-                call_expr.args[0].accept(self)
-                if self.curr_type.type_name.token_type != TokenType.DOUBLE_TYPE and self.curr_type.type_name.token_type != TokenType.DOUBLE_VAL:
+                yield call_expr.args[0]
+                if self.curr_type is not DOUBLE:
                     self.error(f'Argument of dtoi function must be of type double, but got {self.curr_type.type_name.lexeme}', call_expr.fun_name)
                 
                 # Assuming the dtoi function returns an integer, set the current type accordingly
-                self.curr_type = DataType(False, Token(TokenType.INT_TYPE, 'int',call_expr.fun_name.line, call_expr.fun_name.column))
+                self.curr_type = INT
 
             if call_expr.fun_name.lexeme == 'dtos':
                 # the number of parameters expected by the function
@@ -616,13 +671,13 @@ class SemanticChecker(Visitor):
                     self.error(f'Expected {expected_params} arguments, but got {provided_args} for function {call_expr.fun_name.lexeme}', call_expr.fun_name)
 
                 # Ensure that the argument passed is a double
-                call_expr.args[0].accept(self)
+                yield call_expr.args[0]
 
-                if self.curr_type.type_name.token_type != TokenType.DOUBLE_TYPE and self.curr_type.type_name.token_type != TokenType.DOUBLE_VAL:
+                if self.curr_type is not DOUBLE:
                     self.error(f'Argument of dtos function must be of type double, but got {self.curr_type.type_name.lexeme}', call_expr.fun_name)
                 
                 # Assuming the dtos function returns an string, set the current type accordingly
-                self.curr_type = DataType(False, Token(TokenType.STRING_TYPE, 'string',call_expr.fun_name.line, call_expr.fun_name.column))
+                self.curr_type = STRING
 
             if call_expr.fun_name.lexeme == 'stod':
                 # the number of parameters expected by the function
@@ -636,13 +691,13 @@ class SemanticChecker(Visitor):
                     self.error(f'Expected {expected_params} arguments, but got {provided_args} for function {call_expr.fun_name.lexeme}', call_expr.fun_name)
 
                 # Ensure that the argument passed is a string
-                call_expr.args[0].accept(self)
+                yield call_expr.args[0]
 
-                if self.curr_type.type_name.token_type != TokenType.STRING_TYPE and self.curr_type.type_name.token_type != TokenType.STRING_VAL:
+                if self.curr_type is not STRING:
                     self.error(f'Argument of dtos function must be of type double, but got {self.curr_type.type_name.lexeme}', call_expr.fun_name)
                 
                 # Assuming the stod function returns an double, set the current type accordingly
-                self.curr_type = DataType(False, Token(TokenType.DOUBLE_TYPE, 'double',call_expr.fun_name.line, call_expr.fun_name.column))
+                self.curr_type = DOUBLE
 
 
             if call_expr.fun_name.lexeme == 'length':
@@ -656,12 +711,11 @@ class SemanticChecker(Visitor):
                 if provided_args != expected_params:
                     self.error(f'Expected {expected_params} arguments, but got {provided_args} for function {call_expr.fun_name.lexeme}', call_expr.fun_name)
                 
-                call_expr.args[0].accept(self)
+                yield call_expr.args[0]
 
-                if self.curr_type.is_array == False:
-                    if self.curr_type.type_name.token_type == TokenType.DOUBLE_VAL or self.curr_type.type_name.token_type == TokenType.INT_VAL or self.curr_type.type_name.token_type == TokenType.INT_TYPE or self.curr_type.type_name.token_type == TokenType.DOUBLE_TYPE:
-                        self.error(f'Argument of length function parameter cannot be double or int primitive, but got {self.curr_type.type_name.lexeme}', call_expr.fun_name)
-                self.curr_type = DataType(False, Token(TokenType.INT_TYPE, 'int',call_expr.fun_name.line, call_expr.fun_name.column))
+                if self.curr_type is INT or self.curr_type is DOUBLE:
+                    self.error(f'Argument of length function parameter cannot be double or int primitive, but got {self.curr_type.type_name.lexeme}', call_expr.fun_name)
+                self.curr_type = INT
                 
             if call_expr.fun_name.lexeme == 'get':
                 # the number of parameters expected by the function
@@ -674,14 +728,14 @@ class SemanticChecker(Visitor):
                 if provided_args != expected_params:
                     self.error(f'Expected {expected_params} arguments, but got {provided_args} for function {call_expr.fun_name.lexeme}', call_expr.fun_name)
                                 
-                call_expr.args[0].accept(self)
-                if self.curr_type.type_name.token_type != TokenType.INT_TYPE and self.curr_type.type_name.token_type != TokenType.INT_VAL:
+                yield call_expr.args[0]
+                if self.curr_type is not INT:
                     self.error(f'Argument of get function parameter must int primitive or int, but got {self.curr_type.type_name.lexeme}', call_expr.fun_name)
                 
-                call_expr.args[1].accept(self)
-                if self.curr_type.type_name.token_type != TokenType.STRING_TYPE and self.curr_type.type_name.token_type != TokenType.STRING_VAL or self.curr_type.is_array == True:
+                yield call_expr.args[1]
+                if self.curr_type is not STRING:
                     self.error(f'Argument of get function parameter must int primitive or int, but got {self.curr_type.type_name.lexeme}', call_expr.fun_name)
-                self.curr_type = DataType(False, Token(TokenType.STRING_TYPE, 'string',call_expr.fun_name.line, call_expr.fun_name.column))
+                self.curr_type = STRING
                 
         else:
             # save function name
@@ -696,82 +750,65 @@ class SemanticChecker(Visitor):
 
             # ensure that params are typed well and compatible
             for i in range(len(call_expr.args)):
-                param_type = fun_def.params[i].data_type
-                call_expr.args[i].accept(self)
-                if(param_type.type_name.token_type != self.curr_type.type_name.token_type and self.curr_type.type_name.token_type != TokenType.VOID_TYPE):
+                param_type = self.types.canonical(fun_def.params[i].data_type)
+                yield call_expr.args[i]
+                if param_type is not self.curr_type and self.curr_type is not VOID:
                     self.error("Wrong datatype for parameter!: ", call_expr.fun_name)
 
             # setting current type
-            self.curr_type = fun_def.return_type
+            self.curr_type = self.types.canonical(fun_def.return_type)
 
+        # the call is the position of its result type
+        self.curr_pos = call_expr.fun_name
 
+
+    @iterative
     def visit_expr(self, expr):
         # check the first term
-        expr.first.accept(self)
+        yield expr.first
         # record the lhs type
         lhs_type = self.curr_type
 
         # check if more to expression
         if expr.op:
             # check rest of expression
-            expr.rest.accept(self)
+            yield expr.rest
             # record the rhs type
             rhs_type = self.curr_type
 
             # Perform type checking based on the operator and operand types
             if expr.op.lexeme == '+':
                 # Addition operator
-                if lhs_type.type_name.lexeme == 'string' and rhs_type.type_name.lexeme == 'string':
-                    self.curr_type = DataType(False, Token(TokenType.STRING_TYPE, 'string', rhs_type.type_name.line, rhs_type.type_name.column))
+                if lhs_type is STRING and rhs_type is STRING:
+                    self.curr_type = STRING
 
-                elif lhs_type.type_name.lexeme == 'double' and rhs_type.type_name.lexeme == 'double':
-                    self.curr_type = DataType(False, Token(TokenType.DOUBLE_TYPE, 'double', rhs_type.type_name.line, rhs_type.type_name.column))
+                elif lhs_type is DOUBLE and rhs_type is DOUBLE:
+                    self.curr_type = DOUBLE
 
-                elif lhs_type.type_name.lexeme == 'int' and rhs_type.type_name.lexeme == 'int':
-                    self.curr_type = DataType(False, Token(TokenType.INT_TYPE, 'int', rhs_type.type_name.line, rhs_type.type_name.column))
+                elif lhs_type is INT and rhs_type is INT:
+                    self.curr_type = INT
                 else:
                     self.error("Incorrect datatype for operator", expr.op)
 
             # checking expressions for operators that are not plusses
             if expr.op.lexeme in OPERATORS_NO_PLUS:
                 
-                if lhs_type.type_name.lexeme == 'double' and rhs_type.type_name.lexeme == 'double':
-                    self.curr_type = DataType(False, Token(TokenType.DOUBLE_TYPE, 'double', rhs_type.type_name.line, rhs_type.type_name.column))
+                if lhs_type is DOUBLE and rhs_type is DOUBLE:
+                    self.curr_type = DOUBLE
 
-                elif lhs_type.type_name.lexeme == 'int' and rhs_type.type_name.lexeme == 'int':
-                    self.curr_type = DataType(False, Token(TokenType.INT_TYPE, 'int', rhs_type.type_name.line, rhs_type.type_name.column))
+                elif lhs_type is INT and rhs_type is INT:
+                    self.curr_type = INT
                 else:
                     self.error("Incorrect datatype for operator ", expr.op)
             
             # looking through relational operators
             if expr.op.lexeme in CONDITIONAL_NON_BOOL_RHS_LHS:
-                if expr.op.lexeme == '==' or expr.op.lexeme == '!=':
-                    if ((lhs_type.type_name.token_type != TokenType.VOID_TYPE) or (rhs_type.type_name.token_type != TokenType.VOID_TYPE)):
-                        
-                        if (lhs_type.type_name.token_type != rhs_type.type_name.token_type):
-                            if(lhs_type.type_name.token_type == TokenType.VOID_TYPE or rhs_type.type_name.token_type == TokenType.VOID_TYPE):
-                                self.curr_type = DataType(False, Token(TokenType.BOOL_TYPE, 'bool', rhs_type.type_name.line, rhs_type.type_name.column))
-                            else:
-                                self.error(f"Incorrect usage of bool comparision: '{expr.op.lexeme}'", expr.op)
-                        else:
-                            self.curr_type = DataType(False, Token(TokenType.BOOL_TYPE, 'bool', rhs_type.type_name.line, rhs_type.type_name.column))
-                        
-                elif lhs_type.type_name.token_type == TokenType.DOUBLE_TYPE and rhs_type.type_name.token_type == TokenType.DOUBLE_TYPE:
-                    self.curr_type = DataType(False, Token(TokenType.BOOL_TYPE, 'bool', rhs_type.type_name.line, rhs_type.type_name.column))
-
-                elif lhs_type.type_name.token_type == TokenType.INT_TYPE and rhs_type.type_name.token_type == TokenType.INT_TYPE:
-                    self.curr_type = DataType(False, Token(TokenType.BOOL_TYPE, 'bool', rhs_type.type_name.line, rhs_type.type_name.column))\
-                
-                elif lhs_type.type_name.token_type == TokenType.STRING_TYPE and rhs_type.type_name.token_type == TokenType.STRING_TYPE:
-                    self.curr_type = DataType(False, Token(TokenType.BOOL_TYPE, 'bool', rhs_type.type_name.line, rhs_type.type_name.column))
-                
-                elif lhs_type.type_name.lexeme == 'bool' and rhs_type.type_name.lexeme == 'bool' and expr.op.lexeme in CONDITIONAL_BOOL_RHS_LHS:
-                    self.error(f"Incorrect usage of bool comparision: '{expr.op.lexeme}'", expr.op)
+                self.check_relational(expr.op, lhs_type, rhs_type)
 
             # looking through comparison operators
             if expr.op.lexeme in COMPAIRSON_OPERATORS:
-                if lhs_type.type_name.token_type == TokenType.BOOL_TYPE and rhs_type.type_name.token_type == TokenType.BOOL_TYPE:
-                    self.curr_type = DataType(False, Token(TokenType.BOOL_TYPE, 'bool', rhs_type.type_name.line, rhs_type.type_name.column))
+                if lhs_type is BOOL and rhs_type is BOOL:
+                    self.curr_type = BOOL
                 else:
                     self.error(f"Incorrect usage of bool comparision: '{expr.op.lexeme}'", expr.op)
 
@@ -782,83 +819,54 @@ class SemanticChecker(Visitor):
             if expr.rest is not None:
 
                 # Accept the rest of the expression after 'not'
-                expr.rest.accept(self) 
-
-                # savin rhs_type
-                rhs_type = self.curr_type
+                yield expr.rest
 
                 # rechecking the same checks above
                 if expr.op.lexeme in CONDITIONAL_NON_BOOL_RHS_LHS:
-                    if expr.op.lexeme in CONDITIONAL_NON_BOOL_RHS_LHS:
-                        if expr.op.lexeme == '==' or expr.op.lexeme == '!=':
-                            if ((lhs_type.type_name.token_type != TokenType.VOID_TYPE) or (rhs_type.type_name.token_type != TokenType.VOID_TYPE)):
-                                
-                                if (lhs_type.type_name.token_type != rhs_type.type_name.token_type):
-                                    if(lhs_type.type_name.token_type == TokenType.VOID_TYPE or rhs_type.type_name.token_type == TokenType.VOID_TYPE):
-                                        self.curr_type = DataType(False, Token(TokenType.BOOL_TYPE, 'bool', rhs_type.type_name.line, rhs_type.type_name.column))
-                                    else:
-                                        self.error(f"Incorrect usage of bool comparision: '{expr.op.lexeme}'", expr.op)
-                                else:
-                                    self.curr_type = DataType(False, Token(TokenType.BOOL_TYPE, 'bool', rhs_type.type_name.line, rhs_type.type_name.column))
-                    if lhs_type.type_name.lexeme == 'double' and rhs_type.type_name.lexeme == 'double':
-                        self.curr_type = DataType(False, Token(TokenType.BOOL_TYPE, 'bool', rhs_type.type_name.line, rhs_type.type_name.column))
-
-                    elif lhs_type.type_name.lexeme == 'int' and rhs_type.type_name.lexeme == 'int':
-                        self.curr_type = DataType(False, Token(TokenType.BOOL_TYPE, 'bool', rhs_type.type_name.line, rhs_type.type_name.column))
-                    
-                    elif lhs_type.type_name.lexeme == 'bool' and rhs_type.type_name.lexeme == 'bool' and expr.op.lexeme in CONDITIONAL_BOOL_RHS_LHS:
-                        self.error(f"Incorrect usage of bool comparision: '{expr.op.lexeme}'", expr.op)
+                    self.check_relational(expr.op, lhs_type, self.curr_type)
 
 
     def visit_data_type(self, data_type):
         # note: allowing void (bad cases of void caught by parser)
         name = data_type.type_name.lexeme
         if (name == 'void' or name in BASE_TYPES or name in self.structs) and data_type.is_array == False:
-            self.curr_type = data_type    
+            self.curr_type = self.types.canonical(data_type)
+            self.curr_pos = data_type.type_name
         else: 
             self.error(f'invalid type "{name}"', data_type.type_name)
             
     
+    @iterative
     def visit_var_def(self, var_def):
-        var_def.data_type.accept(self)
+        yield var_def.data_type
 
          # Add the variable definition to the symbol table
-        self.symbol_table.add(var_def.var_name.lexeme, var_def.data_type)
+        self.symbol_table.add(var_def.var_name.lexeme, self.curr_type)
 
         
+    @iterative
     def visit_simple_term(self, simple_term):
         # accepting simple term
         if simple_term.rvalue:
-            simple_term.rvalue.accept(self)
+            yield simple_term.rvalue
         else:
             self.error("Incorrect simple term syntax", simple_term.rvalue)
     
+    @iterative
     def visit_complex_term(self, complex_term):
         # accepting complex term
         if complex_term.expr:
-            complex_term.expr.accept(self)
+            yield complex_term.expr
         else:
             self.error("Incorrect complex term syntax", complex_term.expr)
         
 
     def visit_simple_rvalue(self, simple_rvalue):
-        value = simple_rvalue.value
-        line = simple_rvalue.value.line
-        column = simple_rvalue.value.column
-        type_token = None 
-        if value.token_type == TokenType.INT_VAL:
-            type_token = Token(TokenType.INT_TYPE, 'int', line, column)
-        elif value.token_type == TokenType.DOUBLE_VAL:
-            type_token = Token(TokenType.DOUBLE_TYPE, 'double', line, column)
-        elif value.token_type == TokenType.STRING_VAL:
-            type_token = Token(TokenType.STRING_TYPE, 'string', line, column)
-        elif value.token_type == TokenType.BOOL_VAL:
-            type_token = Token(TokenType.BOOL_TYPE, 'bool', line, column)
-        elif value.token_type == TokenType.NULL_VAL:
-            type_token = Token(TokenType.VOID_TYPE, 'void', line, column)
-        self.curr_type = DataType(False, type_token)
+        self.curr_type = VALUE_TYPES[simple_rvalue.value.token_type]
+        self.curr_pos = simple_rvalue.value
 
         
+    @iterative
     def visit_new_rvalue(self, new_rvalue):
         # finding the struct we are currently in
         struct_def = self.structs.get(new_rvalue.type_name.lexeme)
@@ -872,45 +880,42 @@ class SemanticChecker(Visitor):
             if new_rvalue.array_expr != None:
 
                 # find expression
-                new_rvalue.array_expr.accept(self)
-
-                # saving array expr type
-                array_expr_type = self.curr_type.type_name.token_type
+                yield new_rvalue.array_expr
 
                 # ensuring that array expression is a non array int value
-                if array_expr_type != TokenType.INT_TYPE and array_expr_type != TokenType.INT_VAL:
+                if self.curr_type is not INT:
                     self.error("Array size must be and integer", new_rvalue.type_name)
 
                 # setting current data type
-                self.curr_type = DataType(True, new_rvalue.type_name)
+                self.curr_type = self.types.get(new_rvalue.type_name.lexeme, True)
             
             else:
 
-                # saving field length in declared struct
-                field_length = len(new_rvalue.struct_params)
-                # saving length found in struct list
-                struct_length = len(struct_def.fields)
+                # the declared struct's fields
+                fields = self.struct_fields[new_rvalue.type_name.lexeme]
 
                 # if param length are not the same, error
-                if field_length != struct_length:
+                if len(new_rvalue.struct_params) != len(fields):
                     self.error("Incorrect amount of fields!", new_rvalue.type_name)
                 
                 # type checking struct params to ensure the allign
-                for i in range (0, len(new_rvalue.struct_params)):
+                for i, field_type in fields.values():
 
                     # acceting field
-                    new_rvalue.struct_params[i].accept(self)
+                    yield new_rvalue.struct_params[i]
 
                     # if field is not void and not compatible, error
-                    if self.curr_type.type_name.lexeme != 'void':
-                        if self.curr_type.type_name.lexeme != struct_def.fields[i].data_type.type_name.lexeme or self.curr_type.is_array != struct_def.fields[i].data_type.is_array:
-                            self.error("Incorrect field type", new_rvalue.type_name)
+                    if self.curr_type is not VOID and self.curr_type is not field_type:
+                        self.error("Incorrect field type", new_rvalue.type_name)
                             
                 # settng current type
-                self.curr_type = DataType(False, new_rvalue.type_name)
+                self.curr_type = self.types.get(new_rvalue.type_name.lexeme)
+
+            self.curr_pos = new_rvalue.type_name
 
         
             
+    @iterative
     def visit_var_rvalue(self, var_rvalue):
         # ensuring that the variable referenced exists, if not error
         if not (self.symbol_table.exists(var_rvalue.path[0].var_name.lexeme)):
@@ -927,17 +932,14 @@ class SemanticChecker(Visitor):
                 self.error('data type must be of array type', var_rvalue.path[0].var_name)
             
             # get array expr
-            var_rvalue.path[0].array_expr.accept(self)
-
-            # save the right hand side type
-            rhs_type = self.curr_type
+            yield var_rvalue.path[0].array_expr
 
             # type checking array expresson to ensure it is an int and not an array
-            if(rhs_type.type_name.lexeme != 'int') or (rhs_type.is_array != False):
+            if self.curr_type is not INT:
                 self.error("Type mismatch, arrays expressions must be ints", var_rvalue.path[0].var_name)
 
-            # setting data type
-            data_type = DataType(False, data_type.type_name)
+            # setting data type to the array's element type
+            data_type = self.types.get(data_type.type_name.lexeme)
         
         # running through the path starting at the second spot
         for i in range(1, len(var_rvalue.path)):
@@ -948,19 +950,17 @@ class SemanticChecker(Visitor):
             # find current struct
             curr_struct = self.structs[data_type.type_name.lexeme]
 
-            # set flag for a valid field
-            valid_field = False
-
-            # checking fields in struct
-            for field in curr_struct.fields:
-
-                # if the paths data type equals the set field type, set flag true
-                if var_rvalue.path[i].var_name.lexeme == field.var_name.lexeme:
-                    valid_field = True
-                    data_type = field.data_type
-            # checking the flag
-            if valid_field == False:
+            # finding the field type, if none the field is invalid
+            field_type = self.get_field_type(curr_struct, var_rvalue.path[i].var_name.lexeme)
+            if field_type is None:
                 self.error("Not a valid field type", var_rvalue.path[i].var_name)
 
+            # the field's type (or its element type if it is indexed)
+            if var_rvalue.path[i].array_expr == None:
+                data_type = field_type
+            else:
+                data_type = self.types.get(field_type.type_name.lexeme)
+
         # setting current type
-        self.curr_type = data_type
\ No newline at end of file
+        self.curr_type = data_type
+        self.curr_pos = var_rvalue.path[-1].var_name
\ No newline at end of file
@@ -0,0 +1,316 @@
+"""Long-lived MyPL compile-and-run server.
+
+The server listens on a Unix socket or a localhost TCP port and keeps
+the interpreter warm in a pool of worker processes. Clients send one
+JSON request per line:
+
+    {"source": "...", "stdin": "...", "max_instructions": N, "time_limit": S}
+
+where only "source" is required (a request can only lower the server's
+limits), and get back one JSON response per line:
+
+    {"status": 0, "output": "...", "error": null, "cached": false, "time": S}
+
+Status is 0 if the program ran to completion and 1 otherwise, in which
+case error holds the error message (also printed to the output, as
+with `mypl.py`). Programs are compiled by the workers, the server keeps
+the compiled frame templates of recently run programs (optionally also
+in an on-disk .myplc cache directory), and every run gets a fresh VM.
+
+NAME: Lauren Nguyen
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import asyncio
+import io
+import json
+import signal
+import socket
+import sys
+import time
+from dataclasses import replace
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from mypl_error import MyPLError, VMError
+from mypl_iowrapper import FileWrapper
+from mypl_lexer import Lexer
+from mypl_ast_parser import ASTParser
+from mypl_semantic_checker import SemanticChecker
+from mypl_code_gen import CodeGenerator
+from mypl_vm import VM, ExecutionLimits
+import mypl_bytecode
+from mypl_parallel import pack_template, unpack_template
+
+
+# limits for served programs unless the server is given others
+DEFAULT_LIMITS = ExecutionLimits(max_instructions=10_000_000, max_heap_objects=1_000_000,
+                                 max_heap_elements=10_000_000, time_limit=10.0)
+
+# seconds a run may go past its time limit before the worker's timer
+# interrupts it (the VM's own checks normally stop it first)
+HARD_TIMEOUT_GRACE = 1.0
+
+# compiled programs the server keeps in memory
+CACHE_SIZE = 256
+
+# longest request line the server accepts (in bytes)
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+
+def _compile(source, cache_dir):
+    """Compiles the given source (or loads it from the cache directory).
+
+    Returns: The list of packed frame templates, or the error message
+    if the program has an error (or the compiler fails on it, e.g. by
+    running out of stack on deeply nested expressions).
+
+    """
+    path = None
+    frame_templates = None
+    if cache_dir:
+        path = mypl_bytecode.cache_path(None, source, cache_dir)
+        frame_templates = mypl_bytecode.load(path, source)
+    if frame_templates is None:
+        try:
+            ast = ASTParser(Lexer(FileWrapper(io.StringIO(source)))).parse()
+            ast.accept(SemanticChecker())
+            vm = VM()
+            ast.accept(CodeGenerator(vm))
+        except MyPLError as ex:
+            return str(ex)
+        except Exception as ex:
+            # not the full traceback, which for a recursion is huge
+            return f'Compiler Error: {type(ex).__name__}: {ex}'
+        frame_templates = vm.frame_templates
+        if path:
+            mypl_bytecode.save(path, source, frame_templates)
+    return [pack_template(template) for template in frame_templates.values()]
+
+
+def _time_limit_exceeded(signum, frame):
+    """Interrupts a run that has gone well past its time limit."""
+    raise VMError('time limit exceeded')
+
+
+def _execute(packed, stdin, limits):
+    """Runs the (packed) compiled program in a new VM.
+
+    Returns: The (status, output, error message) of the run.
+
+    """
+    output = io.StringIO()
+    error = None
+    try:
+        vm = VM()
+        for template in packed:
+            vm.add_frame_template(unpack_template(template))
+        vm.limits = limits
+        # the program's I/O goes through the VM's own streams
+        vm.stdin = io.StringIO(stdin)
+        vm.stdout = output
+        # the VM only checks its time limit between instructions and
+        # before allocations, so a timer signal (not available on every
+        # platform) also stops anything that runs long inside one
+        # instruction
+        timed = limits.time_limit is not None and hasattr(signal, 'setitimer')
+        if timed:
+            signal.signal(signal.SIGALRM, _time_limit_exceeded)
+            signal.setitimer(signal.ITIMER_REAL, limits.time_limit + HARD_TIMEOUT_GRACE)
+        try:
+            vm.run()
+        finally:
+            if timed:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except MyPLError as ex:
+        error = str(ex)
+        print(error, file=output)
+    except Exception:
+        error = traceback.format_exc()
+    return 0 if error is None else 1, output.getvalue(), error
+
+
+class MyPLServer:
+    """Serves compile-and-run requests from concurrent clients, running
+    the programs in a pool of worker processes.
+
+    """
+
+    def __init__(self, workers=None, limits=DEFAULT_LIMITS, cache_dir=None):
+        """Creates a server (call start to begin accepting clients).
+
+        Args:
+            workers -- Number of worker processes (default: CPU count).
+            limits -- The ExecutionLimits for each program (requests
+                can lower the instruction and time limits).
+            cache_dir -- Directory for .myplc files shared by the
+                workers (default: in-memory caching only).
+
+        """
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(workers)
+        self.limits = limits
+        self.cache_dir = cache_dir
+        # source hash -> packed frame templates, most recently used last
+        self.compiled = OrderedDict()
+        self.server = None
+
+
+    async def start(self, path=None, host='127.0.0.1', port=0):
+        """Starts accepting clients on the Unix socket at path if given,
+        and otherwise on the TCP host and port (0 picks a free port).
+
+        Returns: The address the server listens on (the socket path or
+        a (host, port) pair).
+
+        """
+        if path is not None:
+            self.server = await asyncio.start_unix_server(
+                self.handle_client, path, limit=MAX_REQUEST_SIZE)
+            return path
+        self.server = await asyncio.start_server(
+            self.handle_client, host, port, limit=MAX_REQUEST_SIZE)
+        return self.server.sockets[0].getsockname()[:2]
+
+
+    async def close(self):
+        """Stops accepting clients and shuts down the worker pool."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(cancel_futures=True)
+
+
+    async def handle_client(self, reader, writer):
+        """Answers each of a client's requests until it disconnects."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.handle_request(line)
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # client went away (or sent a line over the size limit)
+            pass
+        finally:
+            writer.close()
+
+
+    async def handle_request(self, line):
+        """Returns the response (a dictionary) for a request line."""
+        try:
+            request = json.loads(line)
+            source = request['source']
+            stdin = request.get('stdin', '')
+            max_instructions = self.limit(request.get('max_instructions'),
+                                          self.limits.max_instructions, (int,))
+            time_limit = self.limit(request.get('time_limit'), self.limits.time_limit)
+            limits = replace(self.limits, max_instructions=max_instructions,
+                             time_limit=time_limit)
+            if type(source) != str or type(stdin) != str:
+                raise TypeError('source and stdin must be strings')
+        except (ValueError, KeyError, TypeError, AttributeError) as ex:
+            return {'status': 1, 'output': '', 'error': f'Bad request: {ex}',
+                    'cached': False, 'time': 0.0}
+        start = time.perf_counter()
+        key = mypl_bytecode.source_hash(source)
+        packed = self.compiled.get(key)
+        cached = packed is not None
+        try:
+            if cached:
+                self.compiled.move_to_end(key)
+            else:
+                packed = await self.run_in_worker(_compile, source, self.cache_dir)
+                if type(packed) == str:
+                    # report compile errors as mypl.py does
+                    return {'status': 1, 'output': packed + '\n', 'error': packed,
+                            'cached': False, 'time': time.perf_counter() - start}
+                self.compiled[key] = packed
+                if len(self.compiled) > CACHE_SIZE:
+                    self.compiled.popitem(last=False)
+            status, output, error = await self.run_in_worker(_execute, packed, stdin, limits)
+        except BrokenProcessPool:
+            status, output, error = 1, '', 'Server Error: worker process died'
+        except Exception as ex:
+            status, output, error = 1, '', f'Server Error: {ex!r}'
+        return {'status': status, 'output': output, 'error': error,
+                'cached': cached, 'time': time.perf_counter() - start}
+
+
+    async def run_in_worker(self, function, *args):
+        """Returns function(*args) run in the worker pool. If a worker
+        process has died (e.g., killed by the OS), the pool is broken:
+        it is replaced so that later requests run, and this request's
+        BrokenProcessPool error is raised.
+
+        """
+        executor = self.executor
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, function, *args)
+        except BrokenProcessPool:
+            # only the first request to find the pool broken replaces it
+            if self.executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = ProcessPoolExecutor(self.workers)
+            raise
+
+
+    def limit(self, requested, maximum, types=(int, float)):
+        """Returns the limit to use given a request's limit (which can
+        only lower the server's and must be a positive number of one of
+        the given types).
+
+        """
+        if requested is None:
+            return maximum
+        if type(requested) not in types or requested <= 0:
+            raise ValueError(f'invalid limit {requested!r}')
+        return requested if maximum is None else min(requested, maximum)
+
+
+    async def serve_forever(self, path=None, host='127.0.0.1', port=0):
+        """Starts the server and serves clients until cancelled."""
+        address = await self.start(path, host, port)
+        print(f'MyPL server listening on {address}', file=sys.stderr)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+
+def parse_address(address):
+    """Returns the (path, host, port) for a server address: a port
+    number, HOST:PORT, or otherwise a Unix socket path.
+
+    """
+    if address.isdigit():
+        return None, '127.0.0.1', int(address)
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and '/' not in address:
+        return None, host, int(port)
+    return address, None, None
+
+
+def request(address, source, stdin='', **limits):
+    """Sends one program to the server at the given address and returns
+    its response (a dictionary).
+
+    """
+    path, host, port = parse_address(address)
+    if path is not None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+    else:
+        sock = socket.create_connection((host, port))
+    with sock, sock.makefile('rwb') as f:
+        message = dict(limits, source=source, stdin=stdin)
+        f.write(json.dumps(message).encode('utf-8') + b'\n')
+        f.flush()
+        return json.loads(f.readline())
@@ -12,7 +12,10 @@ class SymbolTable:
 
     def __init__(self):
         """Create an empty symbol table."""
+        # names added to each environment (undo list per environment)
         self.environments = []
+        # name -> shadow stack of (environment depth, info), innermost last
+        self.bindings = {}
 
         
     def __len__(self):
@@ -22,12 +25,20 @@ class SymbolTable:
 
     def __repr__(self):
         """Returns a string representation of the environments."""
-        return str(self.environments)
+        envs = []
+        for depth, names in enumerate(self.environments, 1):
+            env = {}
+            for name in names:
+                for shadow_depth, info in self.bindings[name]:
+                    if shadow_depth == depth:
+                        env[name] = info
+            envs.append(env)
+        return str(envs)
 
     
     def push_environment(self):
         """Add a new environment to the symbol table."""
-        self.environments.append({})
+        self.environments.append([])
 
         
     def pop_environment(self):
@@ -35,7 +46,8 @@ class SymbolTable:
 
         """
         if self.environments:
-            self.environments.pop()
+            for name in self.environments.pop():
+                self.bindings[name].pop()
 
 
     def add(self, name, info):
@@ -46,7 +58,13 @@ class SymbolTable:
             info -- The info to associate to the name.
         """
         if self.environments:
-            self.environments[-1][name] = info
+            depth = len(self.environments)
+            shadows = self.bindings.setdefault(name, [])
+            if shadows and shadows[-1][0] == depth:
+                shadows[-1] = (depth, info)
+            else:
+                shadows.append((depth, info))
+                self.environments[-1].append(name)
 
             
     def exists(self, name):
@@ -56,10 +74,7 @@ class SymbolTable:
             name: The name to search for.
 
         """
-        for i in range(1, len(self)+1): 
-            if name in self.environments[-i]:
-                return True
-        return False
+        return bool(self.bindings.get(name))
 
     
     def exists_in_curr_env(self, name):
@@ -70,7 +85,8 @@ class SymbolTable:
             name: The name to search for.
 
         """
-        return self.environments and name in self.environments[-1]
+        shadows = self.bindings.get(name)
+        return bool(shadows) and shadows[-1][0] == len(self.environments)
 
     
     def get(self, name):
@@ -81,10 +97,7 @@ class SymbolTable:
             name: The name whose info is to be returned.
 
         """
-        n = len(self)
-        for i in range(1, len(self)+1):
-            if name in self.environments[-i]:
-                return self.environments[-i][name]
+        shadows = self.bindings.get(name)
+        if shadows:
+            return shadows[-1][1]
         return None
-
-    
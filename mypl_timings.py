@@ -0,0 +1,166 @@
+"""Per-phase timings and metrics of compiling and running a MyPL
+program (for `mypl.py --timings`).
+
+Each phase (lex, parse, check, codegen, run) is timed on its own, so
+the program is lexed to a token list before it is parsed. Memory is
+measured from the resident set size (RSS), which costs nothing to read
+(tracing allocations would distort the timings): each phase's change
+in RSS, and its peak RSS. On Linux the peak is the phase's own, since
+the process's peak is reset before each phase. Elsewhere the change is
+unknown and the peak is the process's largest RSS so far.
+
+NAME: Lauren Nguyen
+DATE: Spring 2024
+CLASS: CPSC 326
+
+"""
+
+import contextlib
+import sys
+import time
+from dataclasses import fields, is_dataclass
+
+from mypl_token import Token, TokenType
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+def max_rss():
+    """Returns the largest resident set size of the process so far in
+    bytes, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes, except on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def proc_status(key):
+    """Returns the size in bytes of the given field (e.g. VmRSS) of
+    /proc/self/status, or None if unknown (not on Linux)."""
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith(key + ':'):
+                    # in kB
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss():
+    """Returns the current resident set size in bytes, or None if
+    unknown."""
+    return proc_status('VmRSS')
+
+
+def reset_peak_rss():
+    """Resets the process's peak resident set size (VmHWM, which is
+    also what max_rss reads on Linux) to the current one.
+
+    Returns: True if it was reset, False if not possible (not on Linux).
+
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def lex_tokens(lexer):
+    """Returns the list of all the lexer's tokens (ending with EOS)."""
+    tokens = [lexer.next_token()]
+    while tokens[-1].token_type != TokenType.EOS:
+        tokens.append(lexer.next_token())
+    return tokens
+
+
+class TokenList:
+    """Hands a list of (already lexed) tokens to the parser, so parsing
+    is timed apart from lexing. Like the lexer, it keeps returning the
+    last (end of stream) token once the list runs out."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.index = 0
+
+    def next_token(self):
+        token = self.tokens[min(self.index, len(self.tokens) - 1)]
+        self.index += 1
+        return token
+
+
+def count_nodes(ast):
+    """Returns the number of AST nodes (not counting tokens) in the
+    given AST."""
+    count = 0
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if type(node) == list:
+            stack.extend(node)
+        elif is_dataclass(node) and type(node) != Token:
+            count += 1
+            stack.extend(getattr(node, f.name) for f in fields(node))
+    return count
+
+
+class PhaseTimer:
+    """Collects the time, change in RSS and peak RSS of each phase,
+    along with counts of what the phases produced."""
+
+    def __init__(self):
+        # (phase name, seconds, RSS change and peak RSS in bytes or None)
+        self.phases = []
+        # whether the peaks are each phase's own (not the process's)
+        self.phase_peaks = True
+        # metric name -> count
+        self.counts = {}
+        # function name -> instructions generated
+        self.functions = {}
+
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Times the phase run in the with block (ended by an error or
+        not)."""
+        before = rss()
+        reset = reset_peak_rss()
+        self.phase_peaks = self.phase_peaks and reset
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            after = rss()
+            change = after - before if after is not None and before is not None else None
+            peak = proc_status('VmHWM') if reset else max_rss()
+            self.phases.append((name, seconds, change, peak))
+
+
+    def table(self):
+        """Returns the timings and counts as a human-readable table."""
+        peak_label = 'peak RSS (MB)' if self.phase_peaks else 'max RSS so far (MB)'
+        lines = [f'{"phase":<10} {"time (ms)":>12} {"RSS change (MB)":>16} {peak_label:>20}']
+        for name, seconds, change, peak in self.phases:
+            change = f'{change / 2 ** 20:+.1f}' if change is not None else '-'
+            peak = f'{peak / 2 ** 20:.1f}' if peak is not None else '-'
+            lines.append(f'{name:<10} {1000 * seconds:>12.2f} {change:>16} {peak:>20}')
+        total = sum(seconds for _, seconds, _, _ in self.phases)
+        lines.append(f'{"total":<10} {1000 * total:>12.2f}')
+        lines.append('')
+        for name, count in self.counts.items():
+            lines.append(f'{name + ":":<24} {str(count):>12}')
+        if self.functions:
+            lines.append('')
+            lines.append(f'{"function":<24} {"instrs":>12}')
+            for name, count in sorted(self.functions.items(), key=lambda item: -item[1]):
+                lines.append(f'{name:<24} {count:>12}')
+        return '\n'.join(lines)
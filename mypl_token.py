@@ -29,7 +29,7 @@ TokenType = Enum('TokenType', [
 ])
     
 
-@dataclass
+@dataclass(slots=True)
 class Token:
     token_type: TokenType
     lexeme: str
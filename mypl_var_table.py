@@ -13,6 +13,8 @@ class VarTable:
         """Create an empty var table"""
         self.environments = []
         self.total_vars = 0
+        # var name -> offsets of its visible definitions (innermost last)
+        self.offsets = {}
         
         
     def __len__(self):
@@ -35,20 +37,32 @@ class VarTable:
 
         """
         if self.environments:
-            self.total_vars -= len(self.environments[-1])
-            self.environments.pop()
+            var_names = self.environments.pop()
+            self.total_vars -= len(var_names)
+            # undo the offsets the environment added (only the first
+            # add of a name within an environment records an offset)
+            for var_name in var_names:
+                offsets = self.offsets[var_name]
+                if offsets and offsets[-1] >= self.total_vars:
+                    offsets.pop()
 
             
     def add(self, var_name):
-        """Add a variable to the table in the current environment.
+        """Add a variable to the table in the current environment, returning
+        its offset. Returns None if there is no environment.
         
         Args: 
             var_name -- The variable name to add.
 
         """
         if self.environments:
+            env_start = self.total_vars - len(self.environments[-1])
+            offsets = self.offsets.setdefault(var_name, [])
+            if not offsets or offsets[-1] < env_start:
+                offsets.append(self.total_vars)
             self.environments[-1].append(var_name)
             self.total_vars += 1
+            return offsets[-1]
             
             
     def get(self, var_name):
@@ -59,11 +73,7 @@ class VarTable:
             var_name -- The variable to lookup in the table.
 
         """
-        num_remaining = self.total_vars
-        for i in range(1, len(self) + 1):
-            num_remaining -= len(self.environments[-i])
-            if var_name in self.environments[-i]:
-                return num_remaining + self.environments[-i].index(var_name)
+        offsets = self.offsets.get(var_name)
+        if offsets:
+            return offsets[-1]
         return None
-
-    
@@ -10,7 +10,27 @@ CLASS: CPSC 326
 from mypl_error import *
 from mypl_opcode import *
 from mypl_frame import *
+from dataclasses import dataclass
 import math
+import time
+
+
+@dataclass
+class ExecutionLimits:
+    """Limits on a VM run (None for no limit). The limits are checked
+    every check_interval instructions (so the call depth can briefly
+    overshoot its limit), except the instruction limit, which is exact,
+    and the heap and array length limits, which are checked (along with
+    the time limit) before each allocation.
+
+    """
+    max_instructions: int = None    # instructions executed
+    max_call_depth: int = None      # frames on the call stack
+    max_heap_objects: int = None    # structs plus arrays allocated
+    max_heap_elements: int = None   # array elements allocated in total
+    max_array_length: int = None    # elements in any one array
+    time_limit: float = None        # wall-clock seconds
+    check_interval: int = 1000      # instructions between checks
 
 
 class VM:
@@ -19,10 +39,21 @@ class VM:
         # Creates a VM
         self.struct_heap = {}        # id -> dict
         self.array_heap = {}         # id -> list
+        self.heap_elements = 0       # array elements allocated so far
         self.next_obj_id = 2024      # next available object id (int)
         self.frame_templates = {}    # function name -> VMFrameTemplate
         self.call_stack = []         # function call stack
         self.try_flag = False        # flag to indicate we are in a try statement
+        self.unlowered_functions = {} # function name -> FunDef awaiting code gen
+        self.code_generator = None   # generates code for unlowered functions
+        self.limits = None           # ExecutionLimits for run (None = no limits)
+        self.deadline = None         # wall-clock time the run must end by
+        self.profiler = None         # samples the run (None = no profiling)
+        self.call_profiler = None    # told of each call and return (or None)
+        self.heap_profiler = None    # told of each allocation (or None)
+        self.instruction_count = None # instructions run (after a run ends)
+        self.stdin = None            # input stream (None = sys.stdin)
+        self.stdout = None           # output stream (None = sys.stdout)
 
 
     
@@ -37,56 +68,214 @@ class VM:
 
     
     def add_frame_template(self, template):
-        """Add the new frame info to the VM. 
+        """Add the new frame info to the VM (freezing it, so that it can
+        no longer be changed).
 
         Args: 
             frame -- The frame info to add.
 
         """
-        self.frame_templates[template.function_name] = template
+        self.frame_templates[template.function_name] = template.freeze()
+
+
+    def add_unlowered_function(self, fun_def, code_generator):
+        """Add a function whose code is generated on its first call.
+
+        Args:
+            fun_def -- The function's (checked) AST.
+            code_generator -- The code generator to lower it with.
+
+        """
+        self.unlowered_functions[fun_def.fun_name.lexeme] = fun_def
+        self.code_generator = code_generator
+
+
+    def get_frame_template(self, fun_name):
+        """Returns the frame template for the given function, generating
+        the function's code first if it has not been lowered yet, or None
+        if there is no such function.
+
+        VMs may share lazily built templates (by sharing frame_templates,
+        unlowered_functions and code_generator) and run in different
+        threads: lowering is done under the code generator's lock, so
+        each function is lowered once, by one thread at a time.
+
+        """
+        template = self.frame_templates.get(fun_name)
+        if template is None and self.code_generator is not None:
+            with self.code_generator.lock:
+                # another VM may have lowered it while this one waited
+                template = self.frame_templates.get(fun_name)
+                if template is None:
+                    fun_def = self.unlowered_functions.pop(fun_name, None)
+                    if fun_def is None:
+                        return None
+                    fun_def.accept(self.code_generator)
+                    template = self.frame_templates[fun_name]
+        return template
 
     
     def error(self, msg, frame=None):
-        """Report a VM error."""
+        """Report a VM error (at the current instruction of the given
+        frame, or by default of the running frame)."""
+        if not frame and self.call_stack:
+            frame = self.call_stack[-1]
         if not frame:
             raise VMError(msg)
         pc = frame.pc - 1
         instr = frame.template.instructions[pc]
         name = frame.template.function_name
+        position = frame.template.source_position(pc)
+        if position:
+            msg += f' near line {position[0]}, column {position[1]}'
         msg += f' (in {name} at {pc}: {instr})'
         raise VMError(msg)
 
+
+    def read_line(self):
+        """Returns the next line of self.stdin without its newline (like
+        input() does for sys.stdin).
+
+        Raises: EOFError at the end of the stream.
+
+        """
+        line = self.stdin.readline()
+        if not line:
+            raise EOFError('EOF when reading a line')
+        return line[:-1] if line.endswith('\n') else line
+
+
+    def checkpoint(self, frame, count):
+        """Checks the execution limits and samples the profiler (if set)
+        before the instruction at frame.pc - 1 runs, given the count of
+        instructions started so far (including that one).
+
+        Returns: The number of instructions until the next checkpoint.
+
+        """
+        interval = None
+        if self.limits is not None:
+            interval = self.check_limits(frame, count)
+        if self.profiler is not None:
+            self.profiler.sample(self, frame)
+            if interval is None or self.profiler.interval < interval:
+                interval = self.profiler.interval
+        return interval
+
+
+    def check_limits(self, frame, count):
+        """Checks the execution limits, given the count of instructions
+        started so far (including the one about to run).
+
+        Returns: The number of instructions until the next check.
+
+        Raises: A VMLimitError if a limit is exceeded.
+
+        """
+        limits = self.limits
+        exceeded = None
+        if limits.max_instructions is not None and count > limits.max_instructions:
+            exceeded = 'instruction'
+        elif limits.max_call_depth is not None and len(self.call_stack) > limits.max_call_depth:
+            exceeded = 'call depth'
+        elif self.deadline is not None and time.perf_counter() > self.deadline:
+            exceeded = 'time'
+        if exceeded:
+            self.limit_error(exceeded, frame)
+        interval = max(1, limits.check_interval)
+        if limits.max_instructions is not None:
+            # check again right when the instruction limit is reached
+            interval = min(interval, limits.max_instructions + 1 - count)
+        return interval
+
+
+    def check_allocation(self, frame, elements):
+        """Checks the heap and time limits before allocating a struct
+        (with 0 elements) or an array of the given length, so that a
+        single large allocation cannot get past them.
+
+        Raises: A VMLimitError if a limit would be exceeded.
+
+        """
+        limits = self.limits
+        exceeded = None
+        if (limits.max_heap_objects is not None and
+              len(self.struct_heap) + len(self.array_heap) >= limits.max_heap_objects):
+            exceeded = 'heap object'
+        elif (limits.max_heap_elements is not None and
+              self.heap_elements + elements > limits.max_heap_elements):
+            exceeded = 'heap element'
+        elif (limits.max_array_length is not None and
+              elements > limits.max_array_length):
+            exceeded = 'array length'
+        elif self.deadline is not None and time.perf_counter() > self.deadline:
+            exceeded = 'time'
+        if exceeded:
+            self.limit_error(exceeded, frame)
+
+
+    def limit_error(self, exceeded, frame):
+        """Raises a VMLimitError for the given exceeded limit at the
+        instruction about to run (or running) in the frame."""
+        pc = frame.pc - 1
+        raise VMLimitError(exceeded, frame.template.function_name, pc,
+                           frame.template.instructions[pc],
+                           frame.template.source_position(pc))
+
     
     #----------------------------------------------------------------------
     # RUN FUNCTION
     #----------------------------------------------------------------------
     
     def run(self, debug=False):
-        """Run the virtual machine."""
+        """Run the virtual machine (within self.limits, sampled by
+        self.profiler, and with calls and allocations traced by
+        self.call_profiler and self.heap_profiler, if set)."""
 
         # grab the "main" function frame and instantiate it
-        if not 'main' in self.frame_templates:
+        main_template = self.get_frame_template('main')
+        if main_template is None:
             self.error('No "main" functrion')
-        frame = VMFrame(self.frame_templates['main'])
+        frame = VMFrame(main_template)
         self.call_stack.append(frame)
 
+        # instructions until the next checkpoint (never reached if there
+        # are no limits or profiler), instructions between the last two
+        # checkpoints, and instructions started as of the last checkpoint
+        # (so count + interval - countdown instructions have started)
+        countdown = 0
+        interval = 0
+        count = 0
+        self.deadline = None
+        if self.limits is not None and self.limits.time_limit is not None:
+            self.deadline = time.perf_counter() + self.limits.time_limit
+        if self.limits is not None or self.profiler is not None:
+            countdown = interval = 1
+        if self.call_profiler is not None:
+            self.call_profiler.enter('main', 0)
+
         # run loop (continue until run out of call frames or instructions)
         while self.call_stack and frame.pc < len(frame.template.instructions):
             # get the next instruction
             instr = frame.template.instructions[frame.pc]
             # increment the program count (pc)
             frame.pc += 1
+            # check the execution limits and profile every so often
+            countdown -= 1
+            if countdown == 0:
+                count += interval
+                interval = countdown = self.checkpoint(frame, count)
             # for debugging:
             if debug:
-                print('\n')
-                print('\t FRAME.........:', frame.template.function_name)
-                print('\t PC............:', frame.pc)
-                print('\t INSTRUCTION...:', instr)
+                print('\n', file=self.stdout)
+                print('\t FRAME.........:', frame.template.function_name, file=self.stdout)
+                print('\t PC............:', frame.pc, file=self.stdout)
+                print('\t INSTRUCTION...:', instr, file=self.stdout)
                 val = None if not frame.operand_stack else frame.operand_stack[-1]
-                print('\t NEXT OPERAND..:', val)
+                print('\t NEXT OPERAND..:', val, file=self.stdout)
                 cs = self.call_stack
                 fun = cs[-1].template.function_name if cs else None
-                print('\t NEXT FUNCTION..:', fun)
+                print('\t NEXT FUNCTION..:', fun, file=self.stdout)
             # print(frame.operand_stack)
             #------------------------------------------------------------
             # Literals and Variables
@@ -120,8 +309,8 @@ class VM:
                 y = frame.operand_stack.pop()
                 if y == None or x == None:
                     self.error("Cannot add null values")
-                instr.operand = y + x
-                frame.operand_stack.append(instr.operand)
+                result = y + x
+                frame.operand_stack.append(result)
 
             
             elif instr.opcode == OpCode.SUB:
@@ -131,8 +320,8 @@ class VM:
                     self.error("Cannot sub null values")
                 if (type(x) != int and type(x) != float) or (type(y) != int and type(y) != float):
                     self.error("Cannot sub non int or double values")
-                instr.operand = y - x
-                frame.operand_stack.append(instr.operand)
+                result = y - x
+                frame.operand_stack.append(result)
 
             
             elif instr.opcode == OpCode.MUL:
@@ -142,10 +331,10 @@ class VM:
                     self.error("Cannot mul null values")
                 if (type(x) != int and type(x) != float) or (type(y) != int and type(y) != float):
                     self.error("Cannot mul non int or double values")
-                instr.operand = y * x
+                result = y * x
                 if type(x) == int and type(y) == int:
-                    instr.operand = math.floor(instr.operand)
-                frame.operand_stack.append(instr.operand)
+                    result = math.floor(result)
+                frame.operand_stack.append(result)
             
             
             elif instr.opcode == OpCode.DIV:
@@ -157,10 +346,10 @@ class VM:
                     self.error("Cannot div non int or double values")
                 if x == 0:
                     self.error("No division by 0")
-                instr.operand = y / x
+                result = y / x
                 if type(x) == int and type(y) == int:
-                    instr.operand = math.floor(instr.operand)
-                frame.operand_stack.append(instr.operand)
+                    result = math.floor(result)
+                frame.operand_stack.append(result)
             
             elif instr.opcode == OpCode.AND:
                 x = frame.operand_stack.pop()
@@ -169,10 +358,10 @@ class VM:
                     self.error("Cannot compare null values")
                 check = x and y
                 if check == True or check == 'true':
-                    instr.operand = 'true'
+                    result = 'true'
                 else:
-                    instr.operand = 'false'
-                frame.operand_stack.append(instr.operand)
+                    result = 'false'
+                frame.operand_stack.append(result)
 
             elif instr.opcode == OpCode.OR:
                 x = frame.operand_stack.pop()
@@ -181,10 +370,10 @@ class VM:
                     self.error("Cannot compare null values")
                 check = x or y
                 if check == True or check == 'true':
-                    instr.operand = 'true'
+                    result = 'true'
                 else:
-                    instr.operand = 'false'
-                frame.operand_stack.append(instr.operand)
+                    result = 'false'
+                frame.operand_stack.append(result)
 
             elif instr.opcode == OpCode.NOT:
                 x = frame.operand_stack.pop()
@@ -192,10 +381,10 @@ class VM:
                     self.error("Cannot compare null values")
                 check = not x
                 if check:
-                    instr.operand = 'true'
+                    result = 'true'
                 else:
-                    instr.operand = 'false'
-                frame.operand_stack.append(instr.operand)
+                    result = 'false'
+                frame.operand_stack.append(result)
             
             elif instr.opcode == OpCode.CMPLT:
                 x = frame.operand_stack.pop()
@@ -204,10 +393,10 @@ class VM:
                     self.error("Cannot compare null values")
                 check = y < x
                 if check == True or check == 'true':
-                    instr.operand = 'true'
+                    result = 'true'
                 else:
-                    instr.operand = 'false'
-                frame.operand_stack.append(instr.operand)
+                    result = 'false'
+                frame.operand_stack.append(result)
             
             elif instr.opcode == OpCode.CMPLE:
                 x = frame.operand_stack.pop()
@@ -216,30 +405,30 @@ class VM:
                     self.error("Cannot compare null values")
                 check = y <= x
                 if check == True or check == 'true':
-                    instr.operand = 'true'
+                    result = 'true'
                 else:
-                    instr.operand = 'false'
-                frame.operand_stack.append(instr.operand)
+                    result = 'false'
+                frame.operand_stack.append(result)
             
             elif instr.opcode == OpCode.CMPEQ:
                 x = frame.operand_stack.pop()
                 y = frame.operand_stack.pop()
                 check = y == x
                 if check == True or check == 'true':
-                    instr.operand = 'true'
+                    result = 'true'
                 else:
-                    instr.operand = 'false'
-                frame.operand_stack.append(instr.operand)
+                    result = 'false'
+                frame.operand_stack.append(result)
             
             elif instr.opcode == OpCode.CMPNE:
                 x = frame.operand_stack.pop()
                 y = frame.operand_stack.pop()
                 check = y != x
                 if check == True or check == 'true':
-                    instr.operand = 'true'
+                    result = 'true'
                 else:
-                    instr.operand = 'false'
-                frame.operand_stack.append(instr.operand)
+                    result = 'false'
+                frame.operand_stack.append(result)
 
             #------------------------------------------------------------
             # Branching
@@ -265,6 +454,8 @@ class VM:
 
                 # popping the call of the call stack
                 self.call_stack.pop()
+                if self.call_profiler is not None:
+                    self.call_profiler.leave(count + interval - countdown)
 
                 # as long as there is something in the call stack, change frame to new fun
                 if len(self.call_stack) != 0:
@@ -277,8 +468,10 @@ class VM:
                 # getting function name from stack
                 fun_name = instr.operand
 
-                # creating new frame
-                new_frame_template = self.frame_templates[fun_name]
+                # creating new frame (generating its code on first call)
+                new_frame_template = self.get_frame_template(fun_name)
+                if new_frame_template is None:
+                    self.error(f'undefined function "{fun_name}"', frame)
 
                 # instantating a new frame
                 new_frame = VMFrame(new_frame_template)
@@ -293,6 +486,8 @@ class VM:
 
                 # setting curr frame to the new frame
                 frame = new_frame
+                if self.call_profiler is not None:
+                    self.call_profiler.enter(fun_name, count + interval - countdown)
             #------------------------------------------------------------
             # Built-In Functions
             #------------------------------------------------------------
@@ -386,6 +581,8 @@ class VM:
             #------------------------------------------------------------
 
             elif instr.opcode == OpCode.ALLOCS:
+                if self.limits is not None:
+                    self.check_allocation(frame, 0)
                 # saving new OID
                 oid = self.next_obj_id
 
@@ -394,6 +591,8 @@ class VM:
 
                 # setting up new struct to oid
                 self.struct_heap[oid] = {}
+                if self.heap_profiler is not None:
+                    self.heap_profiler.alloc(self, frame, oid)
 
                 # appending oid to operand stack
                 frame.operand_stack.append(oid)
@@ -433,13 +632,17 @@ class VM:
                 oid = self.next_obj_id
                 if oid == None:
                     self.error("Array location must be valid")
-                self.next_obj_id += 1
                 array_length = frame.operand_stack.pop()
                 if array_length == None or array_length < 0:
                     self.error("Appropriate Array Length must be defined")
-
-                # ... check for valid array length value ...
-                self.array_heap[oid] = [None for _ in range (array_length)]
+                # check the limits before (not after) allocating
+                if self.limits is not None:
+                    self.check_allocation(frame, array_length)
+                self.next_obj_id += 1
+                self.heap_elements += array_length
+                self.array_heap[oid] = [None] * array_length
+                if self.heap_profiler is not None:
+                    self.heap_profiler.alloc(self, frame, oid)
                 frame.operand_stack.append(oid)
         
             elif instr.opcode == OpCode.SETI:
@@ -525,10 +728,10 @@ class VM:
                         x = 'true'
                     else:
                         x = 'false'
-                print(x, end='')
+                print(x, end='', file=self.stdout)
             
             elif instr.opcode == OpCode.READ:
-                x = input()
+                x = input() if self.stdin is None else self.read_line()
                 frame.operand_stack.append(x)
             
             elif instr.opcode == OpCode.TRY_START:
@@ -557,4 +760,5 @@ class VM:
             else:
                 self.error(f'unsupported operation {instr}')
 
-        
+        # number of instructions the run executed
+        self.instruction_count = count + interval - countdown